@@ -0,0 +1,391 @@
+# -*- coding: utf-8 -*-
+"""
+Created on Wed Oct 21 08:55:10 2026
+
+Benchmarks of the hot paths of each model.
+
+Times and memory-profiles step and run paths over n_cells and n_steps and
+writes machine-readable results (JSON) that can be compared between commits:
+
+    python benchmark.py --cells 1 100 10000 1000000 --steps 10 --out new.json
+    python benchmark.py --compare old.json new.json
+
+Timings are best of --repeat runs; peak memory is from tracemalloc (NumPy
+allocations are traced) in a separate run so it does not affect timing.
+"""
+
+import sys
+import json
+import time
+import platform
+import argparse
+import subprocess
+import tracemalloc
+
+import numpy as np
+
+from damm import param as DAMM_PARA
+from icbm import param as ICBM_PARA
+
+NT = 273.15  # 0 degC in Kelvin
+SOILP = {'clay': 40.0, 'bd': 1350.0, 'poros': 0.5, 'fc': 0.3}
+
+
+def _forcing(n_cells, n_steps, seed=1):
+    """ synthetic daily forcing (n_steps, n_cells) """
+    rng = np.random.default_rng(seed)
+    d = np.arange(n_steps)[:, None]
+    T = 8.0 + 10.0 * np.sin(2 * np.pi * d / 365.0) + rng.normal(0, 1, (1, n_cells))
+    W = np.clip(0.25 + 0.05 * rng.standard_normal((1, n_cells)) + 0.0 * d, 0.05, 0.6)
+    L = np.full((n_steps, n_cells), 0.8)
+    return T, W, L
+
+
+""" *** cases: setup(n_cells, n_steps) returns a callable running the hot path *** """
+
+def millennial_decompose(n_cells, n_steps):
+    from millennial import Millennial, param
+    T, W, L = _forcing(n_cells, n_steps)
+    model = Millennial(dict(param), SOILP, np.full((5, n_cells), 100.0))
+
+    def run():
+        for k in range(n_steps):
+            model.decompose(T[k], W[k], [0.66 * L[k], 0.34 * L[k]])
+    return run
+
+
+def millennial_fluxes(n_cells, n_steps):
+    from millennial import fluxes, param, millennial_param
+    p = dict(param)
+    p['CUE'] = 0.6
+    p['Qmax'] = 4550.0
+    p = millennial_param(**p)
+    x = np.full((5, n_cells), 100.0)
+    env_f = np.full(n_cells, 0.5)
+
+    def run():
+        for k in range(n_steps):
+            fluxes(x, p, env_f=env_f)
+    return run
+
+
+def icbm_compute(n_cells, n_steps):
+    from icbm import model
+    t = np.arange(n_steps + 1, dtype=float)
+    ini = {'Y': np.full(n_cells, 0.3), 'O': np.full(n_cells, 4.0)}
+
+    def run():
+        model(ICBM_PARA, dict(ini)).compute(t, I=0.285, fenv=1.0)
+    return run
+
+
+def yasso_decomp(n_cells, n_steps):
+    from yasso import yasso
+    m = yasso()
+    m.x = np.repeat(m.x[:, None], n_cells, axis=1)
+    temp = np.full(n_cells, 4.0)
+
+    def run():
+        for k in range(n_steps):
+            m.decomp_one_timestep(0.2, 0.1, 0.05, temp)
+    return run
+
+
+def esom_get_rates(n_cells, n_steps):
+    import esom
+    T, W, _ = _forcing(n_cells, n_steps)
+    tf = esom.temperature_functions()
+    mf = esom.moisture_functions()
+    pH = esom.pH_from_sfc(np.full(n_cells, 3))
+
+    def run():
+        for k in range(n_steps):
+            esom.get_rates(2.0, 1.0, pH, T[k], T[k], T[k], T[k], *tf, W[k] / 0.3,
+                           *mf, 1.0, 1.0, 1.0, None)
+    return run
+
+
+def damm_reaction_velocity(n_cells, n_steps):
+    from damm import Damm
+    T, W, _ = _forcing(n_cells, n_steps)
+    T = T + NT
+    model = Damm(DAMM_PARA, 0.048, 0.68)
+
+    def run():
+        for k in range(n_steps):
+            model.reaction_velocity(T[k], W[k])
+    return run
+
+
+def ensemble_run(n_cells, n_steps):
+    from millennial import param
+    from ensemble import Ensemble, MillennialMember, ICBMMember, DammMember
+    T, W, L = _forcing(n_cells, n_steps)
+    members = {'millennial': MillennialMember(param, SOILP, np.full(5, 100.0)),
+               'icbm': ICBMMember(ICBM_PARA, {'Y': 0.3, 'O': 4.0}),
+               'damm': DammMember(DAMM_PARA, 0.048, 0.68)}
+    ens = Ensemble(members, {'T': T, 'W': W, 'litter': L}, soilp=SOILP)
+
+    def run():
+        ens.run(n_steps)
+    return run
+
+
+def column_millennial(n_cells, n_steps):
+    from millennial import param
+    from column import MillennialStepper, MillennialState
+    T, W, L = _forcing(n_cells, n_steps)
+    step = MillennialStepper(param, SOILP)
+    s = MillennialState(np.full(5, 100.0), n_cells)
+    Lp, Ll = 0.66 * L, 0.34 * L
+
+    def run():
+        for k in range(n_steps):
+            step(s, T[k], W[k], Lp[k], Ll[k])
+    return run
+
+
+def column_damm(n_cells, n_steps):
+    from column import DammStepper, DammState
+    T, W, _ = _forcing(n_cells, n_steps)
+    T = T + NT
+    step = DammStepper(DAMM_PARA, 0.048, 0.68)
+    s = DammState(n_cells)
+
+    def run():
+        for k in range(n_steps):
+            step(s, T[k], W[k])
+    return run
+
+
+def isotopes_millennial(n_cells, n_steps):
+    from millennial import param, millennial_param
+    from isotopes import stack, millennial_step
+    T, W, L = _forcing(n_cells, n_steps)
+    p = dict(param)
+    p['CUE'] = 0.6
+    p['Qmax'] = 4550.0
+    p = millennial_param(**p)
+    x = stack(np.full((5, n_cells), 100.0), Fm0=0.9)
+    env_f = np.full(n_cells, 0.5)
+
+    def run():
+        for k in range(n_steps):
+            millennial_step(x, p, env_f, [0.66 * L[k], 0.34 * L[k]], 1.05)
+    return run
+
+
+CASES = {'millennial.decompose': millennial_decompose,
+         'millennial.fluxes': millennial_fluxes,
+         'icbm.model.compute': icbm_compute,
+         'yasso.decomp_one_timestep': yasso_decomp,
+         'esom.get_rates': esom_get_rates,
+         'damm.reaction_velocity': damm_reaction_velocity,
+         'ensemble.run': ensemble_run,
+         'column.millennial': column_millennial,
+         'column.damm': column_damm,
+         'isotopes.millennial': isotopes_millennial,
+         }
+
+# per-call comparison of the model API and the column API
+PER_CALL = [('millennial.decompose', 'column.millennial'),
+            ('damm.reaction_velocity', 'column.damm')]
+
+
+def measure(setup, n_cells, n_steps, repeat=3):
+    """
+    Args:
+        setup - case setup function
+        n_cells, n_steps - problem size
+        repeat - number of timed runs
+    Returns:
+        dict with time (s, best of repeats), peak memory (bytes) and
+        throughput (cell-steps s-1)
+    """
+    run = setup(n_cells, n_steps)
+    run()  # warm-up
+    times = []
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        run()
+        times.append(time.perf_counter() - t0)
+
+    tracemalloc.start()
+    run()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    best = min(times)
+    return {'n_cells': n_cells, 'n_steps': n_steps, 'time': best,
+            'time_per_step': best / n_steps, 'peak_bytes': peak,
+            'cell_steps_per_s': n_cells * n_steps / best if best > 0 else None}
+
+
+def per_call(columns=(1, 10000), n_calls=2000, verbose=True):
+    """
+    micro-benchmark of per-call cost of one timestep for the model API and
+    the allocation-free column API (see column.py)
+    Returns:
+        list of dicts with case, n_columns, us per call and bytes allocated
+        per call
+    """
+    out = []
+    for n in columns:
+        for cases in PER_CALL:
+            for name in cases:
+                run = CASES[name](n, n_calls)
+                run()
+                t0 = time.perf_counter()
+                run()
+                t = (time.perf_counter() - t0) / n_calls
+                tracemalloc.start()
+                run()
+                cur, peak = tracemalloc.get_traced_memory()
+                tracemalloc.stop()
+                r = {'case': name, 'n_columns': n, 'us_per_call': 1e6 * t,
+                     'peak_bytes_per_call': peak / n_calls}
+                out.append(r)
+                if verbose:
+                    print('%-24s %7d columns %10.2f us/call %10.0f B/call peak'
+                          % (name, n, r['us_per_call'], r['peak_bytes_per_call']))
+    return out
+
+
+CORE_MODULES = ['millennial', 'damm', 'icbm', 'yasso', 'esom', 'linear', 'transit',
+                'modifiers', 'runcache', 'instrument', 'ensemble', 'precision',
+                'tiles', 'emulator', 'coupling', 'forcing_ensemble', 'column',
+                'isotopes', 'sensitivity', 'surfaces']
+HEAVY_MODULES = ['matplotlib', 'pandas', 'scipy', 'xlrd']
+
+
+def import_time(modules=CORE_MODULES):
+    """
+    imports modules in a fresh interpreter
+    Returns:
+        dict
+            time - import time of the modules (s), python startup excluded
+            heavy - heavy optional packages that got imported
+    """
+    import os
+    code = ('import sys, time; t0 = time.perf_counter(); import %s; '
+            'print(time.perf_counter() - t0); print(\' \'.join(m for m in %r if m in sys.modules))'
+            % (', '.join(modules), HEAVY_MODULES))
+    out = subprocess.check_output([sys.executable, '-c', code],
+                                  cwd=os.path.dirname(os.path.abspath(__file__)))
+    lines = out.decode().splitlines()
+    return {'time': float(lines[0]), 'heavy': lines[1].split() if len(lines) > 1 else []}
+
+
+def check_import_budget(budget=0.5):
+    """
+    import-time budget: the model cores must import without matplotlib,
+    pandas, scipy or xlrd and within budget seconds (see tests/test_imports.py).
+    Raises AssertionError otherwise.
+    """
+    r = import_time()
+    assert not r['heavy'], 'heavy imports in model core: %s' % r['heavy']
+    assert r['time'] < budget, 'import time %.3f s exceeds budget %.3f s' % (r['time'], budget)
+    return r
+
+
+def _commit():
+    try:
+        return subprocess.check_output(['git', 'rev-parse', '--short', 'HEAD'],
+                                       stderr=subprocess.DEVNULL).decode().strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def run_suite(cells=(1, 100, 10000, 1000000), steps=(10,), cases=None, repeat=3,
+              verbose=True):
+    """
+    runs benchmark cases over n_cells and n_steps
+    Returns:
+        dict with metadata and list of results
+    """
+    cases = cases or list(CASES.keys())
+    res = []
+    for name in cases:
+        for ns in steps:
+            for nc in cells:
+                try:
+                    r = measure(CASES[name], nc, ns, repeat=repeat)
+                except ImportError as e:  # missing optional dependency
+                    r = {'n_cells': nc, 'n_steps': ns, 'error': repr(e)}
+                r['case'] = name
+                res.append(r)
+                if verbose:
+                    if 'error' in r:
+                        print('%-28s %9d %6d  error: %s' % (name, nc, ns, r['error']))
+                    else:
+                        print('%-28s %9d %6d %10.4f s %12.3g cell-steps/s %10.1f MB'
+                              % (name, nc, ns, r['time'], r['cell_steps_per_s'],
+                                 r['peak_bytes'] / 1e6))
+    return {'commit': _commit(), 'python': platform.python_version(),
+            'numpy': np.__version__, 'machine': platform.machine(),
+            'processor': platform.processor(), 'results': res}
+
+
+def compare(old, new, threshold=0.1):
+    """
+    compares two result files; prints relative change of time per case/size.
+    Args:
+        old, new - result dicts or JSON file names
+        threshold - relative slowdown flagged as regression
+    Returns:
+        list of (case, n_cells, n_steps, t_old, t_new, ratio)
+    """
+    if isinstance(old, str):
+        with open(old) as f:
+            old = json.load(f)
+    if isinstance(new, str):
+        with open(new) as f:
+            new = json.load(f)
+    key = lambda r: (r['case'], r['n_cells'], r['n_steps'])
+    ref = {key(r): r for r in old['results'] if 'time' in r}
+    out = []
+    for r in new['results']:
+        k = key(r)
+        if 'time' not in r or k not in ref:
+            continue
+        ratio = r['time'] / ref[k]['time']
+        out.append(k + (ref[k]['time'], r['time'], ratio))
+        flag = 'REGRESSION' if ratio > 1.0 + threshold else ''
+        print('%-28s %9d %6d %10.4f %10.4f %7.2fx %s' % (k + (ref[k]['time'], r['time'],
+                                                             ratio, flag)))
+    return out
+
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description=__doc__.strip().splitlines()[2])
+    ap.add_argument('--cells', type=int, nargs='+', default=[1, 100, 10000, 1000000])
+    ap.add_argument('--steps', type=int, nargs='+', default=[10])
+    ap.add_argument('--cases', nargs='+', default=None, choices=list(CASES.keys()))
+    ap.add_argument('--repeat', type=int, default=3)
+    ap.add_argument('--out', default=None, help='JSON output file')
+    ap.add_argument('--compare', nargs=2, metavar=('OLD', 'NEW'), default=None)
+    ap.add_argument('--per-call', action='store_true',
+                    help='per-call cost of model vs. column API for 1 and 1e4 columns')
+    ap.add_argument('--import-budget', type=float, default=None, metavar='SECONDS',
+                    help='only check import time of the model cores')
+    args = ap.parse_args(argv)
+
+    if args.import_budget is not None:
+        r = check_import_budget(args.import_budget)
+        print('import time %.3f s, budget %.3f s: ok' % (r['time'], args.import_budget))
+        return
+
+    if args.compare:
+        compare(*args.compare)
+        return
+    if args.per_call:
+        per_call()
+        return
+    res = run_suite(args.cells, args.steps, args.cases, args.repeat)
+    if args.out:
+        with open(args.out, 'w') as f:
+            json.dump(res, f, indent=1)
+
+
+if __name__ == '__main__':
+    main(sys.argv[1:])
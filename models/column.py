@@ -0,0 +1,332 @@
+# -*- coding: utf-8 -*-
+"""
+Created on Fri Oct 30 08:45:12 2026
+
+Low-overhead per-step API for embedding Millennial and DAMM in a host
+land-surface model.
+
+The state of n columns lives in a __slots__ object of preallocated arrays
+(pools, fluxes, modifiers and scratch). Parameters are unpacked to floats
+once. A step writes fluxes into the state's buffers and updates pools in
+place with ufunc out= arguments, so after construction a step allocates
+nothing. Inputs are caller-owned arrays (n,) or scalars. For a single column
+ufunc call overhead dominates, so n = 1 takes a scalar path on Python floats.
+
+    step = MillennialStepper(param, soilp)
+    s = MillennialState(C0, n_columns)
+    for each host timestep:
+        step(s, T, W, litter_pom, litter_lmwc)   # updates s.x, s.F in place
+        Rh = s.F[FMR] + s.F[FGR]
+
+Fluxes follow millennial.fluxes, with the flux limits written as
+min(F, 0.9 x / dt), which equals min(dt F, 0.9 x) / dt.
+"""
+
+import math
+
+import numpy as np
+
+from millennial import QMAX
+from damm import R, O2_IN_AIR
+
+# rows of the flux buffer, in the order of millennial.fluxes
+FLUXES = ('Fpl', 'Fpa', 'Fa', 'Flb', 'Fbm', 'Fl', 'Fma', 'Flm', 'Fmr', 'Fgr')
+FPL, FPA, FA, FLB, FBM, FL, FMA, FLM, FMR, FGR = range(10)
+
+# century temperature function coefficients, see millennial.fT_century
+_CT = (15.4, 11.75, 29.7, 0.031)
+
+
+def _item(a):
+    """ value of a scalar or a single-element array """
+    return a.item() if hasattr(a, 'item') else a
+
+
+class MillennialState():
+    __slots__ = ('n', 'x', 'F', 'env_f', 'CUE', 't1', 't2', 't3')
+
+    def __init__(self, C0, n=None, dtype=float):
+        """
+        Args:
+            C0 - initial pools (5,) or (5, n) (g C m-2)
+            n - number of columns (default from C0)
+            dtype - dtype of all buffers
+        """
+        C0 = np.asarray(C0, dtype=dtype)
+        if n is None:
+            n = C0.shape[1] if C0.ndim > 1 else 1
+        self.n = n
+        self.x = np.empty((5, n), dtype=dtype)
+        self.x[:] = C0.reshape(5, -1)
+        self.F = np.zeros((10, n), dtype=dtype)    # fluxes, rows FLUXES
+        self.env_f = np.ones(n, dtype=dtype)
+        self.CUE = np.zeros(n, dtype=dtype)
+        self.t1 = np.empty(n, dtype=dtype)
+        self.t2 = np.empty(n, dtype=dtype)
+        self.t3 = np.empty(n, dtype=dtype)
+
+
+class MillennialStepper():
+    __slots__ = ('dt', 'pa', 'V_pl', 'K_pl', 'K_pe', 'V_pa', 'K_pa', 'A_max', 'k_b',
+                 'k_l', 'K_lm', 'Qmax', 'k_s', 'V_lm', 'V_ma', 'K_ma', 'k_mm', 'k_m',
+                 'CUEp', 'fc', 'fT_den')
+
+    def __init__(self, param, soilp):
+        """
+        Args:
+            param - Millennial parameters (dict), see millennial.param
+            soilp - soil parameters (dict), uses fc
+        """
+        for k in self.__slots__[:18]:
+            setattr(self, k, float(QMAX if k == 'Qmax' and param[k] is None else param[k]))
+        self.CUEp = tuple(float(c) for c in param['CUEp'])
+        self.fc = soilp['fc']
+        c = _CT
+        self.fT_den = c[1] + (c[2] / np.pi) * np.arctan(np.pi * c[3] * (30.0 - c[0]))
+
+    def __call__(self, s, T, W, I_pom, I_lmwc):
+        """
+        one timestep from temperature and moisture
+        Args:
+            s - MillennialState
+            T - temperature (degC), W - vol. moisture (m3 m-3)
+            I_pom, I_lmwc - litter input to POM and LMWC (g C m-2 timestep-1)
+        """
+        if s.n == 1:
+            T = _item(T)
+            c = _CT
+            fT = (c[1] + (c[2] / math.pi) * math.atan(math.pi * c[3] * (T - c[0]))) / self.fT_den
+            fW = 1.0 / (1.0 + 30.0 * math.exp(-9.0 * _item(W) / self.fc))
+            cue = self.CUEp[0] - self.CUEp[2] * (T - self.CUEp[1])
+            s.env_f[0] = fT * fW
+            s.CUE[0] = cue
+            self._step1(s, fT * fW, cue, _item(I_pom), _item(I_lmwc))
+            return
+        self.modifiers(s, T, W)
+        self.step(s, I_pom, I_lmwc)
+
+    def modifiers(self, s, T, W):
+        """ century fT * fW into s.env_f and CUE into s.CUE """
+        c = _CT
+        t1, t2 = s.t1, s.t2
+        # fT
+        np.subtract(T, c[0], out=t1)
+        t1 *= np.pi * c[3]
+        np.arctan(t1, out=t1)
+        t1 *= c[2] / np.pi
+        t1 += c[1]
+        t1 /= self.fT_den
+        # fW = 1 / (1 + 30 exp(-9 W / fc))
+        np.divide(W, self.fc, out=t2)
+        t2 *= -9.0
+        np.exp(t2, out=t2)
+        t2 *= 30.0
+        t2 += 1.0
+        np.divide(t1, t2, out=s.env_f)
+        # CUE
+        np.subtract(T, self.CUEp[1], out=s.CUE)
+        s.CUE *= -self.CUEp[2]
+        s.CUE += self.CUEp[0]
+
+    def step(self, s, I_pom, I_lmwc):
+        """
+        fluxes into s.F and pool update in place using s.env_f and s.CUE
+        (set by modifiers, or written by the caller)
+        """
+        if s.n == 1:
+            self._step1(s, s.env_f.item(), s.CUE.item(), _item(I_pom), _item(I_lmwc))
+            return
+        x, F, e = s.x, s.F, s.env_f
+        t1, t2, t3 = s.t1, s.t2, s.t3
+        dt = self.dt
+
+        # t3 = 1 - A / A_max
+        np.multiply(x[3], -1.0 / self.A_max, out=t3)
+        t3 += 1.0
+
+        # Fpl = e V_pl P / (K_pl + P) * B / (K_pe + B)
+        np.add(x[0], self.K_pl, out=t1)
+        np.divide(x[0], t1, out=t1)
+        np.add(x[2], self.K_pe, out=t2)
+        np.divide(x[2], t2, out=t2)
+        np.multiply(t1, t2, out=F[FPL])
+        F[FPL] *= e
+        F[FPL] *= self.V_pl
+        self._limit(F[FPL], x[0], t1)
+
+        # Fpa = e V_pa P / (K_pa + P) (1 - A / A_max)
+        np.add(x[0], self.K_pa, out=t1)
+        np.divide(x[0], t1, out=t1)
+        np.multiply(t1, t3, out=F[FPA])
+        F[FPA] *= e
+        F[FPA] *= self.V_pa
+        self._limit(F[FPA], x[0], t1)
+
+        # Fa = e k_b A
+        np.multiply(x[3], e, out=F[FA])
+        F[FA] *= self.k_b
+
+        # Flb = e V_lm L CUE; Fgr = e Flb (1 - CUE) / CUE
+        np.multiply(x[1], e, out=F[FLB])
+        F[FLB] *= s.CUE
+        F[FLB] *= self.V_lm
+        self._limit(F[FLB], x[1], t1)
+        np.subtract(1.0, s.CUE, out=t1)
+        t1 /= s.CUE
+        np.multiply(F[FLB], e, out=F[FGR])
+        F[FGR] *= t1
+
+        # Fmr = e k_m B; Fbm = e k_mm B
+        np.multiply(x[2], e, out=F[FMR])
+        np.multiply(F[FMR], self.k_mm, out=F[FBM])
+        F[FMR] *= self.k_m
+        self._limit(F[FBM], x[2], t1)
+
+        # Fl = e k_l L
+        np.multiply(x[1], e, out=F[FL])
+        F[FL] *= self.k_l
+
+        # Fma = e V_ma M / (K_ma + M) (1 - A / A_max)
+        np.add(x[4], self.K_ma, out=t1)
+        np.divide(x[4], t1, out=t1)
+        np.multiply(t1, t3, out=F[FMA])
+        F[FMA] *= e
+        F[FMA] *= self.V_ma
+        self._limit(F[FMA], x[4], t1)
+
+        # Flm = e k_s L (K_lm Qmax L / (1 + K_lm L) - M) / Qmax
+        np.multiply(x[1], self.K_lm, out=t1)
+        np.add(t1, 1.0, out=t2)
+        t1 *= self.Qmax
+        t1 /= t2
+        t1 -= x[4]
+        np.multiply(x[1], e, out=F[FLM])
+        F[FLM] *= t1
+        F[FLM] *= self.k_s / self.Qmax
+
+        # pool update, see millennial.update_pools
+        pa = self.pa
+        np.multiply(F[FA], pa, out=t1)
+        t1 -= F[FPA]
+        t1 -= F[FPL]
+        t1 *= dt
+        t1 += I_pom
+        x[0] += t1
+
+        np.subtract(F[FPL], F[FLB], out=t1)
+        t1 -= F[FLM]
+        t1 -= F[FL]
+        t1 *= dt
+        t1 += I_lmwc
+        x[1] += t1
+
+        np.subtract(F[FLB], F[FBM], out=t1)
+        t1 -= F[FMR]
+        t1 *= dt
+        x[2] += t1
+
+        np.add(F[FPA], F[FMA], out=t1)
+        t1 -= F[FA]
+        t1 *= dt
+        x[3] += t1
+
+        np.multiply(F[FA], 1.0 - pa, out=t1)
+        t1 += F[FLM]
+        t1 += F[FBM]
+        t1 -= F[FMA]
+        t1 *= dt
+        x[4] += t1
+
+    def _step1(self, s, e, cue, I_pom, I_lmwc):
+        """ step of a single column on Python floats """
+        P, L, B, A, M = s.x[:, 0].tolist()
+        dt, pa = self.dt, self.pa
+        lim = 0.9 / dt
+        a3 = 1.0 - A / self.A_max
+        Fpl = min(e * self.V_pl * (P / (self.K_pl + P)) * (B / (self.K_pe + B)), lim * P)
+        Fpa = min(e * self.V_pa * (P / (self.K_pa + P)) * a3, lim * P)
+        Fa = e * self.k_b * A
+        Flb = min(e * self.V_lm * L * cue, lim * L)
+        Fgr = e * Flb * (1.0 - cue) / cue
+        Fmr = e * self.k_m * B
+        Fbm = min(e * self.k_mm * B, lim * B)
+        Fl = e * self.k_l * L
+        Fma = min(e * self.V_ma * (M / (self.K_ma + M)) * a3, lim * M)
+        Flm = e * self.k_s * L * ((self.K_lm * self.Qmax * L) / (1.0 + self.K_lm * L) - M) / self.Qmax
+        s.F[:, 0] = (Fpl, Fpa, Fa, Flb, Fbm, Fl, Fma, Flm, Fmr, Fgr)
+        s.x[:, 0] = (P + I_pom + dt * (pa*Fa - Fpa - Fpl),
+                     L + I_lmwc + dt * (Fpl - Flb - Flm - Fl),
+                     B + dt * (Flb - Fbm - Fmr),
+                     A + dt * (Fpa + Fma - Fa),
+                     M + dt * (Flm + Fbm + (1.0 - pa)*Fa - Fma))
+
+    def _limit(self, f, pool, tmp):
+        """ f = min(f, 0.9 pool / dt) in place """
+        np.multiply(pool, 0.9 / self.dt, out=tmp)
+        np.minimum(f, tmp, out=f)
+
+
+class DammState():
+    __slots__ = ('n', 'v', 'Vmax', 'fs', 'fo2', 't1')
+
+    def __init__(self, n, dtype=float):
+        """ output buffers v, Vmax, fs, fo2 and scratch for n columns """
+        self.n = n
+        self.v = np.empty(n, dtype=dtype)
+        self.Vmax = np.empty(n, dtype=dtype)
+        self.fs = np.empty(n, dtype=dtype)
+        self.fo2 = np.empty(n, dtype=dtype)
+        self.t1 = np.empty(n, dtype=dtype)
+
+
+class DammStepper():
+    __slots__ = ('alpha', 'Ea', 'kMs', 'kMo2', 'p', 'Dliq', 'Dgas', 'St', 'poros')
+
+    def __init__(self, para, St, poros):
+        """
+        Args:
+            para, St, poros - see damm.Damm
+        """
+        for k in self.__slots__[:7]:
+            setattr(self, k, float(para[k]))
+        self.St = St
+        self.poros = poros
+
+    def __call__(self, s, T, W):
+        """
+        reaction velocity into s.v (components into s.Vmax, s.fs, s.fo2)
+        Args:
+            s - DammState
+            T - temperature (K), W - liquid water content (m3 m-3)
+        """
+        if s.n == 1 and np.ndim(self.St) == 0 and np.ndim(self.poros) == 0:
+            W = _item(W)
+            Vmax = self.alpha * math.exp(-self.Ea / (1e-3 * R * _item(T)))
+            S = self.p * self.St * self.Dliq * W**3
+            O2 = self.Dgas * O2_IN_AIR * max(0.0, self.poros - W)**(4.0 / 3.0)
+            fs = S / (self.kMs + S)
+            fo2 = O2 / (self.kMo2 + O2)
+            s.Vmax[0], s.fs[0], s.fo2[0] = Vmax, fs, fo2
+            s.v[0] = Vmax * fs * fo2
+            return
+        t1 = s.t1
+        # Vmax = alpha exp(-Ea / (R T))
+        np.multiply(T, -1e-3 * R / self.Ea, out=t1)
+        np.reciprocal(t1, out=t1)
+        np.exp(t1, out=s.Vmax)
+        s.Vmax *= self.alpha
+        # S = p St Dliq W^3; fs = S / (kMs + S)
+        np.power(W, 3.0, out=t1)
+        t1 *= self.St
+        t1 *= self.p * self.Dliq
+        np.add(t1, self.kMs, out=s.fs)
+        np.divide(t1, s.fs, out=s.fs)
+        # O2 = Dgas O2_IN_AIR max(0, poros - W)^(4/3); fo2 = O2 / (kMo2 + O2)
+        np.subtract(self.poros, W, out=t1)
+        np.maximum(t1, 0.0, out=t1)
+        np.power(t1, 4.0 / 3.0, out=t1)
+        t1 *= self.Dgas * O2_IN_AIR
+        np.add(t1, self.kMo2, out=s.fo2)
+        np.divide(t1, s.fo2, out=s.fo2)
+        np.multiply(s.Vmax, s.fs, out=s.v)
+        s.v *= s.fo2
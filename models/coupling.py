@@ -0,0 +1,255 @@
+# -*- coding: utf-8 -*-
+"""
+Created on Wed Oct 28 10:05:27 2026
+
+Multi-rate coupling scheduler: models at their native timesteps on the same
+cells, e.g. DAMM hourly, Millennial or ESOM daily and Yasso annually.
+
+Hourly forcing is read in chunks and fed to each component through
+accumulators that aggregate on the fly (means for temperature and moisture,
+sums for litter). When a component's period is complete it is advanced with
+the aggregated inputs. Component outputs are aggregated the same way to the
+output period, so no hourly intermediates are stored. Components keep their
+model state in place; a component may read another's state by reference
+(e.g. DAMM substrate from Millennial pools).
+
+    comps = [DammComponent(damm.param, 0.048, 0.68),
+             MillennialComponent(param, soilp, C0),
+             YassoComponent()]
+    cpl = Coupler(comps, forcing={'T': T, 'W': W, 'litter': L})  # hourly (nh, n_cells)
+    res = cpl.run(nhours=8760*5)   # {component: {variable: (n_out, n_cells)}}
+"""
+
+import numpy as np
+
+from instrument import PROFILER
+
+HOURS = {'hour': 1, 'day': 24, 'year': 8760}
+
+
+class Accumulator():
+    __slots__ = ('kind', 'value', 'n')
+
+    def __init__(self, kind, shape):
+        """
+        running aggregate of a variable over a period
+        Args:
+            kind - 'mean', 'sum' or 'last'
+            shape - shape of one value
+        """
+        self.kind = kind
+        self.value = np.zeros(shape)
+        self.n = 0
+
+    def add(self, x):
+        if self.kind == 'last':
+            self.value[...] = x
+        else:
+            self.value += x
+        self.n += 1
+
+    def pop(self):
+        """ aggregate over the period; resets the accumulator """
+        v = self.value / max(self.n, 1) if self.kind == 'mean' else self.value.copy()
+        self.value[...] = 0.0
+        self.n = 0
+        return v
+
+
+class DammComponent():
+    def __init__(self, para, St, poros, period='hour', substrate=None):
+        """
+        DAMM reaction velocity.
+        Args:
+            para, St, poros - see damm.Damm
+            period - timestep
+            substrate - optional (component name, pool indices, scale): St is
+                        read each step as scale * sum of those pools of the
+                        named component's state
+        Inputs: T (degC, mean), W (m3 m-3, mean). Outputs: R (sum over
+        period, reaction velocity h-1 * hours)
+        """
+        self.name = 'damm'
+        self.period = HOURS.get(period, period)
+        self.para = para
+        self.St = St
+        self.poros = poros
+        self.substrate = substrate
+        self.inputs = {'T': 'mean', 'W': 'mean'}
+        self.outputs = {'R': 'sum'}
+
+    def init(self, n_cells, components):
+        from damm import Damm
+        self.model = Damm(self.para, self.St, self.poros)
+        self.components = components
+
+    def advance(self, f):
+        if self.substrate is not None:
+            src, idx, scale = self.substrate
+            self.model.St = scale * self.components[src].state()[idx].sum(axis=0)
+        v, _ = self.model.reaction_velocity(f['T'] + 273.15, f['W'])
+        return {'R': v * self.period}
+
+
+class MillennialComponent():
+    def __init__(self, param, soilp, C0, split=0.66, period='day'):
+        """
+        Millennial daily pool dynamics.
+        Inputs: T (degC, mean), W (m3 m-3, mean), litter (g C m-2, sum).
+        Outputs: Rh (g C m-2, sum), C (g C m-2, last)
+        """
+        self.name = 'millennial'
+        self.period = HOURS.get(period, period)
+        self.param = dict(param)
+        self.soilp = soilp
+        self.C0 = np.asarray(C0, dtype=float)
+        self.split = split
+        self.inputs = {'T': 'mean', 'W': 'mean', 'litter': 'sum'}
+        self.outputs = {'Rh': 'sum', 'C': 'last'}
+
+    def init(self, n_cells, components):
+        from millennial import Millennial
+        C0 = np.broadcast_to(self.C0.reshape(5, -1), (5, n_cells)).copy()
+        self.param['dt'] = self.period / 24.0
+        self.model = Millennial(self.param, self.soilp, C0)
+
+    def state(self):
+        return self.model.Cpools
+
+    def advance(self, f):
+        L = f['litter']
+        flx, _ = self.model.decompose(f['T'], f['W'], [self.split * L, (1.0 - self.split) * L])
+        return {'Rh': self.model.dt * (flx['Fmr'] + flx['Fgr']),
+                'C': self.model.Cpools.sum(axis=0)}
+
+
+class EsomComponent():
+    def __init__(self, ash=2.0, N=1.0, sfc=3, wfc=0.3, period='day'):
+        """
+        ESOM decomposition rates (see esom.rates_from_responses); peat layer
+        temperatures are taken equal to soil temperature T.
+        Inputs: T (degC, mean), W (m3 m-3, mean). Outputs: k (9 rates, mean)
+        """
+        self.name = 'esom'
+        self.period = HOURS.get(period, period)
+        self.ash = ash
+        self.N = N
+        self.sfc = sfc
+        self.wfc = wfc
+        self.inputs = {'T': 'mean', 'W': 'mean'}
+        self.outputs = {'k': 'mean'}
+
+    def init(self, n_cells, components):
+        from esom import pH_from_sfc
+        self.pH = pH_from_sfc(np.broadcast_to(self.sfc, (n_cells,)))
+
+    def advance(self, f):
+        from esom import responses, rates_from_responses
+        T = f['T']
+        r = responses(T, T, T, T, f['W'] / self.wfc)
+        k = rates_from_responses(self.ash, self.N, self.pH, T, r, 1.0, 1.0, 1.0)
+        return {'k': np.array(np.broadcast_arrays(*k))}
+
+
+class YassoComponent():
+    def __init__(self, param=None, split=(1.0, 0.0, 0.0), period='year', corrected=False):
+        """
+        Yasso annual steps; corrected see yasso.yasso.
+        Inputs: T (degC, mean), litter (g C m-2, sum).
+        Outputs: CO2 (g C m-2, sum), C (g C m-2, last)
+        """
+        self.name = 'yasso'
+        self.period = HOURS.get(period, period)
+        self.param = param
+        self.split = np.asarray(split, dtype=float)
+        self.corrected = corrected
+        self.inputs = {'T': 'mean', 'litter': 'sum'}
+        self.outputs = {'CO2': 'sum', 'C': 'last'}
+
+    def init(self, n_cells, components):
+        from yasso import yasso
+        self.model = yasso(self.param, self.corrected)
+        self.model.x = np.repeat(self.model.x[:, None], n_cells, axis=1)
+
+    def state(self):
+        return self.model.x
+
+    def advance(self, f):
+        from yasso import C_FRACTION
+        u = f['litter'] * 1e-3 / C_FRACTION  # g C m-2 -> kg litter m-2
+        CO2, _, _, _ = self.model.decomp_one_timestep(self.split[0]*u, self.split[1]*u,
+                                                      self.split[2]*u, f['T'])
+        return {'CO2': 1e3 * CO2, 'C': 1e3 * self.model.x.sum(axis=0)}
+
+
+class Coupler():
+    def __init__(self, components, forcing, output='day', chunk=24*30):
+        """
+        Args:
+            components - list of components (see *Component classes)
+            forcing - dict of hourly arrays (nhours, n_cells) with T, W and
+                      litter (g C m-2 h-1), or callable(start, stop) returning
+                      such a dict
+            output - output period: 'hour', 'day', 'year' or hours; slower
+                     components are output at their own period
+            chunk - hours of forcing read at a time
+        """
+        self.components = {c.name: c for c in components}
+        self.forcing = forcing
+        self.output = HOURS.get(output, output)
+        self.chunk = chunk
+
+    def _read(self, start, stop):
+        if callable(self.forcing):
+            return self.forcing(start, stop)
+        return {k: v[start:stop] for k, v in self.forcing.items()}
+
+    def run(self, nhours, n_cells=None):
+        """
+        Args:
+            nhours - number of hourly forcing steps
+            n_cells - number of cells (default: from forcing)
+        Returns:
+            dict {component: {variable: (n_out, ..., n_cells)}} at period
+            max(component period, output period)
+        """
+        if n_cells is None:
+            n_cells = np.shape(self._read(0, 1)['T'])[1]
+        acc_in, acc_out, res, periods = {}, {}, {}, {}
+        for name, c in self.components.items():
+            c.init(n_cells, self.components)
+            acc_in[name] = {v: Accumulator(k, n_cells) for v, k in c.inputs.items()}
+            periods[name] = max(c.period, self.output)
+            res[name] = {}
+            acc_out[name] = {}
+
+        for start in range(0, nhours, self.chunk):
+            stop = min(start + self.chunk, nhours)
+            with PROFILER.stage('coupling.forcing', (stop - start) * n_cells):
+                forc = self._read(start, stop)
+            for j in range(stop - start):
+                h = start + j + 1  # hours completed
+                for name, c in self.components.items():
+                    ai = acc_in[name]
+                    for v, a in ai.items():
+                        a.add(forc[v][j])
+                    if h % c.period:
+                        continue
+                    with PROFILER.stage('coupling.' + name, n_cells):
+                        out = c.advance({v: a.pop() for v, a in ai.items()})
+                    self._output(name, c, out, acc_out[name], res[name], h, periods[name],
+                                 nhours)
+            if PROFILER.hooks:
+                PROFILER.tick('coupling', self.components)
+        return res
+
+    @staticmethod
+    def _output(name, c, out, acc, res, h, period, nhours):
+        """ aggregates component outputs to the output period """
+        for v, x in out.items():
+            if v not in acc:
+                acc[v] = Accumulator(c.outputs[v], np.shape(x))
+                res[v] = np.full((nhours // period,) + np.shape(x), np.nan)
+            acc[v].add(x)
+            if h % period == 0:
+                res[v][h // period - 1] = acc[v].pop()
@@ -0,0 +1,267 @@
+# -*- coding: utf-8 -*-
+"""
+Created on Mon Oct 26 10:15:52 2026
+
+Surrogate of Millennial steady state for fast map queries.
+
+A polynomial chaos expansion (total-degree Legendre polynomials of the inputs
+scaled to [-1, 1]) is fitted by least squares to spin-up results over a Latin
+hypercube design of the input box. Outputs are fitted in log space, so
+predicted pools stay positive. Design points without a steady state (spin-up
+not converged) are left out of the fit. Validation error on an independent
+design is stored with the emulator. Predictions are a small matrix product per chunk of
+cells; cells outside the trained box fall back to the full model.
+
+    emu = Emulator(MILLENNIAL_INPUTS, millennial_simulator(tol=1e-5), degree=4)
+    emu.fit(n_train=400, n_valid=100)
+    print(emu.report())
+    emu.save('millennial_emulator.npz')
+    C, inside = emu.predict({'T': T, 'W': W, 'fc': fc, 'litter': L})
+"""
+
+from itertools import combinations_with_replacement
+
+import numpy as np
+
+from instrument import PROFILER
+
+# input box of the default Millennial emulator
+MILLENNIAL_INPUTS = {'T': (-2.0, 12.0),      # mean annual temperature (degC)
+                     'W': (0.1, 0.45),       # mean vol. moisture (m3 m-3)
+                     'fc': (0.2, 0.45),      # field capacity (m3 m-3)
+                     'litter': (0.2, 2.0)}   # litter input (g C m-2 d-1)
+
+
+def lhs(n, d, seed=1):
+    """
+    Latin hypercube sample of n points in [0, 1]^d
+    Returns:
+        array (d, n)
+    """
+    rng = np.random.default_rng(seed)
+    u = (np.arange(n) + rng.random((d, n))) / n
+    for row in u:
+        rng.shuffle(row)
+    return u
+
+
+def multi_indices(d, degree):
+    """ exponents (n_terms, d) of all monomials of total degree <= degree """
+    idx = [np.zeros(d, int)]
+    for p in range(1, degree + 1):
+        for c in combinations_with_replacement(range(d), p):
+            e = np.zeros(d, int)
+            for j in c:
+                e[j] += 1
+            idx.append(e)
+    return np.array(idx)
+
+
+class Emulator():
+    def __init__(self, inputs, simulate=None, degree=3, log=True):
+        """
+        Args:
+            inputs - dict {name: (low, high)} of the trained input box
+            simulate - callable(X) returning outputs (n_out, n) of the full
+                       model for dict X of input arrays (n,); used for training
+                       and as fallback
+            degree - total degree of the polynomial expansion
+            log - fit log of outputs (outputs must be positive)
+        """
+        self.names = list(inputs.keys())
+        self.lo = np.array([inputs[k][0] for k in self.names], dtype=float)
+        self.hi = np.array([inputs[k][1] for k in self.names], dtype=float)
+        self.simulate = simulate
+        self.degree = degree
+        self.log = log
+        self.alpha = multi_indices(len(self.names), degree)
+        self.coef = None
+        self.validation = None
+
+    def design(self, n, seed=1):
+        """ Latin hypercube design of n points in the input box (dict of arrays) """
+        u = lhs(n, len(self.names), seed)
+        return {k: self.lo[j] + u[j] * (self.hi[j] - self.lo[j])
+                for j, k in enumerate(self.names)}
+
+    def _scale(self, X, n=None):
+        """ inputs to [-1, 1]; returns Z (d, n) and mask of cells inside the box """
+        if n is None:
+            n = max(np.size(X[k]) for k in self.names)
+        Z = np.empty((len(self.names), n))
+        for j, k in enumerate(self.names):
+            Z[j] = np.broadcast_to(np.ravel(X[k]), (n,))
+        inside = np.all((Z >= self.lo[:, None]) & (Z <= self.hi[:, None]), axis=0)
+        Z -= (0.5 * (self.lo + self.hi))[:, None]
+        Z /= (0.5 * (self.hi - self.lo))[:, None]
+        return Z, inside
+
+    def _basis(self, Z):
+        """ basis (n_terms, n) of Legendre products """
+        # Legendre polynomials (d, degree+1, n) by Bonnet's recursion
+        P = np.empty((Z.shape[0], self.degree + 1, Z.shape[1]))
+        P[:, 0] = 1.0
+        if self.degree > 0:
+            P[:, 1] = Z
+        for m in range(1, self.degree):
+            P[:, m + 1] = ((2*m + 1) * Z * P[:, m] - m * P[:, m - 1]) / (m + 1)
+        V = np.ones((len(self.alpha), Z.shape[1]))
+        for t, a in enumerate(self.alpha):
+            nz = np.flatnonzero(a)
+            if len(nz) == 0:
+                continue
+            np.copyto(V[t], P[nz[0], a[nz[0]]])
+            for j in nz[1:]:
+                V[t] *= P[j, a[j]]
+        return V
+
+    def fit(self, n_train=200, n_valid=50, seed=1, data=None):
+        """
+        trains the surrogate on spin-up results over a Latin hypercube design
+        and validates it on an independent design.
+        Args:
+            n_train, n_valid - design sizes
+            seed - random seed of the designs
+            data - optional precomputed ((X, Y), (Xv, Yv)) to skip simulation
+        Returns:
+            self.validation (dict)
+        """
+        if data is None:
+            X = self.design(n_train, seed)
+            Xv = self.design(n_valid, seed + 1)
+            with PROFILER.stage('emulator.simulate', n_train + n_valid):
+                Y = self.simulate(X)
+                Yv = self.simulate(Xv)
+        else:
+            (X, Y), (Xv, Yv) = data
+        # points without steady state (nan) are left out
+        Y = np.atleast_2d(Y)
+        ok = np.all(np.isfinite(Y), axis=0)
+        X = {k: np.ravel(X[k])[ok] for k in self.names}
+        Y = Y[:, ok]
+        if Y.shape[1] < len(self.alpha):
+            raise ValueError('%d training points for %d polynomial terms'
+                             % (Y.shape[1], len(self.alpha)))
+        with PROFILER.stage('emulator.fit', Y.shape[1]):
+            V = self._basis(self._scale(X)[0])
+            T = np.log(Y) if self.log else Y
+            self.coef, _, _, _ = np.linalg.lstsq(V.T, T.T, rcond=None)
+        self.validation = self.validate(Xv, Yv)
+        self.validation['n_train'] = Y.shape[1]
+        self.validation['n_dropped'] = int(np.sum(~ok))
+        return self.validation
+
+    def validate(self, X, Y):
+        """
+        errors of the surrogate against full model outputs Y (n_out, n)
+        Returns:
+            dict with relative RMSE and max. relative error per output
+        """
+        Y = np.atleast_2d(Y)
+        ok = np.all(np.isfinite(Y), axis=0)
+        Y = Y[:, ok]
+        P = self.surrogate(X)[:, ok]
+        rel = np.abs(P - Y) / np.maximum(np.abs(Y), 1e-12)
+        return {'n_valid': Y.shape[1],
+                'rrmse': np.sqrt(np.mean((P - Y)**2, axis=1)) / np.mean(np.abs(Y), axis=1),
+                'max_rel': np.max(rel, axis=1),
+                'median_rel': np.median(rel, axis=1)}
+
+    def surrogate(self, X, chunk=16384, Z=None):
+        """ surrogate outputs (n_out, n) without domain check """
+        if Z is None:
+            Z, _ = self._scale(X)
+        out = np.empty((self.coef.shape[1], Z.shape[1]))
+        for c0 in range(0, Z.shape[1], chunk):
+            c1 = min(c0 + chunk, Z.shape[1])
+            out[:, c0:c1] = self.coef.T @ self._basis(Z[:, c0:c1])
+        if self.log:
+            np.exp(out, out=out)
+        return out
+
+    def predict(self, X, fallback=True, chunk=16384):
+        """
+        Args:
+            X - dict of input arrays (or scalars) by name
+            fallback - run the full model for cells outside the trained box;
+                       otherwise they are nan
+            chunk - cells per basis evaluation
+        Returns:
+            outputs (n_out, n), mask of cells predicted by the surrogate
+        """
+        with PROFILER.stage('emulator.predict', max(np.size(X[k]) for k in self.names)):
+            Z, inside = self._scale(X)
+            out = self.surrogate(X, chunk, Z)
+        if not inside.all():
+            ix = np.flatnonzero(~inside)
+            if fallback and self.simulate is not None:
+                Xo = {k: np.broadcast_to(np.ravel(X[k]), inside.shape)[ix] for k in self.names}
+                with PROFILER.stage('emulator.fallback', len(ix)):
+                    out[:, ix] = self.simulate(Xo)
+            else:
+                out[:, ix] = np.nan
+        return out, inside
+
+    def report(self):
+        """ text summary of the validation error """
+        v = self.validation
+        lines = ['emulator: %d inputs, degree %d, %d terms, %d training / %d validation points'
+                 ' (%d without steady state dropped)'
+                 % (len(self.names), self.degree, len(self.alpha), v['n_train'], v['n_valid'],
+                    v.get('n_dropped', 0))]
+        for j in range(len(v['rrmse'])):
+            lines.append('  output %d: rRMSE %.3g, median rel. error %.3g, max rel. error %.3g'
+                         % (j, v['rrmse'][j], v['median_rel'][j], v['max_rel'][j]))
+        return '\n'.join(lines)
+
+    def save(self, fname):
+        """ writes the trained surrogate into .npz """
+        v = self.validation or {}
+        np.savez(fname, names=np.array(self.names), lo=self.lo, hi=self.hi,
+                 degree=self.degree, log=self.log, coef=self.coef,
+                 **{'validation/' + k: np.asarray(x) for k, x in v.items()})
+
+    @classmethod
+    def load(cls, fname, simulate=None):
+        """ reads a surrogate written by save; simulate is used as fallback """
+        with np.load(fname) as f:
+            inputs = {str(k): (lo, hi) for k, lo, hi in zip(f['names'], f['lo'], f['hi'])}
+            emu = cls(inputs, simulate, int(f['degree']), bool(f['log']))
+            emu.coef = f['coef']
+            emu.validation = {k.split('/', 1)[1]: f[k] for k in f.files
+                              if k.startswith('validation/')}
+        return emu
+
+
+def millennial_simulator(param=None, T_amp=10.0, C0=100.0, split=0.66, **kwargs):
+    """
+    full model for the emulator: Millennial steady-state pools by spin-up
+    under a sinusoidal annual temperature cycle and constant moisture and
+    litter input.
+    Args:
+        param - Millennial parameters (default millennial.param)
+        T_amp - amplitude of the annual temperature cycle (degC)
+        C0 - initial pools (g C m-2)
+        split - fraction of litter to POM, rest to LMWC
+        kwargs - see spinup.spinup (tol, max_years ...)
+    Returns:
+        callable(X) with X dict of T, W, fc, litter arrays (n,), returning
+        pools (5, n) (g C m-2); nan for cells that did not converge (in cold
+        and wet corners POM may accumulate without a steady state)
+    """
+    from spinup import spinup_millennial
+    if param is None:
+        from millennial import param
+
+    def simulate(X):
+        n = len(np.ravel(X['T']))
+        d = np.arange(365)[:, None]
+        T = np.ravel(X['T']) + T_amp * np.sin(2 * np.pi * d / 365.0)
+        W = np.broadcast_to(np.ravel(X['W']), (365, n))
+        L = np.broadcast_to(np.ravel(X['litter']), (365, n))
+        res = spinup_millennial(param, {'fc': np.ravel(X['fc'])}, T, W, L,
+                                np.full((5, n), C0), split=split, **kwargs)
+        x = res['x']
+        x[:, res['years'] < 0] = np.nan
+        return x
+    return simulate
@@ -0,0 +1,268 @@
+# -*- coding: utf-8 -*-
+"""
+Created on Tue Oct 20 13:48:25 2026
+
+Multi-model ensemble runner: ICBM, Yasso, Millennial and DAMM on the same
+cells and forcing.
+
+Forcing is read once per chunk of daily timesteps and the shared
+environmental terms (century fT * fW, CUE, temperature in K) are computed
+once per chunk. All selected models then advance over the chunk in lockstep,
+each in its own thread, so wall time approaches that of the slowest model.
+Output is a model-indexed dict {model: {variable: (nsteps, n_cells)}}.
+With dtype=np.float32 forcing, shared terms, outputs and Millennial pools are
+stored in single precision (see precision.py).
+
+    members = {'millennial': MillennialMember(param, soilp, C0),
+               'icbm': ICBMMember(para, ini)}
+    ens = Ensemble(members, forcing={'T': T, 'W': W, 'litter': L}, soilp=soilp)
+    res = ens.run(nsteps=365*10)
+    ens.save('ensemble.npz', res)
+"""
+
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+from modifiers import millennial_modifiers
+from instrument import PROFILER
+
+NT = 273.15  # 0 degC in Kelvin
+
+
+def shared_terms(forc, param, soilp, dtype=float):
+    """
+    environmental terms shared by the members
+    Args:
+        forc - dict of daily forcing (nsteps, n_cells): T (degC), W (m3 m-3),
+               litter (g C m-2 d-1)
+        param - Millennial parameters (dict), uses CUEp
+        soilp - soil parameters (dict), uses fc
+        dtype - dtype of env_f and CUE
+    Returns:
+        dict of arrays (nsteps, n_cells): env_f, CUE, TK
+    """
+    env = millennial_modifiers(forc['T'], forc['W'], param, soilp, cache=None, dtype=dtype)
+    return {'env_f': env['env_f'], 'CUE': env['CUE'], 'TK': forc['T'] + NT}
+
+
+class MillennialMember():
+    def __init__(self, param, soilp, C0, split=0.66, dtype=None):
+        """
+        Args:
+            param, soilp - see millennial.Millennial
+            C0 - initial pools (5,) or (5, n_cells) (g C m-2)
+            split - fraction of litter input to POM, rest to LMWC
+            dtype - pool storage dtype, see millennial.Millennial
+        """
+        self.param = dict(param)
+        self.split = split
+        self.soilp = soilp
+        self.C0 = np.asarray(C0, dtype=float)
+        self.dtype = dtype
+        self.variables = ['C', 'Rh']
+
+    def init(self, n_cells):
+        from millennial import Millennial
+        C0 = np.broadcast_to(self.C0.reshape(5, -1), (5, n_cells)).copy()
+        self.model = Millennial(self.param, self.soilp, C0, dtype=self.dtype)
+
+    def advance(self, forc, sh, out):
+        """ daily steps over the chunk; out - dict of (nsteps, n_cells) views """
+        L = forc['litter']
+        for k in range(len(L)):
+            F_in = [self.split*L[k], (1.0 - self.split)*L[k]]
+            flx, _ = self.model.decompose(None, None, F_in, env=(sh['env_f'][k], sh['CUE'][k]))
+            out['C'][k] = self.model.Cpools.sum(axis=0)
+            out['Rh'][k] = flx['Fmr'] + flx['Fgr']
+
+
+class ICBMMember():
+    def __init__(self, para, ini):
+        """
+        ICBM at daily timestep with century fT * fW as environmental modifier.
+        Args:
+            para, ini - see icbm.model (yr-1, kg C m-2)
+        """
+        self.para = para
+        self.ini = ini
+        self.variables = ['C', 'Rh']
+
+    def init(self, n_cells):
+        from icbm import icbm_system
+        self.system = icbm_system(self.para)
+        self.x = np.zeros((2, n_cells))
+        self.x[0] = self.ini['Y']
+        self.x[1] = self.ini['O']
+
+    def advance(self, forc, sh, out):
+        dt = 1.0 / 365.0  # yr
+        I = forc['litter'] * 365.0 * 1e-3  # g C m-2 d-1 -> kg C m-2 yr-1
+        for k in range(len(I)):
+            x1 = self.system.step(self.x, I[k], sh['env_f'][k][None, :], dt=dt)
+            out['Rh'][k] = 1e3 * (I[k] * dt - (x1.sum(axis=0) - self.x.sum(axis=0)))
+            out['C'][k] = 1e3 * x1.sum(axis=0)
+            self.x = x1
+
+
+class YassoMember():
+    def __init__(self, param=None, split=(1.0, 0.0, 0.0), corrected=False):
+        """
+        Yasso at annual timestep; litter and temperature are aggregated over
+        each 365 days (sum and mean). Outputs are written on the last day of
+        each year and are nan otherwise.
+        Args:
+            param - see yasso.decom_para
+            split - fractions of litter as non-woody, fine and coarse woody
+            corrected - see yasso.yasso
+        """
+        self.param = param
+        self.split = np.asarray(split, dtype=float)
+        self.corrected = corrected
+        self.variables = ['C', 'Rh']
+
+    def init(self, n_cells):
+        from yasso import yasso
+        self.model = yasso(self.param, self.corrected)
+        self.model.x = np.repeat(self.model.x[:, None], n_cells, axis=1)
+        self.litter = np.zeros(n_cells)
+        self.tsum = np.zeros(n_cells)
+        self.nday = 0
+
+    def advance(self, forc, sh, out):
+        from yasso import C_FRACTION
+        out['C'][:] = np.nan
+        out['Rh'][:] = np.nan
+        for k in range(len(forc['T'])):
+            self.litter += forc['litter'][k]
+            self.tsum += forc['T'][k]
+            self.nday += 1
+            if self.nday == 365:
+                u = self.litter * 1e-3 / C_FRACTION  # g C m-2 -> kg litter m-2
+                CO2, _, _, _ = self.model.decomp_one_timestep(
+                    self.split[0]*u, self.split[1]*u, self.split[2]*u, self.tsum / 365.0)
+                out['C'][k] = 1e3 * self.model.x.sum(axis=0)
+                out['Rh'][k] = 1e3 * CO2
+                self.litter[:] = 0.0
+                self.tsum[:] = 0.0
+                self.nday = 0
+
+
+class DammMember():
+    def __init__(self, para, St, poros):
+        """
+        DAMM reaction velocity from daily mean forcing.
+        Args:
+            para, St, poros - see damm.Damm
+        """
+        self.para = para
+        self.St = St
+        self.poros = poros
+        self.variables = ['R']
+
+    def init(self, n_cells):
+        from damm import Damm
+        self.model = Damm(self.para, self.St, self.poros)
+
+    def advance(self, forc, sh, out):
+        v, _ = self.model.reaction_velocity(sh['TK'], forc['W'])
+        out['R'][:] = 24.0 * v  # h-1 -> d-1
+
+
+class Ensemble():
+    def __init__(self, members, forcing, soilp, param=None, chunk=365,
+                 parallel=True, dtype=float):
+        """
+        Args:
+            members - dict {name: member}, see *Member classes
+            forcing - dict of daily arrays (nsteps, n_cells) with T, W and
+                      litter, or callable(start, stop) returning such a dict
+            soilp - soil parameters (dict) with fc, for the shared terms
+            param - Millennial parameters for shared terms (default millennial.param)
+            chunk - number of timesteps read and processed at a time; with
+                    profiler hooks members advance one step at a time so
+                    that hooks see the state of each step
+            parallel - advance members in threads (not while the profiler
+                       tracks memory)
+            dtype - dtype of forcing, shared terms and outputs
+        """
+        if param is None:
+            from millennial import param
+        self.members = members
+        self.forcing = forcing
+        self.param = param
+        self.soilp = soilp
+        self.chunk = chunk
+        self.parallel = parallel
+        self.dtype = dtype
+
+    def _read(self, start, stop):
+        if callable(self.forcing):
+            forc = self.forcing(start, stop)
+        else:
+            forc = {k: v[start:stop] for k, v in self.forcing.items()}
+        return {k: np.asarray(v, dtype=self.dtype) for k, v in forc.items()}
+
+    def run(self, nsteps, n_cells=None):
+        """
+        Args:
+            nsteps - number of daily timesteps
+            n_cells - number of cells (default: from forcing)
+        Returns:
+            dict {model: {variable: (nsteps, n_cells)}}
+        """
+        if n_cells is None:
+            n_cells = self._read(0, 1)['T'].shape[1]
+        res = {}
+        for name, m in self.members.items():
+            m.init(n_cells)
+            res[name] = {v: np.zeros((nsteps, n_cells), dtype=self.dtype) for v in m.variables}
+
+        # tracemalloc is process-wide: members run in turn when memory is profiled
+        parallel = self.parallel and not (PROFILER.enabled and PROFILER.track_memory)
+        pool = ThreadPoolExecutor(len(self.members)) if parallel else None
+        try:
+            for start in range(0, nsteps, self.chunk):
+                stop = min(start + self.chunk, nsteps)
+                nc = (stop - start) * n_cells
+                with PROFILER.stage('ensemble.forcing', nc):
+                    forc = self._read(start, stop)
+                with PROFILER.stage('ensemble.shared', nc):
+                    sh = shared_terms(forc, self.param, self.soilp, self.dtype)
+                if not PROFILER.hooks:
+                    self._advance_all(pool, forc, sh, res, start, stop, n_cells)
+                    continue
+                for j in range(stop - start):
+                    self._advance_all(pool, {k: v[j:j + 1] for k, v in forc.items()},
+                                      {k: v[j:j + 1] for k, v in sh.items()}, res,
+                                      start + j, start + j + 1, n_cells)
+                    PROFILER.tick('ensemble', res)
+        finally:
+            if pool is not None:
+                pool.shutdown()
+        return res
+
+    def _advance_all(self, pool, forc, sh, res, start, stop, n_cells):
+        """ advances all members over steps start:stop; forc, sh of those steps """
+        nc = (stop - start) * n_cells
+        jobs = []
+        for name, m in self.members.items():
+            out = {v: a[start:stop] for v, a in res[name].items()}
+            if pool is None:
+                self._advance(name, m, forc, sh, out, nc)
+            else:
+                jobs.append(pool.submit(self._advance, name, m, forc, sh, out, nc))
+        for j in jobs:
+            j.result()
+
+    @staticmethod
+    def _advance(name, m, forc, sh, out, nc):
+        with PROFILER.stage('ensemble.' + name, nc):
+            m.advance(forc, sh, out)
+
+    @staticmethod
+    def save(fname, res):
+        """ writes model-indexed results into .npz with keys model/variable """
+        with PROFILER.stage('ensemble.output'):
+            np.savez(fname, **{'%s/%s' % (m, v): a for m, r in res.items()
+                               for v, a in r.items()})
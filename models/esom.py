@@ -8,13 +8,14 @@ Created on Tue Feb 15 12:01:18 2022
 """
 
 import numpy as np
-import matplotlib.pyplot as plt
-from scipy.interpolate import interp1d
+
+from instrument import PROFILER
 
 EPS  = np.finfo(float).eps  # machine epsilon
 NT = 273.15  # 0 degC in Kelvin
 
 def temperature_functions():
+    from scipy.interpolate import interp1d
     t2 = interp1d([-40.,-5., -1, 25., 35., 60.],         # effect of temperature on the decomposition rate
                 [0.,   0.,  0.2, 1.53, 1.53, 0.])
     t3 = interp1d([-40., -3., 0., 7., 60.],
@@ -45,6 +46,7 @@ def pH_from_sfc(sfc):
     return pH
 
 def moisture_functions():
+    from scipy.interpolate import interp1d
     # Description of Romul model Table 2
     phi1236 = interp1d([0.02, 0.05, 0.1,  0.15, 0.2,  0.25, 0.3,  0.35, 0.4, 0.417, 1.333, 1.4, 1.6, 1.8, 2.0, 2.2, 2.4, 2.6, 2.8,4], 
                       [0.0, 0.004, 0.026, 0.074, 0.154, 0.271, 0.432, 0.64,  0.899, 1.0, 1.0, 0.844, 0.508, 0.305, 0.184, 0.111, 0.067, 0.04, 0.024, 0])
@@ -65,6 +67,27 @@ def lignin_corrections(nitrogen = 0.7, lignin = 25.0):
     return  mu_k1, mu_k2, mu_k3
 
 
+def responses(tair, tp_top, tp_middle, tp_bottom, wn, tfuncs=None, mfuncs=None):
+    """
+    Evaluates the temperature and moisture response functions over forcing.
+    Args:
+        tair - air temperature in deg C
+        tp_top, tp_middle, tp_bottom - peat layer temperatures in deg C
+        wn - normalized water content w/wfc
+        tfuncs - temperature functions t2...t7 (default temperature_functions())
+        mfuncs - moisture functions phi1236, phi4, phi5 (default moisture_functions())
+    Returns:
+        dict of arrays: t2...t6 (of tair), t7_top, t7_middle, t7_bottom,
+        phi1236, phi4, phi5 (of wn)
+    """
+    t2, t3, t4, t5, t6, t7 = tfuncs or temperature_functions()
+    phi1236, phi4, phi5 = mfuncs or moisture_functions()
+    return {'t2': t2(tair), 't3': t3(tair), 't4': t4(tair), 't5': t5(tair),
+            't6': t6(tp_top), 't7_top': t7(tp_top), 't7_middle': t7(tp_middle),
+            't7_bottom': t7(tp_bottom), 'phi1236': phi1236(wn), 'phi4': phi4(wn),
+            'phi5': phi5(wn)}
+
+
 def get_rates(ash, N, pH, tair, tp_top, tp_middle, tp_bottom, t2, t3, t4, t5, t6, t7, wn, phi1236, phi4, phi5, peat_w1,peat_w2, peat_w3, H_w):
     """
     Args:
@@ -75,25 +98,45 @@ def get_rates(ash, N, pH, tair, tp_top, tp_middle, tp_bottom, t2, t3, t4, t5, t6
         wn normalaized water content w/wfc
     phi1236, phi4, phi5 moisture functions
     """
-    nu = np.clip(0, 0.701*pH -1.6018 - 0.038*pH**2, 1)   # ph Romul documentation Table 1
-
-    k1= (0.002 + 0.00009*ash + 0.003*N)*min(0.1754*np.exp(0.0871*tair), 1.)*phi1236(wn)*nu # adjusted decomposition rates
-    k2= np.clip((0.00114 -0.00028*N)*t2(tair)*phi1236(wn)*nu, 0., 1.)     #
-    k3= np.clip((0.04 - 0.003*N)*t3(tair)*phi1236(wn), 0., 1.) 
-    k4= 0.005*N*t4(tair)*phi4(wn) 
-    k5= 0.007*t5(tair)*phi5(wn)
-    k6= 0.0006*t6(tp_top)*phi1236(wn) #* 0.5
-    #k6= 0.0006*t6(tp_top)*H_w 
-    
-    #####  THESE can be modified by you
-    k7c = 2.0
-    k8c = 1.0
-    k9c = 1.0
-    ####   UNTIL HERE
+    with PROFILER.stage('esom.modifiers', np.size(tair)):
+        r = responses(tair, tp_top, tp_middle, tp_bottom, wn,
+                      (t2, t3, t4, t5, t6, t7), (phi1236, phi4, phi5))
+    return rates_from_responses(ash, N, pH, tair, r, peat_w1, peat_w2, peat_w3)
 
-    k7= 0.0001*t7(tp_top)*peat_w1 * k7c       #Change this                                # Lappalainen et al 2018, gamma/VfAir slightly decomposed peat
-    k8 = 0.0001*t7(tp_middle)*peat_w2 * k8c                                               # Lappalainen et al. 2018 gamma/VfAir highly decomposed
-    k9 = 0.0001*t7(tp_bottom)*peat_w3 * k9c
 
-    
+def rates_from_responses(ash, N, pH, tair, r, peat_w1, peat_w2, peat_w3):
+    """
+    Decomposition rates from precomputed response functions (see responses
+    and modifiers.esom_modifiers).
+    Args:
+        ash - ash content in gravimetric %
+        N - N content in gravimetric %
+        pH - pH in water solution
+        tair - air temperature in deg C
+        r - dict of evaluated response functions
+        peat_w1, peat_w2, peat_w3 - moisture modifiers of peat layers
+    Returns:
+        (k1, ... k9)
+    """
+    with PROFILER.stage('esom.rates', np.size(tair)):
+        nu = np.clip(0, 0.701*pH -1.6018 - 0.038*pH**2, 1)   # ph Romul documentation Table 1
+
+        k1= (0.002 + 0.00009*ash + 0.003*N)*np.minimum(0.1754*np.exp(0.0871*tair), 1.)*r['phi1236']*nu # adjusted decomposition rates
+        k2= np.clip((0.00114 -0.00028*N)*r['t2']*r['phi1236']*nu, 0., 1.)     #
+        k3= np.clip((0.04 - 0.003*N)*r['t3']*r['phi1236'], 0., 1.) 
+        k4= 0.005*N*r['t4']*r['phi4'] 
+        k5= 0.007*r['t5']*r['phi5']
+        k6= 0.0006*r['t6']*r['phi1236'] #* 0.5
+        #k6= 0.0006*t6(tp_top)*H_w 
+
+        #####  THESE can be modified by you
+        k7c = 2.0
+        k8c = 1.0
+        k9c = 1.0
+        ####   UNTIL HERE
+
+        k7= 0.0001*r['t7_top']*peat_w1 * k7c       #Change this                                # Lappalainen et al 2018, gamma/VfAir slightly decomposed peat
+        k8 = 0.0001*r['t7_middle']*peat_w2 * k8c                                               # Lappalainen et al. 2018 gamma/VfAir highly decomposed
+        k9 = 0.0001*r['t7_bottom']*peat_w3 * k9c
+
     return (k1, k2, k3, k4, k5, k6, k7, k8, k9)
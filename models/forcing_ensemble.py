@@ -0,0 +1,200 @@
+# -*- coding: utf-8 -*-
+"""
+Created on Thu Oct 29 09:20:33 2026
+
+Forcing-ensemble runs for climate-scenario uncertainty.
+
+Climate-model members are an extra axis of forcing and state: pools are
+(n_pools, n_members, n_cells) and one vectorized step advances all members.
+Forcing arrays are (nsteps, n_members, n_cells); a member axis of length 1
+(e.g. litter shared by all members) broadcasts. Ensemble statistics over the
+member axis (mean, spread, min, max, quantiles) are computed online at each
+output step, so member trajectories are never stored.
+
+    res = run_millennial(param, soilp, {'T': T, 'W': W, 'litter': L}, C0,
+                         nsteps=365*30, every=365)
+    res['C']['mean'], res['C']['std'], res['C']['q']   # (n_out, n_cells), (n_q, n_out, n_cells)
+"""
+
+import numpy as np
+
+from coupling import Accumulator
+from instrument import PROFILER
+
+
+class MemberStats():
+    def __init__(self, n_out, shape, kind='last', quantiles=(0.05, 0.5, 0.95)):
+        """
+        statistics over the member axis, recorded once per output step
+        Args:
+            n_out - number of output steps
+            shape - (n_members, n_cells)
+            kind - aggregation of the variable within an output step:
+                   'last' for states, 'sum' for fluxes, 'mean'
+            quantiles - quantiles over members
+        """
+        self.acc = Accumulator(kind, shape)
+        self.quantiles = np.asarray(quantiles, dtype=float)
+        out = (n_out,) + tuple(shape[1:])
+        self.mean = np.full(out, np.nan)
+        self.std = np.full(out, np.nan)
+        self.min = np.full(out, np.nan)
+        self.max = np.full(out, np.nan)
+        self.q = np.full((len(self.quantiles),) + out, np.nan)
+
+    def add(self, x):
+        """ adds a step of member values (n_members, n_cells) """
+        self.acc.add(x)
+
+    def record(self, k):
+        """ reduces the aggregated member values into output step k """
+        x = self.acc.pop()
+        self.mean[k] = x.mean(axis=0)
+        self.std[k] = x.std(axis=0, ddof=1) if len(x) > 1 else 0.0
+        self.min[k] = x.min(axis=0)
+        self.max[k] = x.max(axis=0)
+        if len(self.quantiles):
+            self.q[:, k] = np.quantile(x, self.quantiles, axis=0)
+
+    def as_dict(self):
+        return {'mean': self.mean, 'std': self.std, 'min': self.min, 'max': self.max,
+                'q': self.q, 'quantiles': self.quantiles}
+
+
+def _reader(forcing):
+    if callable(forcing):
+        return forcing
+    return lambda start, stop: {k: v[start:stop] for k, v in forcing.items()}
+
+
+def run_millennial(param, soilp, forcing, C0, nsteps, every=365, split=0.66, chunk=365,
+                   quantiles=(0.05, 0.5, 0.95), n_members=None, n_cells=None):
+    """
+    Millennial over all forcing members at once (daily steps).
+    Args:
+        param - Millennial parameters (dict)
+        soilp - soil parameters (dict); fc scalar or (n_cells,)
+        forcing - dict of daily T (degC), W (m3 m-3), litter (g C m-2 d-1)
+                  arrays (nsteps, n_members or 1, n_cells), or
+                  callable(start, stop) returning such a dict
+        C0 - initial pools (5,), (5, n_cells) or (5, n_members, n_cells)
+        nsteps - number of days
+        every - output step (days)
+        split - fraction of litter to POM, rest to LMWC
+        chunk - days of forcing read at a time
+        quantiles - quantiles over members
+        n_members, n_cells - default from forcing T
+    Returns:
+        dict
+            C - member statistics of total C (g C m-2) at the end of each
+                output step, see MemberStats.as_dict
+            Rh - statistics of heterotrophic respiration summed over each
+                 output step (g C m-2)
+            x - final pools (5, n_members, n_cells)
+    """
+    from millennial import fluxes, update_pools, millennial_param, QMAX
+    from modifiers import millennial_modifiers
+
+    read = _reader(forcing)
+    if n_members is None or n_cells is None:
+        n_members, n_cells = np.shape(read(0, 1)['T'])[1:]
+    shape = (n_members, n_cells)
+    p = dict(param)
+    if p['Qmax'] is None:
+        p['Qmax'] = QMAX
+    dt = p['dt']
+
+    C0 = np.asarray(C0, dtype=float)
+    x = np.empty((5,) + shape)
+    x[:] = C0.reshape((5,) + (1,) * (3 - C0.ndim) + C0.shape[1:])
+
+    n_out = nsteps // every
+    stats = {'C': MemberStats(n_out, shape, 'last', quantiles),
+             'Rh': MemberStats(n_out, shape, 'sum', quantiles)}
+    for start in range(0, nsteps, chunk):
+        stop = min(start + chunk, nsteps)
+        with PROFILER.stage('members.forcing', (stop - start) * x[0].size):
+            f = read(start, stop)
+            env = millennial_modifiers(f['T'], f['W'], p, soilp, cache=None)
+        for j in range(stop - start):
+            p['CUE'] = env['CUE'][j]
+            F = fluxes(x, millennial_param(**p), dt=dt, env_f=env['env_f'][j])
+            L = f['litter'][j]
+            update_pools(x, F, [split * L, (1.0 - split) * L], p['pa'], dt)
+            stats['Rh'].add(dt * (F['Fmr'] + F['Fgr']))
+            stats['C'].add(x.sum(axis=0))
+            k = start + j + 1
+            if k % every == 0:
+                with PROFILER.stage('members.stats', x[0].size):
+                    for s in stats.values():
+                        s.record(k // every - 1)
+            if PROFILER.hooks:
+                PROFILER.tick('members', x)
+    res = {k: s.as_dict() for k, s in stats.items()}
+    res['x'] = x
+    return res
+
+
+def run_yasso(param, forcing, x0, nyears, every=1, split=(1.0, 0.0, 0.0), chunk=100,
+              quantiles=(0.05, 0.5, 0.95), n_members=None, n_cells=None, corrected=False):
+    """
+    Yasso over all forcing members at once (annual steps).
+    Args:
+        param - see yasso.decom_para (None for default)
+        forcing - dict of annual temp (temperature variable) and litter
+                  (g C m-2 yr-1) arrays (nyears, n_members or 1, n_cells), or
+                  callable(start, stop)
+        x0 - initial pools (7,), (7, n_cells) or (7, n_members, n_cells)
+             (kg C m-2)
+        nyears - number of years
+        every - output step (years)
+        split - fractions of litter as non-woody, fine and coarse woody
+        chunk - years of forcing read at a time
+        quantiles - quantiles over members
+        n_members, n_cells - default from forcing temp
+        corrected - see yasso.yasso
+    Returns:
+        dict
+            C - statistics of total C (g C m-2) at the end of each output step
+            CO2 - statistics of respiration summed over each output step
+                  (g C m-2)
+            x - final pools (7, n_members, n_cells)
+    """
+    from yasso import yasso, C_FRACTION
+
+    model = yasso(param, corrected)
+    read = _reader(forcing)
+    if n_members is None or n_cells is None:
+        n_members, n_cells = np.shape(read(0, 1)['temp'])[1:]
+    shape = (n_members, n_cells)
+    n = len(model.x)
+
+    x0 = np.asarray(x0, dtype=float)
+    model.x = np.empty((n,) + shape)
+    model.x[:] = x0.reshape((n,) + (1,) * (3 - x0.ndim) + x0.shape[1:])
+    split = np.asarray(split, dtype=float).reshape(3, 1, 1)
+
+    n_out = nyears // every
+    stats = {'C': MemberStats(n_out, shape, 'last', quantiles),
+             'CO2': MemberStats(n_out, shape, 'sum', quantiles)}
+    for start in range(0, nyears, chunk):
+        stop = min(start + chunk, nyears)
+        with PROFILER.stage('members.forcing', (stop - start) * model.x[0].size):
+            f = read(start, stop)
+        for j in range(stop - start):
+            # g C m-2 -> kg litter m-2
+            u = split * (np.broadcast_to(f['litter'][j], shape) * 1e-3 / C_FRACTION)
+            CO2, _, _, _ = model.decomp_one_timestep(u[0], u[1], u[2],
+                                                     np.broadcast_to(f['temp'][j], shape))
+            stats['CO2'].add(1e3 * CO2)
+            stats['C'].add(1e3 * model.x.sum(axis=0))
+            k = start + j + 1
+            if k % every == 0:
+                with PROFILER.stage('members.stats', model.x[0].size):
+                    for s in stats.values():
+                        s.record(k // every - 1)
+            if PROFILER.hooks:
+                PROFILER.tick('members', model.x)
+    res = {k: s.as_dict() for k, s in stats.items()}
+    res['x'] = model.x
+    return res
@@ -11,14 +11,18 @@ A two-pool model for soil C parameterized for Swedish agricultural soils.
 
 Samuli Launiainen 20.11.2018
 
+The model is declared as a linear compartmental system (see linear.py) and
+solved exactly between time points; pools and parameters may be arrays of
+sites.
+
 TODO:
     Include environmental effects
-    Make forward Euler solution for vectors.
 """
 
 import numpy as np
-from scipy.integrate import odeint
-import matplotlib.pyplot as plt
+
+from linear import LinearSystem
+from instrument import PROFILER
 
 EPS  = np.finfo(float).eps  # machine epsilon
 NT = 273.15  # 0 degC in Kelvin
@@ -26,6 +30,12 @@ NP = 101300.0  # Pa, sea level normal pressure
 R = 8.314462175  # J mol-1 K-1, universal gas constant
 O2_IN_AIR = 0.209 # volume fraction of O2 in free air
 
+# default parameters, 'fallow' of Andren & Kätterer 1997
+param = {'ky': 0.8,      # yr-1
+         'ko': 6.05e-3,  # yr-1
+         'h': 0.13       # -
+         }
+
 class model():
     def __init__(self, para, ini, gridded=False):
         """
@@ -38,6 +48,8 @@ class model():
         
         self.Y = ini['Y']       # initial Y-pool
         self.O = ini['O']       # initial O-pool
+        
+        self.system = icbm_system(para)
         #self.fT = 1.0           # decomposition modifier (-) for temperature
         #self.fW = 1.0           # decomposition modifier (-) for moisture
         
@@ -49,38 +61,55 @@ class model():
         point will be returned.
         Args:
             t - time (floar or array)
-            I - inputs to Y pool (scalar or array)
-            fenv - environmental modifier (-) for temperature and moisture
+            I - inputs to Y pool; scalar, per time point (nsteps,) or per time
+                point and site (nsteps, sites...)
+            fenv - environmental modifier (-) for temperature and moisture;
+                   as I
         """
-        # massage inputs to arrays if they are not
+        # massage inputs to arrays (nsteps, sites...) if they are not
         t = np.array(t, ndmin=1)
-        I = I*np.ones(np.shape(t))
-        
-        # environmental modifier (-)        
-        fenv = fenv*np.ones(np.shape(t))
-        
         nsteps = len(t)
+        I, fenv = [np.full(nsteps, a, dtype=float) if np.ndim(a) == 0
+                   else np.asarray(a, dtype=float) for a in (I, fenv)]
+        sites = np.broadcast_shapes(np.shape(self.Y), np.shape(self.O), I.shape[1:],
+                                    fenv.shape[1:])
+        I, fenv = [np.broadcast_to(a.reshape(a.shape + (1,) * (1 + len(sites) - a.ndim)),
+                                   (nsteps,) + sites) for a in (I, fenv)]
+
+        x = np.array(np.broadcast_arrays(self.Y, self.O, np.zeros(sites))[:2], dtype=float)
         # results
-        C = np.zeros((2, nsteps)) # pools, nsteps
-        C[0,0] = self.Y
-        C[1,0] = self.O
+        C = np.zeros((2, nsteps) + x.shape[1:]) # pools, nsteps, sites
+        C[:,0] = x
 
         for m in range(1,nsteps):
-            k = [self.ky * fenv[m], self.ko * fenv[m]]
-            x0 = [self.Y, self.O]
-            tspan = [t[m-1], t[m]] # this must be list of successive time points!
-            x = odeint(time_derivative, x0, tspan, args=(I[m], k, self.h)) 
-            #x, out = odeint(time_derivative, x0, tspan, args=(I[m], k, self.h), full_output=True) 
+            # exact solution over [t[m-1], t[m]] for constant I and fenv
+            with PROFILER.stage('icbm.step', x[0].size):
+                xi = fenv[m][None, ...] if np.ndim(fenv[m]) else fenv[m]  # per site
+                x = self.system.step(x, I[m], xi, dt=t[m] - t[m-1])
  
             # update output and model state
-            C[0,m] = x[1,0]
-            C[1,m] = x[1,1]
+            C[:,m] = x
+            if PROFILER.hooks:
+                PROFILER.tick('icbm', x)
             
-            self.Y = x[1,0]
-            self.O = x[1,1]
+        self.Y = x[0]
+        self.O = x[1]
         return C
 
 
+def icbm_system(para):
+    """
+    ICBM as linear compartmental system: Y --(h)--> O
+    Args:
+        para - dict with ky, ko (yr-1), scalars or arrays of sites, and h (-)
+    Returns:
+        linear.LinearSystem
+    """
+    k = np.array(np.broadcast_arrays(para['ky'], para['ko']), dtype=float)
+    return LinearSystem(k, transfers={(0, 1): para['h']}, inputs=[1.0, 0.0],
+                        names=['Y', 'O'])
+
+
 def time_derivative(x, t, I, k, h):
     """
     returns time derivative of C pools in format suitable for scipy.odeint
@@ -96,62 +125,4 @@ def time_derivative(x, t, I, k, h):
     # x[0] = Y, x[1] = O
     dydt = I -k[0]*x[0]
     dodt = h*k[0]*x[0] - k[1]*x[1]
-    return [dydt, dodt] 
-
-def test():
-    # test ICBM for scenarios 'fallow' and '+N+straw'
-    para = {
-            'fallow': 
-                {'ky': 0.8,      # yr-1
-                 'ko': 6.05e-3,  # yr-1
-                 'h': 0.13       # -
-                 },
-            'N_straw':
-                {'ky': 0.8,      # yr-1
-                 'ko': 6.05e-3,  # yr-1
-                 'h': 0.125       # -
-                 }
-            }
-                
-    ini = {'fallow': {'Y': 0.3, 'O': 3.96}, # kg C m-3
-           'N_straw': {'Y': 0.3, 'O': 4.11}
-           }
-    litter = {'fallow': 0.0, 'N_straw': 0.285} # kg C a-1
-    
-    # create model instances
-    run1 = model(para['fallow'], ini['fallow'])
-    run2 = model(para['N_straw'], ini['N_straw'])
-    
-    n = 40 # yr
-    t = np.linspace(0, n)
-    
-    # run models and return results
-    C1 = run1.compute(t, I=litter['fallow'], fenv=1.32)
-    C2 = run2.compute(t, I=litter['N_straw'], fenv=1.0)
-    
-    # plot figure()
-    plt.figure()
-    
-    plt.subplot(121)
-    plt.plot(t, C1[0], label='Y')
-    plt.plot(t, C1[1], label='O')
-    plt.plot(t, C1[0]+C1[1], label='Y+O')
-    plt.plot(t[[0,-1]], [litter['fallow'], litter['fallow']], 'r--', label='L (kgCa-1)')
-    # plt.legend()
-    plt.xlabel('t (yr)')
-    plt.ylabel('C pools (kg C m-3)')
-    plt.title('fallow')
-
-    plt.subplot(122)
-    plt.plot(t, C2[0], label='Y')
-    plt.plot(t, C2[1], label='O')
-    plt.plot(t, C2[0]+C2[1], label='Y+O')
-    plt.plot(t[[0,-1]], [litter['N_straw'], litter['N_straw']], 'r--', label='L (kgCa-1)')
-    plt.legend()
-    plt.xlabel('t (yr)')
-    plt.ylabel('C pools (kgC m-3)')
-    plt.title('+N+Straw')
-    
-    plt.show()
-    #plt.savefig('ICBM_test.png', dpi=300)
-    
+    return [dydt, dodt]
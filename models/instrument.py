@@ -0,0 +1,217 @@
+# -*- coding: utf-8 -*-
+"""
+Created on Wed Oct 21 13:20:44 2026
+
+Opt-in instrumentation of the model loops.
+
+Model loops wrap their stages (forcing I/O, environmental modifiers, fluxes,
+state update, output) in PROFILER.stage(...). When the profiler is disabled
+(default) stage() returns a shared no-op context manager, so the cost is one
+attribute lookup and call per stage.
+
+Memory is measured with tracemalloc, which is process-wide: nested stages
+pass their peaks on to the enclosing stage, and stages that overlap stages
+of other threads are not measured (counted as unmeasured in the summary).
+
+    import instrument
+    instrument.enable(track_memory=True)
+    instrument.PROFILER.add_hook(lambda src, k, state: print(src, k), every=365)
+    ... run models ...
+    print(instrument.PROFILER.summary())
+    instrument.PROFILER.export_trace('trace.json')  # chrome://tracing format
+"""
+
+import os
+import json
+import time
+import threading
+import tracemalloc
+
+
+class _NullStage():
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        return False
+
+
+_NULL = _NullStage()
+
+
+class _Stage():
+    __slots__ = ('prof', 'name', 'n_cells', 't0', 'm0', 'peak', 'parent', 'tid', 'shared')
+
+    def __init__(self, prof, name, n_cells):
+        self.prof = prof
+        self.name = name
+        self.n_cells = n_cells
+
+    def __enter__(self):
+        if self.prof.track_memory:
+            self.prof._mem_enter(self)
+        self.t0 = time.perf_counter()
+        return self
+
+    def __exit__(self, *args):
+        t1 = time.perf_counter()
+        nbytes = 0
+        if self.prof.track_memory:
+            nbytes = self.prof._mem_exit(self)
+        self.prof.record(self.name, self.t0, t1, self.n_cells, nbytes)
+        return False
+
+
+class Profiler():
+    def __init__(self, max_events=100000):
+        """
+        Per-stage timers, call counts, allocated bytes and throughput.
+        Args:
+            max_events - max. number of trace events kept for export
+        """
+        self.enabled = False
+        self.track_memory = False
+        self.max_events = max_events
+        self.hooks = []
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        self.stats = {}    # name: [calls, time, cells, bytes]
+        self.events = []
+        self.counts = {}   # steps per hook source
+        self.unmeasured = 0  # stages whose memory overlapped other threads
+        self._open = []    # stages with memory tracking, all threads
+        self._t0 = time.perf_counter()
+
+    def _mem_enter(self, st):
+        with self._lock:
+            cur, peak = tracemalloc.get_traced_memory()
+            st.tid = threading.get_ident()
+            st.parent = None
+            st.shared = False
+            for s in self._open:
+                if s.tid == st.tid:
+                    st.parent = s
+                else:
+                    s.shared = st.shared = True
+            # peak so far belongs to the enclosing stage; reset_peak wipes it
+            if st.parent is not None:
+                st.parent.peak = max(st.parent.peak, peak)
+            self._open.append(st)
+            tracemalloc.reset_peak()
+            st.m0 = st.peak = cur
+
+    def _mem_exit(self, st):
+        """ bytes allocated at peak within the stage; None if not measured """
+        with self._lock:
+            st.peak = max(st.peak, tracemalloc.get_traced_memory()[1])
+            self._open.remove(st)
+            if st.parent is not None:
+                st.parent.peak = max(st.parent.peak, st.peak)
+        return None if st.shared else max(st.peak - st.m0, 0)
+
+    def stage(self, name, n_cells=0):
+        """
+        context manager timing a stage
+        Args:
+            name - stage name, e.g. 'millennial.fluxes'
+            n_cells - number of cells processed (for throughput)
+        """
+        if not self.enabled:
+            return _NULL
+        return _Stage(self, name, n_cells)
+
+    def record(self, name, t0, t1, n_cells=0, nbytes=0):
+        with self._lock:
+            s = self.stats.get(name)
+            if s is None:
+                s = self.stats[name] = [0, 0.0, 0, 0]
+            s[0] += 1
+            s[1] += t1 - t0
+            s[2] += n_cells
+            if nbytes is None:
+                self.unmeasured += 1
+            else:
+                s[3] += nbytes
+            if len(self.events) < self.max_events:
+                self.events.append((name, t0, t1, threading.get_ident(), n_cells))
+
+    def add_hook(self, fn, every=1):
+        """
+        registers fn(source, step, state) called every N steps of a model loop
+        """
+        self.hooks.append((fn, every))
+
+    def clear_hooks(self):
+        self.hooks = []
+
+    def tick(self, source, state=None):
+        """
+        called by model loops once per step; runs hooks that are due
+        Args:
+            source - model name
+            state - model object or state array passed to hooks
+        """
+        with self._lock:
+            k = self.counts.get(source, 0) + 1
+            self.counts[source] = k
+        for fn, every in self.hooks:
+            if k % every == 0:
+                fn(source, k, state)
+
+    def summary(self):
+        """
+        text report of stages sorted by total time
+        """
+        tot = sum(s[1] for s in self.stats.values()) or 1.0
+        lines = ['%-30s %9s %10s %10s %6s %10s %12s' % ('stage', 'calls', 'total s',
+                                                      'mean ms', '%', 'alloc MB', 'cells/s')]
+        for name, (n, t, c, b) in sorted(self.stats.items(), key=lambda x: -x[1][1]):
+            lines.append('%-30s %9d %10.4f %10.4f %6.1f %10.2f %12.4g'
+                         % (name, n, t, 1e3 * t / n, 100 * t / tot, b / 1e6,
+                            c / t if t > 0 and c else 0.0))
+        if self.unmeasured:
+            lines.append('memory of %d stages not measured (overlapping threads)'
+                         % self.unmeasured)
+        return '\n'.join(lines)
+
+    def as_dict(self):
+        return {name: {'calls': n, 'time': t, 'cells': c, 'bytes': b,
+                       'cells_per_s': c / t if t > 0 else None}
+                for name, (n, t, c, b) in self.stats.items()}
+
+    def export_trace(self, fname):
+        """
+        writes stage events and summary as JSON in Chrome trace event format
+        """
+        pid = os.getpid()
+        ev = [{'name': name, 'ph': 'X', 'pid': pid, 'tid': tid,
+               'ts': 1e6 * (t0 - self._t0), 'dur': 1e6 * (t1 - t0),
+               'args': {'n_cells': n}}
+              for name, t0, t1, tid, n in self.events]
+        with open(fname, 'w') as f:
+            json.dump({'traceEvents': ev, 'summary': self.as_dict()}, f)
+
+
+# profiler used by the model loops; disabled by default
+PROFILER = Profiler()
+
+
+def enable(track_memory=False):
+    """
+    enables PROFILER; track_memory uses tracemalloc for allocated bytes
+    """
+    PROFILER.track_memory = track_memory
+    if track_memory and not tracemalloc.is_tracing():
+        tracemalloc.start()
+    PROFILER.enabled = True
+
+
+def disable():
+    PROFILER.enabled = False
+    if PROFILER.track_memory and tracemalloc.is_tracing():
+        tracemalloc.stop()
+    PROFILER.track_memory = False
@@ -0,0 +1,182 @@
+# -*- coding: utf-8 -*-
+"""
+Created on Mon Nov  2 09:12:48 2026
+
+Radiocarbon tracer pools alongside bulk carbon.
+
+Tracer pools are an extra stacked axis of the state: x (2, n_pools, cells...)
+with x[0] bulk C and x[1] 14C expressed as fraction-modern-weighted C
+(x14 = Fm * x, so Fm = 1 for modern carbon). Fluxes are computed once from
+bulk C; each tracer flux is the bulk flux times the 14C/C ratio of its source
+pool, and both axes are updated in one pool update. Tracer pools decay with
+lambda = ln2 / 5730 yr-1, and inputs carry the atmospheric 14C of their year.
+
+    atm = AtmosphericCurve(years, delta14c, kind='delta')
+    x = stack(C0, Fm0=1.0)
+    for each day:
+        F, R14 = millennial_step(x, p, env_f, F_in, atm(year))
+    delta = to_delta14c(fraction_modern(x), year)
+"""
+
+import numpy as np
+
+LAMBDA14 = np.log(2.0) / 5730.0  # 14C decay constant (yr-1)
+LIBBY = 8267.0  # Libby mean life (yr) used in reporting delta 14C
+
+# source pool of each Millennial flux (Flm is handled by its sign)
+MILLENNIAL_SOURCES = {'Fpl': 0, 'Fpa': 0, 'Fa': 3, 'Flb': 1, 'Fbm': 2, 'Fl': 1,
+                      'Fma': 4, 'Fmr': 2, 'Fgr': 1}
+
+
+def to_delta14c(Fm, year):
+    """ delta 14C (per mil) from fraction modern, age-corrected to year """
+    return 1e3 * (np.asarray(Fm) * np.exp((1950.0 - np.asarray(year)) / LIBBY) - 1.0)
+
+
+def to_fraction_modern(delta, year):
+    """ fraction modern from delta 14C (per mil) of year """
+    return (1.0 + 1e-3 * np.asarray(delta)) * np.exp(-(1950.0 - np.asarray(year)) / LIBBY)
+
+
+class AtmosphericCurve():
+    def __init__(self, years=(0.0,), values=(1.0,), kind='fm'):
+        """
+        atmospheric 14C input curve, linearly interpolated in time and
+        constant beyond its ends. Default is constant pre-bomb Fm = 1.
+        Args:
+            years - years (decimal)
+            values - fraction modern ('fm') or delta 14C per mil ('delta')
+            kind - 'fm' or 'delta'
+        """
+        years = np.asarray(years, dtype=float)
+        values = np.asarray(values, dtype=float)
+        if kind == 'delta':
+            values = to_fraction_modern(values, years)
+        self.years = years
+        self.fm = values
+
+    @classmethod
+    def from_file(cls, fname, kind='delta', skiprows=0):
+        """ reads a two-column text file (year, value) """
+        d = np.loadtxt(fname, skiprows=skiprows)
+        return cls(d[:, 0], d[:, 1], kind)
+
+    def __call__(self, year):
+        """ fraction modern of atmospheric CO2 at year """
+        return np.interp(year, self.years, self.fm)
+
+
+def stack(x0, Fm0=1.0):
+    """
+    stacked bulk and tracer pools (2, n_pools, cells...) from bulk pools
+    x0 (n_pools, cells...) and initial fraction modern (scalar or per pool)
+    """
+    x0 = np.asarray(x0, dtype=float)
+    Fm0 = np.asarray(Fm0, dtype=float)
+    if Fm0.ndim == 1 and len(Fm0) == len(x0):
+        Fm0 = Fm0.reshape((-1,) + (1,) * (x0.ndim - 1))
+    return np.stack([x0, Fm0 * x0])
+
+
+def fraction_modern(x):
+    """ fraction modern of stacked pools, (n_pools, cells...) """
+    return x[1] / np.where(x[0] != 0.0, x[0], np.nan)
+
+
+def _ratio(x):
+    """ 14C/C ratio of pools, 0 for empty pools """
+    return np.divide(x[1], x[0], out=np.zeros_like(x[1]), where=x[0] != 0.0)
+
+
+def millennial_step(x, p, env_f, F_in, Fm_in, dt=1.0, lam=LAMBDA14 / 365.0):
+    """
+    Millennial step of stacked bulk and tracer pools, in place. Bulk fluxes
+    are computed once; tracer fluxes are the bulk fluxes times the 14C/C
+    ratio of their source pools.
+    Args:
+        x - stacked pools (2, 5, cells...) (g C m-2), see stack
+        p - parameters (namedtuple millennial_param)
+        env_f - environmental modifier
+        F_in - litter input to POM and LMWC (g C m-2 timestep-1)
+        Fm_in - fraction modern of the litter input
+        dt - timestep (d)
+        lam - decay constant per time unit of dt (d-1)
+    Returns:
+        F - bulk fluxes (dict), see millennial.fluxes
+        R14 - respired tracer (timestep-1), Fmr and Fgr weighted by the
+              ratios of their source pools
+    """
+    from millennial import fluxes, update_pools
+
+    xb, xt = x
+    F = fluxes(xb, p, dt=dt, env_f=env_f)
+    r = _ratio(x)
+    F14 = {k: F[k] * r[j] for k, j in MILLENNIAL_SOURCES.items()}
+    # Flm is sorption L -> M when positive and desorption M -> L when negative
+    F14['Flm'] = F['Flm'] * np.where(F['Flm'] >= 0.0, r[1], r[4])
+    R14 = F14['Fmr'] + F14['Fgr']
+
+    update_pools(xb, F, F_in, p.pa, dt)
+    update_pools(xt, F14, [Fm_in * F_in[0], Fm_in * F_in[1]], p.pa, dt)
+    xt *= np.exp(-lam * dt)
+    return F, R14
+
+
+def linear_step(system, x, I, Fm_in, xi=1.0, dt=1.0, method='expm', lam=LAMBDA14):
+    """
+    linear.LinearSystem step of stacked bulk and tracer pools. Bulk and
+    tracer are advanced in one call as sites of the same system (sharing its
+    cached propagators); tracer decay is applied in two half steps around it
+    (second-order accurate).
+    Args:
+        system - linear.LinearSystem (e.g. icbm.icbm_system, yasso.yasso_system)
+        x - stacked pools (2, n, sites...)
+        I - input streams (see LinearSystem.input); scalar, (sites...) or
+            (n_streams, sites...)
+        Fm_in - fraction modern of the inputs
+        xi - environmental scaling (see LinearSystem.step); scalar, (n, 1...),
+             (1, sites...) or (n, sites...)
+        dt - timestep
+        method - see LinearSystem.step
+        lam - decay constant per time unit of dt
+    Returns:
+        x at t + dt
+    """
+    nsites = x.ndim - 2
+    I = np.asarray(I, dtype=float)
+    if system.B.shape[1] == 1 and I.ndim <= nsites:
+        I = I[None, ...]
+    I = I.reshape(I.shape + (1,) * (1 + nsites - I.ndim))[:, None, ...]
+    Is = np.concatenate(np.broadcast_arrays(I, I * np.asarray(Fm_in, dtype=float)), axis=1)
+
+    xi = np.asarray(xi, dtype=float)
+    if xi.ndim > 0:
+        xi = xi[:, None, ...]  # same scaling for bulk and tracer
+
+    d = np.exp(-0.5 * lam * dt)
+    xs = np.moveaxis(x, 0, 1) * np.array([1.0, d]).reshape((2,) + (1,) * nsites)
+    xs = system.step(xs, Is, xi, dt=dt, method=method)
+    xs[:, 1] *= d
+    return np.moveaxis(xs, 1, 0)
+
+
+def linear_steady_state(system, I, Fm_in, xi=1.0, x=None, lam=LAMBDA14):
+    """
+    steady-state bulk and tracer pools (2, n, sites...) of a linear system
+    under constant inputs of constant fraction modern; the tracer system is
+    A - lam I, i.e. decay adds to the loss of every pool
+    Args:
+        system, I, xi, x - see linear.LinearSystem.steady_state
+        Fm_in - fraction modern of the inputs
+        lam - decay constant per time unit of the system rates
+    """
+    xs = system.steady_state(I, xi, x)
+    A = system.matrix(xi, xs) - lam * np.eye(system.n)
+    u = system.input(I, xs) * np.asarray(Fm_in, dtype=float)
+    uf = np.broadcast_to(u.reshape(u.shape + (1,) * (xs.ndim - u.ndim)),
+                         xs.shape).reshape(system.n, -1)
+    if A.ndim == 2:
+        x14 = np.linalg.solve(-A, uf)
+    else:
+        x14 = np.linalg.solve(-A, uf.T[..., None])[..., 0].T
+    return np.stack([xs, x14.reshape(xs.shape)])
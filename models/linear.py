@@ -0,0 +1,309 @@
+# -*- coding: utf-8 -*-
+"""
+Created on Mon Oct 19 13:05:47 2026
+
+Generic linear compartmental model engine (cf. SoilR; Sierra et al. 2012 GMD).
+
+A model is declared by pool decomposition rates k, transfer fractions between
+pools and allocation of external inputs to pools:
+
+    dx/dt = B I + A(t) x,   A = T diag(k * xi(t))
+
+where T has -1 on the diagonal and transfer fractions T[dst, src] off the
+diagonal, and xi (-) is the environmental scaling of the rates. 1 - sum of
+transfer fractions out of a pool is respired.
+
+Pools are the first axis of the state; any trailing axes are sites:
+x.shape = (n_pools, n_sites) or (n_pools,) for a single site. The scaling xi
+is a scalar or has the dimensions of the state, so its axes are explicit:
+(n, 1) scales pools, (1, n_sites) scales sites and (n, n_sites) both.
+
+    icbm = LinearSystem(k=[ky, ko], transfers={(0, 1): h}, inputs=[1.0, 0.0])
+    x = icbm.step(x, I, xi=fenv[None, :], dt=1.0)
+"""
+
+import numpy as np
+
+
+class LinearSystem():
+    def __init__(self, k, transfers, inputs, names=None):
+        """
+        Args:
+            k - decomposition rates of pools (n,) or (n, n_sites) (time-1)
+            transfers - dict {(src, dst): fraction} of decomposed mass of
+                        pool src transferred to pool dst (-)
+            inputs - allocation of external input streams to pools,
+                     (n,) for a single stream or (n, n_streams) (-)
+            names - list of pool names
+        """
+        self.k = np.asarray(k, dtype=float)
+        self.n = len(self.k)
+
+        T = -np.eye(self.n)
+        for (src, dst), f in transfers.items():
+            T[dst, src] += f
+        self.T = T
+        self.transfers = dict(transfers)
+
+        B = np.asarray(inputs, dtype=float)
+        self.B = B.reshape(self.n, -1)
+        self.names = names if names is not None else [str(j) for j in range(self.n)]
+
+        # respired fraction of decomposed mass of each pool (-)
+        self.respired = -self.T.sum(axis=0)
+
+        self._cache = {}  # propagators of site-invariant systems
+
+    def _xi(self, xi, ndim):
+        """
+        environmental scaling as array; scalar or of the state ndim, with
+        axis 0 of length 1 (same for all pools) or n
+        """
+        xi = np.asarray(xi, dtype=float)
+        if xi.ndim not in (0, ndim) or (xi.ndim > 0 and xi.shape[0] not in (1, self.n)):
+            raise ValueError('xi of shape %s does not match a state of %d dims: use a scalar, '
+                             '(n, 1...) per pool, (1, sites...) per site or (n, sites...)'
+                             % (xi.shape, ndim))
+        return xi
+
+    def _kx(self, xi, shp):
+        """
+        decomposition rates k * xi for state shape shp
+        Returns:
+            (n,) if the same for all sites, else (n, m) with sites flattened
+        """
+        xi = self._xi(xi, len(shp))
+        if self.k.ndim == 1 and all(s == 1 for s in xi.shape[1:]):
+            return self.k * xi.reshape(-1)
+        k = self.k.reshape(self.k.shape + (1,) * (len(shp) - self.k.ndim))
+        return np.broadcast_to(k * xi, shp).reshape(self.n, -1)
+
+    def rates(self, xi=1.0, x=None):
+        """
+        decomposition rates scaled by environment, k * xi
+        Args:
+            xi - environmental scaling
+            x - pools; gives the state shape (default: sites of xi)
+        """
+        shp = np.shape(x) if x is not None else (self.n,) + np.shape(xi)[1:]
+        kx = self._kx(xi, shp)
+        if kx.ndim == 1:
+            return kx.reshape((self.n,) + (1,) * (len(shp) - 1))
+        return kx.reshape(shp)
+
+    def matrix(self, xi=1.0, x=None):
+        """
+        compartmental matrix A = T diag(k * xi)
+        Args:
+            xi - environmental scaling
+            x - pools; gives the state shape (default: sites of xi)
+        Returns:
+            A (n, n) or (n_sites, n, n) if rates differ between sites
+        """
+        shp = np.shape(x) if x is not None else (self.n,) + np.shape(xi)[1:]
+        return self._matrix(self._kx(xi, shp))
+
+    def _matrix(self, kx):
+        if kx.ndim == 1:
+            return self.T * kx[None, :]
+        return self.T[None, :, :] * kx.T[:, None, :]
+
+    def input(self, I, x=None):
+        """
+        external inputs to pools u = B I
+        Args:
+            I - input streams; (n_streams, sites...) or, for one stream,
+                scalar or (sites...)
+        Returns:
+            u (n,) or (n, sites...)
+        """
+        I = np.asarray(I, dtype=float)
+        s = self.B.shape[1]
+        if s == 1 and (I.ndim == 0 or I.shape[0] != 1 or
+                       (x is not None and I.ndim == np.ndim(x) - 1)):
+            I = I[None, ...]
+        u = np.tensordot(self.B, I, axes=1)
+        if x is not None and u.ndim < np.ndim(x):
+            u = u.reshape(u.shape + (1,) * (np.ndim(x) - u.ndim))
+        return u
+
+    def derivative(self, x, I=0.0, xi=1.0):
+        """
+        dx/dt = B I + A x
+        """
+        x = np.asarray(x, dtype=float)
+        kx = self.rates(xi, x)
+        d = kx * x
+        return self.input(I, x) + np.tensordot(self.T, d, axes=1)
+
+    def fluxes(self, x, xi=1.0):
+        """
+        decomposition, respiration and transfer fluxes
+        Args:
+            x - pools (n, sites...)
+            xi - environmental scaling
+        Returns:
+            dict of arrays (pool units time-1)
+                decomposition - k * xi * x of each pool
+                respiration - respired part of decomposition of each pool
+                transfer - dict {(src, dst): flux}
+        """
+        x = np.asarray(x, dtype=float)
+        d = self.rates(xi, x) * x
+        resp = self.respired.reshape((self.n,) + (1,) * (d.ndim - 1)) * d
+        trans = {key: f * d[key[0]] for key, f in self.transfers.items()}
+        return {'decomposition': d, 'respiration': resp, 'transfer': trans}
+
+    def _eigen(self):
+        """
+        eigendecomposition of A0 = T diag(k), cached; None if k differs
+        between sites or A0 is not diagonalizable
+        """
+        if 'eig' not in self._cache:
+            E = None
+            if self.k.ndim == 1:
+                lam, V = np.linalg.eig(self.T * self.k[None, :])
+                if np.linalg.cond(V) < 1e8:
+                    E = (lam, V, np.linalg.inv(V))
+            self._cache['eig'] = E
+        return self._cache['eig']
+
+    def _propagators(self, A, dt):
+        """
+        exact propagators over dt for constant A and u:
+            Phi = exp(A dt), Psi = int_0^dt exp(A s) ds
+        computed from the exponential of [[A, I], [0, 0]] * dt
+        """
+        from scipy.linalg import expm
+
+        n = self.n
+        shp = A.shape[:-2]
+        M = np.zeros(shp + (2*n, 2*n))
+        M[..., :n, :n] = A * dt
+        M[..., :n, n:] = np.eye(n) * dt
+        E = expm(M)
+        return E[..., :n, :n], E[..., :n, n:]
+
+    def step(self, x, I=0.0, xi=1.0, dt=1.0, method='expm'):
+        """
+        advances pools over timestep dt with constant inputs and scaling.
+        Args:
+            x - pools (n,) or (n, sites...)
+            I - input streams (see input)
+            xi - environmental scaling; scalar, (n, 1...), (1, sites...) or
+                 (n, sites...)
+            dt - timestep (time)
+            method - 'expm' (exact), 'implicit' (backward Euler) or
+                     'explicit' (forward Euler)
+        Returns:
+            x at t + dt
+        """
+        x = np.asarray(x, dtype=float)
+        u = self.input(I, x)
+        shp = np.broadcast_shapes(x.shape, u.shape)
+
+        if method == 'explicit':
+            return x + dt * (u + np.tensordot(self.T, self.rates(xi, x) * x, axes=1))
+
+        xf = np.broadcast_to(x, shp).reshape(self.n, -1)
+        uf = np.broadcast_to(u, shp).reshape(self.n, -1)
+
+        xi = self._xi(xi, len(shp))
+        if method == 'expm' and self.k.ndim == 1 and xi.ndim > 1 and xi.shape[0] == 1 and \
+                self._eigen() is not None:
+            # per-site scaling of all rates: A = xi A0, use eigenvectors of A0
+            lam, V, Vinv = self._eigen()
+            s = np.broadcast_to(xi, (1,) + shp[1:])
+            ls = lam[:, None] * s.reshape(1, -1) * dt
+            e = np.expm1(ls)
+            psi = np.where(ls != 0.0, e / np.where(ls != 0.0, ls, 1.0), 1.0) * dt
+            out = V @ ((e + 1.0) * (Vinv @ xf) + psi * (Vinv @ uf))
+            return np.real(out).reshape(shp)
+
+        kx = self._kx(xi, shp)
+        A = self._matrix(kx)
+
+        if method == 'expm':
+            if kx.ndim == 1:
+                # same system at all sites: reuse propagators
+                key = (dt, kx.tobytes())
+                P = self._cache.get(key)
+                if P is None:
+                    P = self._propagators(A, dt)
+                    if len(self._cache) >= 256:
+                        self._cache = {'eig': self._cache.get('eig')}
+                    self._cache[key] = P
+                Phi, Psi = P
+                out = Phi @ xf + Psi @ uf
+            else:
+                Phi, Psi = self._propagators(A, dt)
+                out = (np.einsum('mij,jm->im', Phi, xf) +
+                       np.einsum('mij,jm->im', Psi, uf))
+        elif method == 'implicit':
+            # (I - dt A) x1 = x0 + dt u
+            M = np.eye(self.n) - dt * A
+            rhs = xf + dt * uf
+            if kx.ndim == 1:
+                out = np.linalg.solve(M, rhs)
+            else:
+                out = np.linalg.solve(M, rhs.T[..., None])[..., 0].T
+        else:
+            raise ValueError('unknown method: %s' % method)
+        return out.reshape(shp)
+
+    def run(self, x0, I, xi=1.0, dt=1.0, method='expm'):
+        """
+        runs the system over nsteps.
+        Args:
+            x0 - initial pools (n,) or (n, sites...)
+            I - input streams per step; first axis is time
+            xi - environmental scaling per step (first axis time) or scalar
+            dt - timestep
+            method - see step
+        Returns:
+            dict
+                x - pools (n, nsteps + 1, sites...)
+                R - respiration during each step (nsteps, sites...)
+        """
+        x = np.asarray(x0, dtype=float)
+        I = np.asarray(I, dtype=float)
+        xi = np.asarray(xi, dtype=float)
+        nsteps = len(I)
+
+        X = np.zeros((self.n, nsteps + 1) + x.shape[1:])
+        R = np.zeros((nsteps,) + x.shape[1:])
+        X[:, 0] = x
+        for m in range(nsteps):
+            xm = xi[m] if xi.ndim > 0 else xi
+            x1 = self.step(x, I[m], xm, dt=dt, method=method)
+            # respiration from mass balance
+            R[m] = dt * self.input(I[m], x).sum(axis=0) - (x1.sum(axis=0) - x.sum(axis=0))
+            X[:, m + 1] = x1
+            x = x1
+        return {'x': X, 'R': R}
+
+    def steady_state(self, I, xi=1.0, x=None):
+        """
+        steady-state pools x* = -A^-1 B I
+        Args:
+            I - input streams (see input)
+            xi - environmental scaling (see step)
+            x - any array of the state shape (n, sites...); needed only if
+                neither I nor xi has the site dimensions
+        Returns:
+            x* (n,) or (n, sites...)
+        """
+        u = self.input(I, x)
+        shp = u.shape if x is None else np.broadcast_shapes(u.shape, np.shape(x))
+        xi = np.asarray(xi, dtype=float)
+        if xi.ndim > len(shp):
+            shp = shp + (1,) * (xi.ndim - len(shp))  # sites given by the scaling
+        if xi.ndim > 0:
+            shp = np.broadcast_shapes(shp, (1,) + xi.shape[1:])
+        uf = np.broadcast_to(u.reshape(u.shape + (1,) * (len(shp) - u.ndim)),
+                             shp).reshape(self.n, -1)
+        kx = self._kx(xi, shp)
+        A = self._matrix(kx)
+        if kx.ndim == 1:
+            return np.linalg.solve(-A, uf).reshape(shp)
+        return np.linalg.solve(-A, uf.T[..., None])[..., 0].T.reshape(shp)
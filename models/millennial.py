@@ -11,9 +11,11 @@ see also: https://github.com/email-clm/Millennial/blob/master/main.F90
 
 import numpy as np
 # from scipy.integrate import odeint
-import matplotlib.pyplot as plt
 from collections import namedtuple
 
+from instrument import PROFILER
+from precision import KahanArray, MassLedger, MASS_RTOL
+
 #from millennial_parameters import param   # get model default parameters
 
 EPS  = np.finfo(float).eps  # machine epsilon
@@ -49,12 +51,16 @@ param = {
         'k_m': 3.6e-2,  # microbial turn-over rate (d-1). From F90: k_m=5.4e-3 (3.6e-2*0.15) 
         }
 
+# max sorption capacity used instead of the computed Qmax (g C m-2)
+QMAX = 4550.0
+
 # define namedtuple constructor for inputting model parameters to odeint
 millennial_param = namedtuple('millennial_param', ' '.join(sorted(param.keys())))
 
 
 class Millennial():
-    def __init__(self, p, soilp, C0, results=False):   
+    def __init__(self, p, soilp, C0, results=False, dtype=None, compensated=True,
+                 ledger=None):
         """
         Implementation of single-layer Millennial model.
         Args:
@@ -63,6 +69,15 @@ class Millennial():
             C0 - initial pools (g C m-2)
             fT, fW - temperature and moisture functions to use
             results - boolean
+            dtype - storage dtype of pools; None keeps that of C0 if it is
+                    floating point, else float64. With np.float32 the
+                    modifiers are cast to it, so fluxes stay in single
+                    precision.
+            compensated - use Kahan summation for pool updates when dtype
+                          is single precision
+            ledger - keep float64 mass-balance bookkeeping for
+                     check_mass_balance; None keeps it for single precision
+                     pools only
             
         Note:
             x[0] = POM (particulate organic matter)
@@ -76,7 +91,7 @@ class Millennial():
         
         Qmax = soilp['bd']*10**(p['c'][0] * np.log(soilp['clay'] + p['c'][1]))
         print(Qmax)
-        p['Qmax'] = 4550.0; # Qmax # g C m-2
+        p['Qmax'] = QMAX; # Qmax # g C m-2
         self.dt = p['dt']  # d-1
         self.para = p
         self.soilpara = soilp
@@ -84,14 +99,21 @@ class Millennial():
         self.temperature_response = fT_century
         self.moisture_response = fW_century
         
-        # carbon pools
-        self.Cpools = C0
+        self.compensated = compensated
+        self.track_mass = ledger
+        # carbon pools, updated in place; exposed read-only as Cpools
+        if dtype is None:
+            dtype = np.asarray(C0).dtype
+            if not np.issubdtype(dtype, np.floating):
+                dtype = np.float64
+        self._x = np.array(C0, dtype=dtype)
+        self._reset()
 
         # results dict for testing outputs
         if results:
             self.results = {'Cpools': None, 'flx': None}
 
-    def decompose(self, T, W, F_in, F_adv=0.0):
+    def decompose(self, T, W, F_in, F_adv=0.0, env=None):
         """
         Computes decomposition and pool transitions during timestep dt using
         Eulerian method. Updates state variable self.Cpools and returns fluxes.
@@ -100,6 +122,8 @@ class Millennial():
             W - vol. moisture (m3 m-3)
             F_in - array of litter input (g C m-2)
             F_adv - net outflow of LMWC (advection kg C m-2 timestep-1)
+            env - precomputed (env_f, CUE) for this timestep, see
+                  modifiers.millennial_modifiers. If None, computed from T, W.
     
         Returns:
             flx (dict), all in (g C m-2 timestep-1)
@@ -114,42 +138,108 @@ class Millennial():
                 Fmr - microbial maintenance respiration
                 Fgr - microbial growth respiration
         Updates state variable self.Cpools
+        Returns also mbe, the mass-balance error (g C m-2 timestep-1) computed
+        in float64.
         """
         
-        x = self.Cpools.copy()
+        x = self._x
         dt = self.dt
         p = self.para
-        p['CUE'] = p['CUEp'][0] - p['CUEp'][2] * (T - p['CUEp'][1])
+        n = np.size(x[0])
+        with PROFILER.stage('millennial.modifiers', n):
+            if env is None:
+                # environmental modifiers
+                fT = self.temperature_response(T)
+                fW = self.moisture_response(W / self.soilpara['fc'])
+                env_f = fT * fW
+                p['CUE'] = p['CUEp'][0] - p['CUEp'][2] * (T - p['CUEp'][1])
+            else:
+                env_f, p['CUE'] = env
+            if x.dtype == np.float32:
+                # keep fluxes in the storage dtype
+                env_f = np.asarray(env_f, dtype=x.dtype)
+                p['CUE'] = np.asarray(p['CUE'], dtype=x.dtype)
         #print(p['CUE'])
         
         # parameters into named tuple (immutable)
         p = millennial_param(**p)
-
-        # environmental modifiers
-        fT = self.temperature_response(T)
-        fW = self.moisture_response(W / self.soilpara['fc'])
         
         # fT = 1.0; fW=1.0
         
         # compute fluxes
-        F = fluxes(x, p, env_f=fT*fW) 
-        x0 = x.copy()
+        with PROFILER.stage('millennial.fluxes', n):
+            F = fluxes(x, p, env_f=env_f) 
         
         """ integrate in time and update new pools """
-        
-        x[0] += F_in[0] + dt * (p.pa*F['Fa'] - F['Fpa'] - F['Fpl'])
-        x[1] += F_in[1] + dt * (F['Fpl'] - F['Flb'] - F['Flm'] - F['Fl'])
-        x[2] += dt * (F['Flb'] - F['Fbm'] - F['Fmr'])
-        x[3] += dt * (F['Fpa'] + F['Fma'] - F['Fa'])
-        x[4] += dt * (F['Flm'] + F['Fbm'] + (1.0 - p.pa)*F['Fa'] - F['Fma'])
-        
-        self.Cpools = x.copy()
+        with PROFILER.stage('millennial.update', n):
+            if self._acc is None:
+                update_pools(x, F, F_in, p.pa, dt)
+            else:
+                self._acc.add(pool_increments(F, F_in, p.pa, dt))
         
         # delta C = F_in - Fmr since growth respiration Fgr is bypass
-        mbe = sum(self.Cpools) - sum(x0)  - sum(F_in) + dt*F['Fmr']
+        F_in = np.add(F_in[0], F_in[1], dtype=np.float64)
+        stock = self._stock()
+        mbe = stock - self._stock0 - F_in + dt*F['Fmr']
+        self._stock0 = stock
+        if self.ledger is not None:
+            # leaching Fl also leaves the system
+            self.ledger.add(F_in, dt*(np.asarray(F['Fmr'], dtype=np.float64) + F['Fl']))
         
+        if PROFILER.hooks:
+            PROFILER.tick('millennial', self)
         return F, mbe
 
+    @property
+    def Cpools(self):
+        """ C pools (5, ...) in storage dtype; read-only view of the state """
+        x = self._x.view()
+        x.flags.writeable = False
+        return x
+
+    @Cpools.setter
+    def Cpools(self, C):
+        """ re-initializes the pools; resets the compensation and ledger """
+        self._x = np.array(C, dtype=self._x.dtype)
+        self._reset()
+
+    def _reset(self):
+        self._acc = None
+        if self.compensated and self._x.dtype == np.float32:
+            self._acc = KahanArray(self._x, dtype=np.float32)
+            self._x = self._acc.value
+        self._stock0 = self._stock()
+
+        # float64 mass-balance bookkeeping
+        track = self.track_mass
+        if track is None:
+            track = self._x.dtype != np.float64
+        self.ledger = MassLedger(self._x) if track else None
+
+    def pools(self):
+        """ C pools in float64, including Kahan compensation """
+        if self._acc is not None:
+            return self._acc.total()
+        return np.asarray(self._x, dtype=np.float64)
+
+    def _stock(self):
+        """ total C in float64, including Kahan compensation """
+        s = np.sum(self._x, axis=0, dtype=np.float64)
+        if self._acc is not None:
+            s -= np.sum(self._acc.comp, axis=0, dtype=np.float64)
+        return s
+
+    def check_mass_balance(self, rtol=MASS_RTOL):
+        """
+        verifies conservation since initialization against the float64
+        ledger; raises RuntimeError if relative error exceeds rtol or the
+        ledger is not kept (see ledger in __init__).
+        Returns max. relative error.
+        """
+        if self.ledger is None:
+            raise RuntimeError('mass-balance ledger not kept; use ledger=True')
+        return self.ledger.check(self.pools(), rtol)
+
 def fluxes(x, p, dt=1.0, env_f=1.0):
     """
     Computes fluxes between C pools.
@@ -231,6 +321,43 @@ def fluxes(x, p, dt=1.0, env_f=1.0):
     
     return flx
 
+def pool_increments(F, F_in, pa, dt=1.0):
+    """
+    Eulerian increments of C pools during timestep.
+    Args:
+        F - fluxes (dict), see fluxes
+        F_in - litter input to POM and LMWC (g C m-2 timestep-1)
+        pa - fraction of A breakdown allocated to P
+        dt - timestep (d)
+    Returns:
+        dx - array (5 x ...) with dtype of the fluxes
+    """
+    Fa = F['Fa']
+    dx = np.empty((5,) + np.shape(Fa), dtype=np.result_type(Fa))
+    dx[0] = F_in[0] + dt * (pa*Fa - F['Fpa'] - F['Fpl'])
+    dx[1] = F_in[1] + dt * (F['Fpl'] - F['Flb'] - F['Flm'] - F['Fl'])
+    dx[2] = dt * (F['Flb'] - F['Fbm'] - F['Fmr'])
+    dx[3] = dt * (F['Fpa'] + F['Fma'] - Fa)
+    dx[4] = dt * (F['Flm'] + F['Fbm'] + (1.0 - pa)*Fa - F['Fma'])
+    return dx
+
+def update_pools(x, F, F_in, pa, dt=1.0):
+    """
+    Eulerian update of C pools in place.
+    Args:
+        x - C pools (array, 5 x ...)
+        F - fluxes (dict), see fluxes
+        F_in - litter input to POM and LMWC (g C m-2 timestep-1)
+        pa - fraction of A breakdown allocated to P
+        dt - timestep (d)
+    """
+    x[0] += F_in[0] + dt * (pa*F['Fa'] - F['Fpa'] - F['Fpl'])
+    x[1] += F_in[1] + dt * (F['Fpl'] - F['Flb'] - F['Flm'] - F['Fl'])
+    x[2] += dt * (F['Flb'] - F['Fbm'] - F['Fmr'])
+    x[3] += dt * (F['Fpa'] + F['Fma'] - F['Fa'])
+    x[4] += dt * (F['Flm'] + F['Fbm'] + (1.0 - pa)*F['Fa'] - F['Fma'])
+    return x
+
 def fT_century(T):
     """ 
     century temperature function (-)
@@ -255,79 +382,6 @@ def fW_century(rwc):
     return f
 
 
-""" *** testing scripts *** """
-
-def test_millennial():
-    """
-    tests millennial using forcing data from Abramoff et al. 2017.
-    Global average soil temperature, vol moisture and example litter input.
-    Loop data over M years
-    """
-    # import parameters
-    from millennial_parameters import param
-    
-    # load forcing file
-    forc = np.loadtxt(r'c:\repositories\soilcarbon\data\millennial_globalaverage_data.txt', skiprows=1)
-    T = forc[:,0] # degC
-    W = forc[:,1] # m3m-3
-    F_litter = forc[:,2] # g C d-1  
-
-    M = 200 # yrs
-    N = 365 * M # days
-    
-    soilp = {'clay': 40.0, 'bd': 1350.0, 'poros': 0.5, 'fc': 0.3}
-    C0 = 1.0 * np.ones(5) # g C m-2 initial pools
-    
-    # create instance
-    model = Millennial(param, soilp, C0, results=True)
-    
-    # create holders for daily data
-    res = np.zeros((5, N))*np.NaN
-    F = {'Fpl': np.zeros(N), 'Fpa': np.zeros(N), 'Fa': np.zeros(N), 'Flb': np.zeros(N),
-           'Fbm': np.zeros(N), 'Fl': np.zeros(N), 'Fma': np.zeros(N), 'Flm': np.zeros(N),
-           'Fmr': np.zeros(N), 'Fgr': np.zeros(N)}
-    
-    mbe = np.zeros(N)* np.NaN
-    
-    j = 0
-    for yr in range(M):
-        print('Run year: ', yr)
-        for k in range(365):   
-            F_in = [0.66*F_litter[k], 0.34*F_litter[k]]
-            flx, err = model.decompose(T[k], W[k], F_in, F_adv=0.0)
-            res[:,j] = model.Cpools
-            for m in F.keys():
-                F[m][j] = flx[m] 
-            #F['Fgr'][k] = flx['Fgr']
-            #F['Fmr'][k] = flx['Fmr']
-            mbe[j] = err
-            j +=1
-    
-    # plot figs
-    tt = np.arange(N) / 365.0
-    poolname = ['POM', 'LMWC', 'MIC', 'AGG', 'MAOM']
-    
-    plt.figure(200)
-    for n in range(5):
-        plt.plot(tt, res[n,:]/1000, label=poolname[n])
-    plt.legend()
-    plt.ylabel('kg C m-2'); plt.xlabel('yr')
-    plt.savefig('millennial_pools.png')
-
-    plt.figure(300)
-    for m in ['Fbm','Fma','Flm','Fa']:
-        plt.plot(tt, F[m], label=m)
-        plt.legend()
-    for m in ['Fpl','Fpa','Flb']:
-        plt.plot(tt, F[m], ':', label=m)
-        plt.legend()    
-    for m in ['Fgr','Fmr']:
-        plt.plot(tt, F[m], '-', label=m)
-        plt.legend()      
-    plt.ylabel('Flux g C d-1')
-    
-    return model, res, F
-    
 #def dCdt(x, t, F_in, F_adv, env_f, para):
 #    """
 #    Derivatives of C pools as required by scipy.odeint
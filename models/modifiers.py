@@ -0,0 +1,221 @@
+# -*- coding: utf-8 -*-
+"""
+Created on Mon Oct 19 09:12:40 2026
+
+Environmental modifier stage shared by the models.
+
+Temperature and moisture responses depend only on forcing and on soil type,
+not on the C pools. During spin-up the same forcing year is looped many times
+and ensemble members share the forcing, so the modifier series are computed
+once per (forcing, soil type, parameters) and cached here. Model loops then
+just index the returned arrays.
+
+    env = millennial_modifiers(T, W, param, soilp)
+    for k in range(365):
+        model.decompose(T[k], W[k], F_in, env=(env['env_f'][k], env['CUE'][k]))
+"""
+
+import hashlib
+import itertools
+import sys
+import weakref
+from collections import OrderedDict
+
+import numpy as np
+
+
+# serial numbers of callables that cannot be keyed by name (lambdas, closures,
+# bound methods, partials); weak keys, and serials are never reused
+_SERIALS = weakref.WeakKeyDictionary()
+_serial = itertools.count()
+
+
+def _callable_key(f):
+    """
+    key of a callable: its module and qualified name if that resolves to f
+    itself (module-level functions and classes), else a serial number held
+    as long as f lives
+    """
+    module = getattr(f, '__module__', None)
+    name = getattr(f, '__qualname__', None)
+    obj = sys.modules.get(module) if module and name else None
+    for attr in (name.split('.') if obj is not None else []):
+        obj = getattr(obj, attr, None)
+    if obj is f:
+        return 'name:%s.%s' % (module, name)
+    try:
+        if f not in _SERIALS:
+            _SERIALS[f] = next(_serial)
+        return 'serial:%d' % _SERIALS[f]
+    except TypeError:
+        # not weak-referenceable: unique key, never a cache hit
+        return 'serial:%d' % next(_serial)
+
+
+def _digest(*parts):
+    """
+    hash of forcing arrays and parameters used as cache key
+    Args:
+        parts - arrays, scalars, dicts or sequences of these
+    Returns:
+        hex digest (str)
+    """
+    h = hashlib.sha1()
+
+    def feed(x):
+        if isinstance(x, dict):
+            for key in sorted(x.keys()):
+                h.update(str(key).encode())
+                feed(x[key])
+        elif isinstance(x, (list, tuple)):
+            h.update(b'(')
+            for v in x:
+                feed(v)
+            h.update(b')')
+        elif callable(x):
+            h.update(_callable_key(x).encode())
+        elif x is None or isinstance(x, str):
+            h.update(repr(x).encode())
+        else:
+            a = np.ascontiguousarray(x)
+            if a.dtype == object:
+                h.update(repr(a.tolist()).encode())
+                return
+            h.update(str(a.dtype).encode() + str(a.shape).encode())
+            h.update(a.tobytes())
+
+    for p in parts:
+        feed(p)
+    return h.hexdigest()
+
+
+class ModifierCache():
+    def __init__(self, maxsize=32):
+        """
+        LRU-cache of precomputed modifier series.
+        Args:
+            maxsize - max. number of cached forcing/soil combinations
+        """
+        self.maxsize = maxsize
+        self._store = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key, compute):
+        """
+        returns cached value for key, or computes and stores it
+        Args:
+            key - hashable key (see _digest)
+            compute - callable without arguments returning the value
+        """
+        if key in self._store:
+            self._store.move_to_end(key)
+            self.hits += 1
+            return self._store[key]
+
+        self.misses += 1
+        val = compute()
+        # cached arrays are shared between runs: make them read-only
+        for v in (val.values() if isinstance(val, dict) else [val]):
+            if isinstance(v, np.ndarray):
+                v.flags.writeable = False
+        self._store[key] = val
+        while len(self._store) > self.maxsize:
+            self._store.popitem(last=False)
+        return val
+
+    def clear(self):
+        self._store.clear()
+        self.hits = 0
+        self.misses = 0
+
+    def __len__(self):
+        return len(self._store)
+
+
+# default cache shared by all models in the process
+MODIFIERS = ModifierCache()
+
+
+def millennial_modifiers(T, W, p, soilp, fT=None, fW=None, cache=MODIFIERS, dtype=float):
+    """
+    Millennial environmental modifier and temperature-dependent CUE.
+    Args:
+        T - temperature (degC), scalar or array
+        W - vol. moisture (m3 m-3), scalar or array
+        p - Millennial parameters (dict), uses 'CUEp'
+        soilp - soil type related parameters (dict), uses 'fc'
+        fT, fW - temperature and moisture functions (default: century)
+        cache - ModifierCache or None to bypass caching
+        dtype - dtype of the returned arrays (np.float32 for single precision)
+    Returns:
+        dict with arrays
+            env_f - combined modifier fT * fW (-)
+            CUE - microbial carbon use efficiency (-)
+    """
+    if fT is None or fW is None:
+        from millennial import fT_century, fW_century
+        fT = fT or fT_century
+        fW = fW or fW_century
+
+    def compute():
+        TT = np.asarray(T, dtype=float)
+        WW = np.asarray(W, dtype=float)
+        c = p['CUEp']
+        return {'env_f': np.asarray(fT(TT) * fW(WW / soilp['fc']), dtype=dtype),
+                'CUE': np.asarray(c[0] - c[2] * (TT - c[1]), dtype=dtype)}
+
+    if cache is None:
+        return compute()
+    key = _digest('millennial', T, W, p['CUEp'], soilp['fc'], fT, fW, np.dtype(dtype).str)
+    return cache.get(key, compute)
+
+
+def damm_modifiers(model, T, W, cache=MODIFIERS):
+    """
+    DAMM Arrhenius and Michaelis-Menten terms.
+    Args:
+        model - damm.Damm instance
+        T - temperature (K)
+        W - liquid water content (m3 m-3)
+        cache - ModifierCache or None to bypass caching
+    Returns:
+        dict with arrays
+            Vmax - maximum reaction velocity
+            fs - substrate limitation (-)
+            fo2 - oxygen limitation (-)
+            v - reaction velocity Vmax * fs * fo2
+    """
+    def compute():
+        v, c = model.reaction_velocity(np.asarray(T, dtype=float),
+                                       np.asarray(W, dtype=float))
+        c['v'] = v
+        return c
+
+    if cache is None:
+        return compute()
+    key = _digest('damm', T, W, model.alpha, model.Ea, model.kMs, model.kMo2,
+                  model.p, model.Dliq, model.Dgas, model.St, model.poros)
+    return cache.get(key, compute)
+
+
+def esom_modifiers(tair, tp_top, tp_middle, tp_bottom, wn, cache=MODIFIERS):
+    """
+    ESOM temperature and moisture response functions evaluated over forcing.
+    Args:
+        tair - air temperature (degC)
+        tp_top, tp_middle, tp_bottom - peat temperatures (degC)
+        wn - normalized water content w / wfc (-)
+        cache - ModifierCache or None to bypass caching
+    Returns:
+        dict of response arrays, see esom.responses
+    """
+    from esom import responses
+
+    def compute():
+        return responses(tair, tp_top, tp_middle, tp_bottom, wn)
+
+    if cache is None:
+        return compute()
+    key = _digest('esom', tair, tp_top, tp_middle, tp_bottom, wn)
+    return cache.get(key, compute)
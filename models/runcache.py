@@ -0,0 +1,223 @@
+# -*- coding: utf-8 -*-
+"""
+Created on Mon Oct 19 11:40:02 2026
+
+Disk-backed memoization of model runs.
+
+Results are keyed by a hash of model parameters, forcing content, initial
+state and the model version (hash of the source of the model module and of
+the modules it imports from this directory), and stored as compressed .npz
+files in a local cache directory. Least recently used files are evicted when
+the cache grows over its size limit. Results are arrays or dicts of arrays;
+numbers are returned as 0-d arrays, on hits and misses alike.
+
+    cache = RunCache()
+    C = cache.cached('icbm', para, {'t': t, 'I': I}, ini,
+                     lambda: icbm.model(para, ini).compute(t, I=I))
+    res = spinup_icbm(para, I, fenv, x0, cache=cache)
+
+Set enabled=False (or environment variable SOILCARBON_NOCACHE=1) to bypass.
+"""
+
+import ast
+import os
+import sys
+import importlib
+
+import numpy as np
+
+from modifiers import _digest
+
+DEFAULT_DIR = os.path.join(os.path.expanduser('~'), '.cache', 'soilcarbon')
+
+
+def model_version(model):
+    """
+    version tag of a model: hash of the source file of its module and of the
+    modules it imports (also inside functions) from the same directory,
+    transitively.
+    Args:
+        model - module or module name (e.g. 'icbm', 'yasso', 'millennial')
+    Returns:
+        version (str)
+    """
+    if isinstance(model, str):
+        model = sys.modules.get(model) or importlib.import_module(model)
+    fname = getattr(model, '__file__', None)
+    if fname is None:
+        return 'unknown'
+    root = os.path.dirname(os.path.abspath(fname))
+    src = {}
+    todo = [os.path.abspath(fname)]
+    while todo:
+        fname = todo.pop()
+        if fname in src:
+            continue
+        with open(fname, 'rb') as f:
+            src[fname] = f.read()
+        for node in ast.walk(ast.parse(src[fname])):
+            if isinstance(node, ast.Import):
+                names = [a.name for a in node.names]
+            elif isinstance(node, ast.ImportFrom) and node.level == 0 and node.module:
+                names = [node.module]
+            else:
+                continue
+            for name in names:
+                dep = os.path.join(root, name.split('.')[0] + '.py')
+                if os.path.isfile(dep):
+                    todo.append(dep)
+    return _digest({os.path.basename(f): np.frombuffer(b, dtype=np.uint8)
+                    for f, b in src.items()})[:12]
+
+
+def _arrays(result):
+    """
+    result as array or dict of arrays, as stored by RunCache.put; raises
+    TypeError for anything else (e.g. tuples, lists or object arrays)
+    """
+    def conv(v):
+        if not isinstance(v, (np.ndarray, np.generic, int, float, bool)):
+            raise TypeError('cannot cache %s, use arrays or a dict of arrays'
+                            % type(v).__name__)
+        a = np.asarray(v)
+        if a.dtype == object:
+            raise TypeError('cannot cache object arrays')
+        return a
+
+    if isinstance(result, dict):
+        if not all(isinstance(k, str) and k != '__array__' for k in result):
+            raise TypeError('cached dict keys must be str other than __array__')
+        return {k: conv(v) for k, v in result.items()}
+    return conv(result)
+
+
+class RunCache():
+    def __init__(self, path=None, max_bytes=500e6, enabled=None):
+        """
+        Args:
+            path - cache directory (default: $SOILCARBON_CACHE or ~/.cache/soilcarbon)
+            max_bytes - size limit of the cache directory (bytes)
+            enabled - False bypasses the cache (default: on unless
+                      $SOILCARBON_NOCACHE is set)
+        """
+        if path is None:
+            path = os.environ.get('SOILCARBON_CACHE', DEFAULT_DIR)
+        if enabled is None:
+            enabled = not os.environ.get('SOILCARBON_NOCACHE')
+        self.path = path
+        self.max_bytes = max_bytes
+        self.enabled = enabled
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._versions = {}
+
+    def key(self, model, params, forcing, state=None):
+        """
+        cache key of a run
+        Args:
+            model - module or module name
+            params - parameters (dict, array or scalar)
+            forcing - forcing (dict of arrays, array or scalar)
+            state - initial state (dict, array or None)
+        Returns:
+            key (str)
+        """
+        name = model if isinstance(model, str) else model.__name__
+        if name not in self._versions:
+            self._versions[name] = model_version(model)
+        return _digest(name, self._versions[name], params, forcing, state)
+
+    def _file(self, key):
+        return os.path.join(self.path, key + '.npz')
+
+    def get(self, key):
+        """
+        returns cached result or None
+        """
+        fname = self._file(key)
+        try:
+            with np.load(fname, allow_pickle=False) as f:
+                res = {k: f[k] for k in f.files}
+        except FileNotFoundError:
+            return None
+        try:
+            os.utime(fname)  # mark as recently used
+        except FileNotFoundError:
+            pass  # evicted since the load, the result is still valid
+        if list(res.keys()) == ['__array__']:
+            return res['__array__']
+        return res
+
+    def put(self, key, result):
+        """
+        stores result (array or dict of arrays) and evicts old entries;
+        raises TypeError for other results
+        """
+        arrs = _arrays(result)
+        if not isinstance(arrs, dict):
+            arrs = {'__array__': arrs}
+        os.makedirs(self.path, exist_ok=True)
+        tmp = os.path.join(self.path, '%s.%d.tmp' % (key, os.getpid()))
+        with open(tmp, 'wb') as f:
+            np.savez_compressed(f, **arrs)
+        os.replace(tmp, self._file(key))
+        self.evict()
+
+    def cached(self, model, params, forcing, state, run):
+        """
+        returns cached result of a run, or executes run() and stores result
+        Args:
+            model, params, forcing, state - see key
+            run - callable without arguments returning array or dict of arrays
+        Returns:
+            result as array or dict of arrays, see _arrays
+        """
+        if not self.enabled:
+            return _arrays(run())
+        key = self.key(model, params, forcing, state)
+        res = self.get(key)
+        if res is not None:
+            self.hits += 1
+            return res
+        self.misses += 1
+        res = _arrays(run())
+        self.put(key, res)
+        return res
+
+    def _entries(self):
+        if not os.path.isdir(self.path):
+            return []
+        out = []
+        for f in os.listdir(self.path):
+            if f.endswith('.npz'):
+                st = os.stat(os.path.join(self.path, f))
+                out.append((st.st_mtime, st.st_size, f))
+        return out
+
+    def evict(self):
+        """
+        removes least recently used entries until cache fits max_bytes
+        """
+        entries = sorted(self._entries())
+        size = sum(e[1] for e in entries)
+        while entries and size > self.max_bytes:
+            _, nbytes, f = entries.pop(0)
+            os.remove(os.path.join(self.path, f))
+            size -= nbytes
+            self.evictions += 1
+
+    def clear(self):
+        for _, _, f in self._entries():
+            os.remove(os.path.join(self.path, f))
+
+    def stats(self):
+        """
+        hit/miss statistics and disk usage
+        """
+        entries = self._entries()
+        n = self.hits + self.misses
+        return {'hits': self.hits, 'misses': self.misses,
+                'hit_rate': self.hits / n if n else 0.0,
+                'evictions': self.evictions, 'entries': len(entries),
+                'bytes': sum(e[1] for e in entries)}
@@ -0,0 +1,225 @@
+# -*- coding: utf-8 -*-
+"""
+Created on Thu Oct 22 10:02:31 2026
+
+Test scenarios and plotting of the models.
+
+Kept out of the model modules so that those import only NumPy (SciPy is
+imported lazily where needed) and start fast in worker processes and on
+headless nodes. matplotlib is imported inside each scenario.
+"""
+
+import os
+
+import numpy as np
+
+FORCING_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'data',
+                            'millennial_globalaverage_data.txt')
+
+
+def damm_test_model():
+    # set up DAMM and reproduce fig. 5 in Davidson et al. 2012.
+    
+    para = {'alpha': 5.38e10,  # mg C cm-3 soil h-1
+            'Ea': 72.26,     # kJ mol-1
+            'kMs': 9.95e-7, # g C cm-3 soil
+            'kMo2': 0.121,  # cm3 O2 cm-3 air
+            'p': 4.14e-4,   # -
+            'Dliq': 3.17,   # -
+            'Dgas': 1.67    # -
+            }
+    St = 0.048 # gC cm-3 soil
+    poros = 0.68 # cm3 cm-3
+    
+    from damm import Damm, NT
+    
+    model = Damm(para, St, poros)
+    
+    T = np.arange(5.0, 25.0, 0.1)  + NT
+    W = np.arange(0.1, 0.68, 0.01)
+    
+    # broadcast axes instead of meshgrid; plot_surface gets views of them
+    R, c = model.reaction_velocity(T[None, :], W[:, None])
+    T, W = np.broadcast_arrays(T[None, :], W[:, None])
+    
+    f = 100. * 100. *10.  # unit conversion: mg C cm-3 to mg C m-2 from 10cm layer
+    
+    
+    '''
+    ======================
+    3D surface (color map)
+    ======================
+    
+    Demonstrates plotting a 3D surface colored with the coolwarm color map.
+    The surface is made opaque by using antialiased=False.
+    
+    Also demonstrates using the LinearLocator and custom formatting for the
+    z axis tick labels.
+    '''
+    
+    from mpl_toolkits.mplot3d import Axes3D
+    import matplotlib.pyplot as plt
+    from matplotlib import cm
+    # from matplotlib.ticker import LinearLocator, FormatStrFormatter
+    
+    ele = 35.0
+    azm = 145.0
+    
+    fig = plt.figure()
+    ax = fig.gca(projection='3d')
+    ax.view_init(elev=ele, azim=azm)
+    
+    x = T - NT
+    y = W
+    z = f*R
+    
+    # Plot the surface.
+    surf = ax.plot_surface(x, y, z, cmap=cm.coolwarm,
+                           linewidth=0, antialiased=False, alpha=0.6)
+    ax.set_xlabel('T (deg C)'); ax.set_ylabel('W (-)'); ax.set_zlabel(r'R')
+    ax.invert_yaxis()
+    # Add a color bar which maps values to colors.
+    # fig.colorbar(surf, shrink=0.5, aspect=5)
+    
+    ax.set_title('Damm sensitivity')
+    plt.show()
+    plt.savefig('damm_sensitivities.png')
+
+
+def icbm_test():
+    # test ICBM for scenarios 'fallow' and '+N+straw'
+    para = {
+            'fallow': 
+                {'ky': 0.8,      # yr-1
+                 'ko': 6.05e-3,  # yr-1
+                 'h': 0.13       # -
+                 },
+            'N_straw':
+                {'ky': 0.8,      # yr-1
+                 'ko': 6.05e-3,  # yr-1
+                 'h': 0.125       # -
+                 }
+            }
+                
+    ini = {'fallow': {'Y': 0.3, 'O': 3.96}, # kg C m-3
+           'N_straw': {'Y': 0.3, 'O': 4.11}
+           }
+    litter = {'fallow': 0.0, 'N_straw': 0.285} # kg C a-1
+    
+    from icbm import model
+    import matplotlib.pyplot as plt
+    
+    # create model instances
+    run1 = model(para['fallow'], ini['fallow'])
+    run2 = model(para['N_straw'], ini['N_straw'])
+    
+    n = 40 # yr
+    t = np.linspace(0, n)
+    
+    # run models and return results
+    C1 = run1.compute(t, I=litter['fallow'], fenv=1.32)
+    C2 = run2.compute(t, I=litter['N_straw'], fenv=1.0)
+    
+    # plot figure()
+    plt.figure()
+    
+    plt.subplot(121)
+    plt.plot(t, C1[0], label='Y')
+    plt.plot(t, C1[1], label='O')
+    plt.plot(t, C1[0]+C1[1], label='Y+O')
+    plt.plot(t[[0,-1]], [litter['fallow'], litter['fallow']], 'r--', label='L (kgCa-1)')
+    # plt.legend()
+    plt.xlabel('t (yr)')
+    plt.ylabel('C pools (kg C m-3)')
+    plt.title('fallow')
+
+    plt.subplot(122)
+    plt.plot(t, C2[0], label='Y')
+    plt.plot(t, C2[1], label='O')
+    plt.plot(t, C2[0]+C2[1], label='Y+O')
+    plt.plot(t[[0,-1]], [litter['N_straw'], litter['N_straw']], 'r--', label='L (kgCa-1)')
+    plt.legend()
+    plt.xlabel('t (yr)')
+    plt.ylabel('C pools (kgC m-3)')
+    plt.title('+N+Straw')
+    
+    plt.show()
+    #plt.savefig('ICBM_test.png', dpi=300)
+
+
+def test_millennial(forcing_file=FORCING_FILE):
+    """
+    tests millennial using forcing data from Abramoff et al. 2017.
+    Global average soil temperature, vol moisture and example litter input.
+    Loop data over M years
+    """
+    # import parameters
+    from millennial import Millennial, param
+    from modifiers import millennial_modifiers
+    import matplotlib.pyplot as plt
+    
+    # load forcing file
+    forc = np.loadtxt(forcing_file, skiprows=1)
+    T = forc[:,0] # degC
+    W = forc[:,1] # m3m-3
+    F_litter = forc[:,2] # g C d-1  
+
+    M = 200 # yrs
+    N = 365 * M # days
+    
+    soilp = {'clay': 40.0, 'bd': 1350.0, 'poros': 0.5, 'fc': 0.3}
+    C0 = 1.0 * np.ones(5) # g C m-2 initial pools
+    
+    # create instance
+    model = Millennial(param, soilp, C0, results=True)
+    
+    # environmental modifiers are the same every year: compute once
+    env = millennial_modifiers(T[:365], W[:365], param, soilp)
+    
+    # create holders for daily data
+    res = np.zeros((5, N))*np.nan
+    F = {'Fpl': np.zeros(N), 'Fpa': np.zeros(N), 'Fa': np.zeros(N), 'Flb': np.zeros(N),
+           'Fbm': np.zeros(N), 'Fl': np.zeros(N), 'Fma': np.zeros(N), 'Flm': np.zeros(N),
+           'Fmr': np.zeros(N), 'Fgr': np.zeros(N)}
+    
+    mbe = np.zeros(N)* np.nan
+    
+    j = 0
+    for yr in range(M):
+        print('Run year: ', yr)
+        for k in range(365):   
+            F_in = [0.66*F_litter[k], 0.34*F_litter[k]]
+            flx, err = model.decompose(T[k], W[k], F_in, F_adv=0.0,
+                                       env=(env['env_f'][k], env['CUE'][k]))
+            res[:,j] = model.Cpools
+            for m in F.keys():
+                F[m][j] = flx[m] 
+            #F['Fgr'][k] = flx['Fgr']
+            #F['Fmr'][k] = flx['Fmr']
+            mbe[j] = err
+            j +=1
+    
+    # plot figs
+    tt = np.arange(N) / 365.0
+    poolname = ['POM', 'LMWC', 'MIC', 'AGG', 'MAOM']
+    
+    plt.figure(200)
+    for n in range(5):
+        plt.plot(tt, res[n,:]/1000, label=poolname[n])
+    plt.legend()
+    plt.ylabel('kg C m-2'); plt.xlabel('yr')
+    plt.savefig('millennial_pools.png')
+
+    plt.figure(300)
+    for m in ['Fbm','Fma','Flm','Fa']:
+        plt.plot(tt, F[m], label=m)
+        plt.legend()
+    for m in ['Fpl','Fpa','Flb']:
+        plt.plot(tt, F[m], ':', label=m)
+        plt.legend()    
+    for m in ['Fgr','Fmr']:
+        plt.plot(tt, F[m], '-', label=m)
+        plt.legend()      
+    plt.ylabel('Flux g C d-1')
+    
+    return model, res, F
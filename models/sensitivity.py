@@ -0,0 +1,253 @@
+# -*- coding: utf-8 -*-
+"""
+Created on Tue Nov  3 10:22:06 2026
+
+Forward (tangent-linear) sensitivities of Millennial for gradient-based
+calibration.
+
+The sensitivities S = dx/dtheta of the pools to selected parameters are
+integrated alongside the pools with the same Eulerian scheme:
+
+    x(k+1) = x(k) + dt N F(x(k), theta)
+    S(k+1) = S(k) + dt N (dF/dx S(k) + dF/dtheta)
+
+where N is the stoichiometry of millennial.update_pools. The partial
+derivatives of millennial.fluxes are analytic, including the flux limits
+(a limited flux 0.9 x / dt depends only on its source pool). All arrays are
+vectorized over cells: S is (5, n_theta, cells...).
+
+    res = run_millennial(param, soilp, {'T': T, 'W': W, 'litter': L}, C0,
+                         theta=('V_pl', 'k_m', 'CUEp0'), nsteps=3650, every=365)
+    res['S']    # (n_out, 5, n_theta, cells), trajectory Jacobian of pools
+    res['dRh']  # (n_out, n_theta, cells), Jacobian of respiration
+"""
+
+import numpy as np
+
+from instrument import PROFILER
+
+# columns of the stoichiometry, in the order of millennial.fluxes
+FLUXES = ('Fpl', 'Fpa', 'Fa', 'Flb', 'Fbm', 'Fl', 'Fma', 'Flm', 'Fmr', 'Fgr')
+FPL, FPA, FA, FLB, FBM, FL, FMA, FLM, FMR, FGR = range(10)
+
+# parameters with analytic partials; CUEp0..2 are the elements of 'CUEp'
+PARAMS = ('pa', 'V_pl', 'K_pl', 'K_pe', 'V_pa', 'K_pa', 'A_max', 'k_b', 'k_l',
+          'K_lm', 'Qmax', 'k_s', 'V_lm', 'V_ma', 'K_ma', 'k_mm', 'k_m',
+          'CUEp0', 'CUEp1', 'CUEp2')
+
+
+def stoichiometry(pa):
+    """ pool increments per unit flux, N (5, 10), see millennial.update_pools """
+    N = np.zeros((5, 10))
+    N[0, [FA, FPA, FPL]] = pa, -1.0, -1.0
+    N[1, [FPL, FLB, FLM, FL]] = 1.0, -1.0, -1.0, -1.0
+    N[2, [FLB, FBM, FMR]] = 1.0, -1.0, -1.0
+    N[3, [FPA, FMA, FA]] = 1.0, 1.0, -1.0
+    N[4, [FLM, FBM, FA, FMA]] = 1.0, 1.0, 1.0 - pa, -1.0
+    return N
+
+
+def flux_partials(x, p, theta=(), dt=1.0, env_f=1.0, dcue=None):
+    """
+    Millennial fluxes and the Jacobians of the pool increments.
+    Args:
+        x - C pools (5, cells...)
+        p - parameters (namedtuple millennial_param)
+        theta - names of parameters, see PARAMS
+        dt - timestep (d)
+        env_f - environmental modifier
+        dcue - dict {name: dCUE/dname} for the CUEp parameters in theta
+    Returns:
+        F - fluxes (dict), see millennial.fluxes
+        J - (5, 5 + n_theta, cells...) derivatives of N F (pool increments
+            per unit time) with respect to the pools and then theta
+        dR - (5 + n_theta, cells...) derivatives of respiration Fmr + Fgr
+    """
+    from millennial import fluxes
+
+    F = fluxes(x, p, dt=dt, env_f=env_f)
+    e = np.asarray(env_f, dtype=float)
+    shp = np.broadcast_shapes(np.shape(x[0]), e.shape, np.shape(p.CUE))
+    col = {name: 5 + j for j, name in enumerate(theta)}
+    N = stoichiometry(p.pa)
+    rows = [np.flatnonzero(N[:, f]) for f in range(10)]
+    J = np.zeros((5, 5 + len(theta)) + shp)
+    dR = np.zeros((5 + len(theta),) + shp)
+    gr = e * (1.0 - p.CUE) / p.CUE  # dFgr / dFlb
+    x0, x1, x2, x3, x4 = x
+
+    # flux limits min(dt raw, 0.9 x_src) / dt: a limited flux depends only on x_src
+    free = {}
+    for f, raw, src in ((FPL, e * p.V_pl * (x0 / (p.K_pl + x0)) * (x2 / (p.K_pe + x2)), 0),
+                        (FPA, e * p.V_pa * (x0 / (p.K_pa + x0)) * (1.0 - x3 / p.A_max), 0),
+                        (FLB, e * p.V_lm * x1 * p.CUE, 1),
+                        (FBM, e * p.k_mm * x2, 2),
+                        (FMA, e * p.V_ma * (x4 / (p.K_ma + x4)) * (1.0 - x3 / p.A_max), 4)):
+        on = dt * raw > 0.9 * x[src]
+        if np.any(on):
+            free[f] = ~on
+            for r in rows[f]:
+                J[r, src] += N[r, f] * 0.9 / dt * on
+            if f == FLB:
+                dR[src] += gr * 0.9 / dt * on
+
+    def put(f, j, v):
+        """ adds dF_f / d(var j) = v """
+        if j is None:
+            return
+        if f in free:
+            v = v * free[f]
+        for r in rows[f]:
+            J[r, j] += N[r, f] * v
+        if f == FMR:
+            dR[j] += v
+        elif f == FLB:
+            dR[j] += gr * v
+
+    g = 1.0 - x3 / p.A_max
+
+    # POM decomposition
+    a, b = x0 / (p.K_pl + x0), x2 / (p.K_pe + x2)
+    put(FPL, 0, e * p.V_pl * b * p.K_pl / (p.K_pl + x0)**2)
+    put(FPL, 2, e * p.V_pl * a * p.K_pe / (p.K_pe + x2)**2)
+    put(FPL, col.get('V_pl'), e * a * b)
+    put(FPL, col.get('K_pl'), -e * p.V_pl * b * x0 / (p.K_pl + x0)**2)
+    put(FPL, col.get('K_pe'), -e * p.V_pl * a * x2 / (p.K_pe + x2)**2)
+
+    # aggregate formation from POM
+    c = x0 / (p.K_pa + x0)
+    put(FPA, 0, e * p.V_pa * g * p.K_pa / (p.K_pa + x0)**2)
+    put(FPA, 3, -e * p.V_pa * c / p.A_max)
+    put(FPA, col.get('V_pa'), e * c * g)
+    put(FPA, col.get('K_pa'), -e * p.V_pa * g * x0 / (p.K_pa + x0)**2)
+    put(FPA, col.get('A_max'), e * p.V_pa * c * x3 / p.A_max**2)
+
+    # aggregate breakdown; pa splits it between POM and MAOM
+    put(FA, 3, e * p.k_b)
+    put(FA, col.get('k_b'), e * x3)
+    if 'pa' in col:
+        J[0, col['pa']] += F['Fa']
+        J[4, col['pa']] -= F['Fa']
+
+    # microbial uptake of LMWC; CUE also enters growth respiration directly
+    put(FLB, 1, e * p.V_lm * p.CUE)
+    put(FLB, col.get('V_lm'), e * x1 * p.CUE)
+    for name, d in (dcue or {}).items():
+        put(FLB, col.get(name), e * p.V_lm * x1 * d)
+        dR[col[name]] -= e * F['Flb'] / p.CUE**2 * d
+
+    # necromass sorption, leaching and maintenance respiration
+    put(FBM, 2, e * p.k_mm)
+    put(FBM, col.get('k_mm'), e * x2)
+    put(FL, 1, e * p.k_l)
+    put(FL, col.get('k_l'), e * x1)
+    put(FMR, 2, e * p.k_m)
+    put(FMR, col.get('k_m'), e * x2)
+
+    # MAOM to aggregates
+    h = x4 / (p.K_ma + x4)
+    put(FMA, 4, e * p.V_ma * g * p.K_ma / (p.K_ma + x4)**2)
+    put(FMA, 3, -e * p.V_ma * h / p.A_max)
+    put(FMA, col.get('V_ma'), e * h * g)
+    put(FMA, col.get('K_ma'), -e * p.V_ma * g * x4 / (p.K_ma + x4)**2)
+    put(FMA, col.get('A_max'), e * p.V_ma * h * x3 / p.A_max**2)
+
+    # Langmuir sorption of LMWC: k_s x1 (q - x4 / Qmax), q = K_lm x1 / (1 + K_lm x1)
+    q = p.K_lm * x1 / (1.0 + p.K_lm * x1)
+    s = q - x4 / p.Qmax
+    put(FLM, 1, e * p.k_s * (s + x1 * p.K_lm / (1.0 + p.K_lm * x1)**2))
+    put(FLM, 4, -e * p.k_s * x1 / p.Qmax)
+    put(FLM, col.get('k_s'), e * x1 * s)
+    put(FLM, col.get('K_lm'), e * p.k_s * x1**2 / (1.0 + p.K_lm * x1)**2)
+    put(FLM, col.get('Qmax'), e * p.k_s * x1 * x4 / p.Qmax**2)
+    return F, J, dR
+
+
+def cue_partials(theta, p, T):
+    """ dCUE/dtheta of CUE = c0 - c2 (T - c1) for the CUEp parameters in theta """
+    c = p['CUEp']
+    T = np.asarray(T, dtype=float)
+    d = {'CUEp0': np.ones_like(T), 'CUEp1': np.full_like(T, c[2]), 'CUEp2': -(T - c[1])}
+    return {k: v for k, v in d.items() if k in theta}
+
+
+def run_millennial(param, soilp, forcing, C0, theta, nsteps, every=1, split=0.66,
+                   chunk=365, S0=None):
+    """
+    Millennial with forward sensitivities (daily steps).
+    Args:
+        param - Millennial parameters (dict)
+        soilp - soil parameters (dict)
+        forcing - dict of daily T (degC), W (m3 m-3) and litter (g C m-2 d-1)
+                  arrays (nsteps, cells...), or callable(start, stop)
+                  returning such a dict
+        C0 - initial pools (5,) or (5, cells...)
+        theta - names of parameters, see PARAMS
+        nsteps - number of days
+        every - output step (days)
+        split - fraction of litter to POM, rest to LMWC
+        chunk - days of forcing read at a time
+        S0 - initial sensitivities (5, n_theta, cells...), default zeros
+    Returns:
+        dict
+            x - pools at the end of each output step (n_out, 5, cells...)
+            S - dx/dtheta (n_out, 5, n_theta, cells...)
+            Rh - heterotrophic respiration summed over each output step
+                 (n_out, cells...) (g C m-2)
+            dRh - dRh/dtheta (n_out, n_theta, cells...)
+            theta - parameter names
+    """
+    from millennial import millennial_param, update_pools, QMAX
+    from modifiers import millennial_modifiers
+
+    theta = tuple(theta)
+    unknown = [k for k in theta if k not in PARAMS]
+    if unknown:
+        raise ValueError('no partials for parameters: %s' % ', '.join(unknown))
+    read = forcing if callable(forcing) else \
+        (lambda start, stop: {k: v[start:stop] for k, v in forcing.items()})
+    p = dict(param)
+    if p['Qmax'] is None:
+        p['Qmax'] = QMAX
+    dt = p['dt']
+    m = len(theta)
+
+    shp = np.shape(read(0, 1)['T'])[1:]
+    C0 = np.asarray(C0, dtype=float)
+    x = np.empty((5,) + shp)
+    x[:] = C0.reshape((5,) + (1,) * (len(shp) + 1 - C0.ndim) + C0.shape[1:])
+    S = np.zeros((5, m) + shp)
+    if S0 is not None:
+        S[:] = S0
+
+    n_out = nsteps // every
+    res = {'x': np.zeros((n_out, 5) + shp), 'S': np.zeros((n_out, 5, m) + shp),
+           'Rh': np.zeros((n_out,) + shp), 'dRh': np.zeros((n_out, m) + shp),
+           'theta': theta}
+    for start in range(0, nsteps, chunk):
+        stop = min(start + chunk, nsteps)
+        f = read(start, stop)
+        env = millennial_modifiers(f['T'], f['W'], p, soilp, cache=None)
+        for j in range(stop - start):
+            k = (start + j) // every
+            if k >= n_out:
+                break
+            p['CUE'] = env['CUE'][j]
+            pt = millennial_param(**p)
+            with PROFILER.stage('sensitivity.partials', x[0].size):
+                F, J, dR = flux_partials(x, pt, theta, dt, env['env_f'][j],
+                                         cue_partials(theta, p, f['T'][j]))
+            res['Rh'][k] += dt * (F['Fmr'] + F['Fgr'])
+            res['dRh'][k] += dt * (np.einsum('i...,ij...->j...', dR[:5], S) + dR[5:])
+
+            with PROFILER.stage('sensitivity.update', x[0].size):
+                # tangent-linear update with the Jacobians at x(k)
+                S += dt * (np.einsum('pi...,ij...->pj...', J[:, :5], S) + J[:, 5:])
+                L = f['litter'][j]
+                update_pools(x, F, [split * L, (1.0 - split) * L], p['pa'], dt)
+            if (start + j + 1) % every == 0:
+                res['x'][k] = x
+                res['S'][k] = S
+        if PROFILER.hooks:
+            PROFILER.tick('sensitivity', x)
+    return res
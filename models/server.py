@@ -0,0 +1,480 @@
+# -*- coding: utf-8 -*-
+"""
+Created on Tue Oct 27 09:30:41 2026
+
+Local model-serving endpoint with request micro-batching.
+
+An asyncio TCP server speaking newline-delimited JSON keeps ICBM, Yasso and
+DAMM models warm (one per parameter set). Concurrent single-site requests for
+the same model, parameters and horizon are queued and coalesced into one
+vectorized call after a short window (or when max_batch is reached), so cost
+scales with the number of batches rather than requests. Results are returned
+per request. Requests can be pipelined on a connection; responses carry the
+request id and may arrive out of order.
+
+    request:  {"id": 1, "model": "icbm", "args": {"Y": 0.3, "O": 4.0, "I": 0.285,
+               "fenv": 1.0, "years": 10}}
+    response: {"id": 1, "result": {"Y": ..., "O": ..., "C": ...}}
+    metrics:  {"id": 2, "op": "metrics"}
+
+    python server.py --port 8765
+    python server.py --load-test 10000 --concurrency 256
+"""
+
+import sys
+import json
+import time
+import socket
+import asyncio
+import argparse
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+from modifiers import _digest
+
+NT = 273.15  # 0 degC in Kelvin
+
+
+""" *** request fields: validated and normalized per request in submit *** """
+
+def _number(args, key, default=None):
+    """ finite number field of a request; raises ValueError if missing or invalid """
+    v = args.get(key, default)
+    if v is None:
+        raise ValueError('missing field %r' % key)
+    if isinstance(v, bool) or not isinstance(v, (int, float)) or not np.isfinite(v):
+        raise ValueError('field %r must be a finite number, got %r' % (key, v))
+    return float(v)
+
+
+def _vector(args, key, n, default=None):
+    """ field of n finite numbers; raises ValueError if missing or invalid """
+    v = args.get(key, default)
+    if not isinstance(v, (list, tuple)) or len(v) != n:
+        raise ValueError('field %r must be a list of %d numbers, got %r' % (key, n, v))
+    return [_number({key: a}, key) for a in v]
+
+
+def icbm_args(args):
+    """ Y, O (required), I, fenv """
+    return {'Y': _number(args, 'Y'), 'O': _number(args, 'O'),
+            'I': _number(args, 'I', 0.0), 'fenv': _number(args, 'fenv', 1.0)}
+
+
+def yasso_args(args):
+    """ temp (required), litter, x """
+    out = {'temp': _number(args, 'temp'), 'litter': _vector(args, 'litter', 3, [0.0, 0.0, 0.0])}
+    if 'x' in args:
+        out['x'] = _vector(args, 'x', 7)
+    return out
+
+
+def damm_args(args):
+    """ T, W (required), St, poros """
+    out = {'T': _number(args, 'T'), 'W': _number(args, 'W')}
+    for k in ('St', 'poros'):
+        if k in args:
+            out[k] = _number(args, k)
+    return out
+
+
+""" *** batch kernels: args is a list of validated request dicts, returns list of results *** """
+
+def _col(args, key, default=None):
+    """ request field over the batch as array (n,) """
+    return np.array([a.get(key, default) for a in args], dtype=float)
+
+
+def icbm_batch(model, args, years):
+    """
+    ICBM, exact solution over years with constant input and modifier.
+    Args per request: Y, O (kg C m-2), I (kg C m-2 yr-1), fenv (-)
+    """
+    x = np.array([_col(args, 'Y'), _col(args, 'O')])
+    x1 = model.step(x, _col(args, 'I'), _col(args, 'fenv')[None, :], dt=years)
+    return [{'Y': float(y), 'O': float(o), 'C': float(y + o)} for y, o in x1.T]
+
+
+def yasso_batch(model, args, years):
+    """
+    Yasso, annual steps.
+    Args per request: litter [nwl, fwl, cwl] (kg m-2 yr-1), temp, x (7 pools,
+    optional; default model initial pools)
+    """
+    x0 = model.x0 if model.x0.ndim == 1 else model.x0[:, 0]
+    model.x = np.array([a.get('x', x0) for a in args], dtype=float).T
+    u = np.array([a['litter'] for a in args], dtype=float).T
+    temp = _col(args, 'temp')
+    CO2 = np.zeros(len(args))
+    for _ in range(int(years)):
+        CO2, _, _, _ = model.decomp_one_timestep(u[0], u[1], u[2], temp)
+    return [{'x': model.x[:, k].tolist(), 'CO2': float(CO2[k])} for k in range(len(args))]
+
+
+def damm_batch(model, args, years):
+    """
+    DAMM reaction velocity.
+    Args per request: T (degC), W (m3 m-3), St, poros (optional, default
+    server values)
+    """
+    model.St = _col(args, 'St', model.St0)
+    model.poros = _col(args, 'poros', model.poros0)
+    v, c = model.reaction_velocity(_col(args, 'T') + NT, _col(args, 'W'))
+    return [{'v': float(v[k]), 'fs': float(c['fs'][k]), 'fo2': float(c['fo2'][k])}
+            for k in range(len(args))]
+
+
+def _make_icbm(para):
+    from icbm import icbm_system, param
+    return icbm_system(para or param)
+
+
+def _make_yasso(para, corrected=False):
+    from yasso import yasso
+    m = yasso(para, corrected)
+    m.x0 = m.x.copy()
+    return m
+
+
+def _make_damm(para, St=0.048, poros=0.68):
+    from damm import Damm, param
+    m = Damm(para or param, St, poros)
+    m.St0, m.poros0 = St, poros
+    return m
+
+
+# model: (constructor, batch kernel, request validation)
+MODELS = {'icbm': (_make_icbm, icbm_batch, icbm_args),
+          'yasso': (_make_yasso, yasso_batch, yasso_args),
+          'damm': (_make_damm, damm_batch, damm_args)}
+
+
+class Metrics():
+    def __init__(self, maxlen=100000):
+        """ latency and throughput counters; latencies of last maxlen requests """
+        self.t0 = time.perf_counter()
+        self.requests = 0
+        self.batches = 0
+        self.errors = 0
+        self.per_model = {}
+        self.latency = deque(maxlen=maxlen)
+        self.compute = 0.0
+
+    def as_dict(self):
+        el = time.perf_counter() - self.t0
+        lat = np.array(self.latency) * 1e3
+        q = np.percentile(lat, [50, 95, 99]) if len(lat) else [None] * 3
+        return {'requests': self.requests, 'batches': self.batches, 'errors': self.errors,
+                'mean_batch': self.requests / self.batches if self.batches else None,
+                'latency_ms': {'p50': q[0], 'p95': q[1], 'p99': q[2],
+                               'mean': float(lat.mean()) if len(lat) else None},
+                'throughput': self.requests / el if el > 0 else None,
+                'compute_s': self.compute, 'uptime_s': el, 'per_model': dict(self.per_model)}
+
+
+class ModelServer():
+    def __init__(self, host='127.0.0.1', port=8765, window=0.002, max_batch=4096,
+                 yasso_corrected=False):
+        """
+        Args:
+            host, port - address to listen on (port 0 picks a free port)
+            window - batching window (s) after the first queued request
+            max_batch - batch is run immediately when this many are queued
+            yasso_corrected - serve yasso(corrected=True), see yasso.yasso
+        """
+        self.host = host
+        self.port = port
+        self.window = window
+        self.max_batch = max_batch
+        self.metrics = Metrics()
+        self._options = {'yasso': {'corrected': yasso_corrected}}  # model constructor kwargs
+        self._models = {}    # warm models by (model, parameter digest)
+        self._queues = {}    # pending requests by batch key
+        self._timers = {}
+        # model calls run in one worker thread; the event loop keeps queueing
+        self._executor = ThreadPoolExecutor(1)
+        self._server = None
+        self._conns = set()
+
+    async def start(self):
+        """ starts listening; returns the bound port """
+        self._server = await asyncio.start_server(self._handle, self.host, self.port)
+        self.port = self._server.sockets[0].getsockname()[1]
+        return self.port
+
+    async def serve_forever(self):
+        if self._server is None:
+            await self.start()
+        async with self._server:
+            await self._server.serve_forever()
+
+    async def stop(self, timeout=5.0):
+        """ stops listening and waits for open connections to finish """
+        self._server.close()
+        if self._conns:
+            await asyncio.wait(list(self._conns), timeout=timeout)
+        await self._server.wait_closed()
+        self._executor.shutdown()
+
+    def _model(self, name, para):
+        key = (name, _digest(para))
+        if key not in self._models:
+            self._models[key] = MODELS[name][0](para, **self._options.get(name, {}))
+        return self._models[key]
+
+    async def submit(self, name, args, para=None):
+        """
+        queues a single-site request and waits for its batch; invalid
+        requests raise ValueError here and never join a batch
+        Returns:
+            result dict
+        """
+        try:
+            if name not in MODELS:
+                raise ValueError('unknown model %r' % name)
+            if not isinstance(args, dict):
+                raise ValueError('args must be an object')
+            years = _number(args, 'years', 1)
+            if years <= 0 or (name == 'yasso' and years != int(years)):
+                raise ValueError('invalid years %r' % years)
+            args = MODELS[name][2](args)
+        except ValueError:
+            self.metrics.errors += 1
+            raise
+        loop = asyncio.get_running_loop()
+        key = (name, _digest(para), years)
+        fut = loop.create_future()
+        q = self._queues.setdefault(key, [])
+        q.append((args, fut, time.perf_counter(), para))
+        if len(q) >= self.max_batch:
+            self._flush(key)
+        elif len(q) == 1:
+            self._timers[key] = loop.call_later(self.window, self._flush, key)
+        return await fut
+
+    def _flush(self, key):
+        q = self._queues.pop(key, None)
+        t = self._timers.pop(key, None)
+        if t is not None:
+            t.cancel()
+        if q:
+            asyncio.get_running_loop().create_task(self._run(key, q))
+
+    def _compute(self, key, q):
+        name, _, years = key
+        t0 = time.perf_counter()
+        res = MODELS[name][1](self._model(name, q[0][3]), [a for a, _, _, _ in q], years)
+        self.metrics.compute += time.perf_counter() - t0
+        return res
+
+    async def _run(self, key, q):
+        loop = asyncio.get_running_loop()
+        m = self.metrics
+        try:
+            res = await loop.run_in_executor(self._executor, self._compute, key, q)
+        except Exception as e:
+            m.errors += len(q)
+            for _, fut, _, _ in q:
+                if not fut.done():
+                    fut.set_exception(e)
+            return
+        t1 = time.perf_counter()
+        m.batches += 1
+        m.requests += len(q)
+        m.per_model[key[0]] = m.per_model.get(key[0], 0) + len(q)
+        for (_, fut, t0, _), r in zip(q, res):
+            m.latency.append(t1 - t0)
+            if not fut.done():
+                fut.set_result(r)
+
+    async def _handle(self, reader, writer):
+        conn = asyncio.current_task()
+        self._conns.add(conn)
+        lock = asyncio.Lock()
+        tasks = set()
+
+        async def respond(msg):
+            rid = None
+            try:
+                req = json.loads(msg)
+                rid = req.get('id')
+                op = req.get('op', 'run')
+                if op == 'metrics':
+                    out = {'id': rid, 'result': self.metrics.as_dict()}
+                elif op == 'ping':
+                    out = {'id': rid, 'result': 'pong'}
+                else:
+                    r = await self.submit(req['model'], req.get('args', {}), req.get('para'))
+                    out = {'id': rid, 'result': r}
+            except Exception as e:
+                out = {'id': rid, 'error': repr(e)}
+            async with lock:
+                writer.write((json.dumps(out) + '\n').encode())
+                await writer.drain()
+
+        try:
+            while True:
+                line = await reader.readline()
+                if not line:
+                    break
+                t = asyncio.ensure_future(respond(line))
+                tasks.add(t)
+                t.add_done_callback(tasks.discard)
+            if tasks:
+                await asyncio.gather(*tasks, return_exceptions=True)
+        finally:
+            writer.close()
+            self._conns.discard(conn)
+
+
+""" *** clients *** """
+
+class Client():
+    def __init__(self, host='127.0.0.1', port=8765, timeout=30.0):
+        """ blocking client, one request at a time """
+        self.sock = socket.create_connection((host, port), timeout=timeout)
+        self.f = self.sock.makefile('rwb')
+        self._id = 0
+
+    def _call(self, req):
+        self._id += 1
+        req['id'] = self._id
+        self.f.write((json.dumps(req) + '\n').encode())
+        self.f.flush()
+        r = json.loads(self.f.readline())
+        if 'error' in r:
+            raise RuntimeError(r['error'])
+        return r['result']
+
+    def call(self, model, para=None, **args):
+        return self._call({'model': model, 'args': args, 'para': para})
+
+    def metrics(self):
+        return self._call({'op': 'metrics'})
+
+    def close(self):
+        self.f.close()
+        self.sock.close()
+
+
+class AsyncClient():
+    def __init__(self, reader, writer):
+        """ pipelining client; use AsyncClient.connect """
+        self.reader = reader
+        self.writer = writer
+        self._id = 0
+        self._pending = {}
+        self._task = asyncio.ensure_future(self._dispatch())
+
+    @classmethod
+    async def connect(cls, host='127.0.0.1', port=8765):
+        reader, writer = await asyncio.open_connection(host, port)
+        return cls(reader, writer)
+
+    async def _dispatch(self):
+        while True:
+            line = await self.reader.readline()
+            if not line:
+                break
+            r = json.loads(line)
+            fut = self._pending.pop(r['id'], None)
+            if fut is None:
+                continue
+            if 'error' in r:
+                fut.set_exception(RuntimeError(r['error']))
+            else:
+                fut.set_result(r['result'])
+
+    async def request(self, req):
+        self._id += 1
+        req['id'] = self._id
+        fut = asyncio.get_running_loop().create_future()
+        self._pending[self._id] = fut
+        self.writer.write((json.dumps(req) + '\n').encode())
+        await self.writer.drain()
+        return await fut
+
+    async def call(self, model, para=None, **args):
+        return await self.request({'model': model, 'args': args, 'para': para})
+
+    async def metrics(self):
+        return await self.request({'op': 'metrics'})
+
+    async def close(self):
+        self.writer.close()
+        await self.writer.wait_closed()
+        self._task.cancel()
+
+
+def _site(model, k):
+    """ synthetic single-site request for load tests """
+    if model == 'icbm':
+        return {'Y': 0.3, 'O': 4.0 + 0.001 * k, 'I': 0.285, 'fenv': 1.0, 'years': 10}
+    if model == 'yasso':
+        return {'litter': [0.2, 0.1, 0.05], 'temp': 4.0 + 0.001 * k, 'years': 1}
+    return {'T': 10.0 + 0.001 * k, 'W': 0.3}
+
+
+async def load_test(n=1000, concurrency=64, model='icbm', host='127.0.0.1', port=None,
+                    window=0.002, yasso_corrected=False):
+    """
+    fires n single-site requests with given concurrency at a server; starts
+    an in-process server if port is None.
+    Returns:
+        dict with wall time, request throughput and server metrics
+    """
+    server = None
+    if port is None:
+        server = ModelServer(host, 0, window=window, yasso_corrected=yasso_corrected)
+        port = await server.start()
+    clients = [await AsyncClient.connect(host, port) for _ in range(min(concurrency, 16))]
+    sem = asyncio.Semaphore(concurrency)
+
+    async def one(k):
+        async with sem:
+            return await clients[k % len(clients)].call(model, **_site(model, k))
+
+    t0 = time.perf_counter()
+    res = await asyncio.gather(*[one(k) for k in range(n)])
+    wall = time.perf_counter() - t0
+    metrics = await clients[0].metrics()
+    for c in clients:
+        await c.close()
+    if server is not None:
+        await server.stop()
+    return {'n': n, 'concurrency': concurrency, 'wall_s': wall, 'throughput': n / wall,
+            'results': res, 'metrics': metrics}
+
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description=__doc__.strip().splitlines()[2])
+    ap.add_argument('--host', default='127.0.0.1')
+    ap.add_argument('--port', type=int, default=8765)
+    ap.add_argument('--window', type=float, default=0.002, help='batching window (s)')
+    ap.add_argument('--max-batch', type=int, default=4096)
+    ap.add_argument('--load-test', type=int, default=None, metavar='N',
+                    help='run N requests against an in-process server and exit')
+    ap.add_argument('--concurrency', type=int, default=64)
+    ap.add_argument('--model', default='icbm', choices=list(MODELS.keys()))
+    ap.add_argument('--yasso-corrected', action='store_true',
+                    help='serve the corrected Yasso equations')
+    args = ap.parse_args(argv)
+
+    if args.load_test:
+        r = asyncio.run(load_test(args.load_test, args.concurrency, args.model,
+                                  args.host, None, args.window, args.yasso_corrected))
+        m = r['metrics']
+        print('%d requests in %.3f s: %.0f req/s, %d batches (mean %.1f), '
+              'latency p50 %.2f ms p99 %.2f ms'
+              % (r['n'], r['wall_s'], r['throughput'], m['batches'], m['mean_batch'],
+                 m['latency_ms']['p50'], m['latency_ms']['p99']))
+        return
+    server = ModelServer(args.host, args.port, args.window, args.max_batch,
+                         args.yasso_corrected)
+    asyncio.run(server.serve_forever())
+
+
+if __name__ == '__main__':
+    main(sys.argv[1:])
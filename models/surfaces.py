@@ -0,0 +1,230 @@
+# -*- coding: utf-8 -*-
+"""
+Created on Wed Nov  4 13:40:19 2026
+
+Temperature-moisture response surfaces for many parameter sets.
+
+Surfaces are evaluated on broadcast 1-D axes, T (1, nT, 1) and W (1, 1, nW),
+with parameter sets along the leading axis (k, 1, 1), so no meshgrid is
+built. Evaluation is chunked over parameter sets and temperature rows, and
+each chunk is reduced to summaries at once:
+
+    fmax - maximum over moisture at each temperature (n_sets, nT)
+    w_opt - optimal moisture ridge, argmax refined by a parabola (n_sets, nT)
+    q10_ridge - local Q10 = exp(10 dln f / dT) on the ridge (n_sets, nT)
+    q10_mean - local Q10 averaged over moisture (n_sets, nT)
+
+Full maps (n_sets, nT, nW) of f or q10 are written only if asked for, e.g.
+into memory-mapped arrays. DAMM and the Century functions are separable,
+f = g(T) h(W), so their summaries follow from the 1-D factors alone.
+
+    T = np.arange(5.0, 25.0, 0.1); W = np.arange(0.1, 0.68, 0.01)
+    res = separable(*damm_factors(sets, St=0.048, poros=0.68, T=T, W=W), T, W)
+    res = evaluate(esom_rate(3), T, W / 0.3, {'ash': ash, 'N': N, 'pH': 3.3})
+"""
+
+import numpy as np
+
+CHUNK = 2**22  # max. grid points evaluated at a time
+
+
+def _sets(sets):
+    """ parameter sets as arrays (n_sets,) and their number """
+    sets = {k: np.atleast_1d(np.asarray(v, dtype=float)) for k, v in (sets or {}).items()}
+    n = max([len(v) for v in sets.values()] + [1])
+    return {k: np.broadcast_to(v, (n,)) for k, v in sets.items()}, n
+
+
+def _ridge(f, W, axis=-1):
+    """
+    location of the maximum of f along moisture axis, refined by a parabola
+    through the maximum and its neighbours
+    """
+    f = np.moveaxis(f, axis, -1)
+    nW = f.shape[-1]
+    j = np.argmax(f, axis=-1)
+    w = W[j]
+    if nW < 3:
+        return w, j
+    jc = np.clip(j, 1, nW - 2)
+    f0 = np.take_along_axis(f, (jc - 1)[..., None], -1)[..., 0]
+    f1 = np.take_along_axis(f, jc[..., None], -1)[..., 0]
+    f2 = np.take_along_axis(f, (jc + 1)[..., None], -1)[..., 0]
+    x0, x1, x2 = W[jc - 1], W[jc], W[jc + 1]
+    num = (x1 - x0)**2 * (f1 - f2) - (x1 - x2)**2 * (f1 - f0)
+    den = (x1 - x0) * (f1 - f2) - (x1 - x2) * (f1 - f0)
+    inner = (j == jc) & (den != 0.0)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        wr = x1 - 0.5 * num / den
+    return np.where(inner, wr, w), j
+
+
+def _q10(f, T, axis):
+    """ local Q10 = exp(10 dln f / dT); nan where f <= 0 """
+    with np.errstate(divide='ignore', invalid='ignore'):
+        lf = np.log(np.where(f > 0.0, f, np.nan))
+        return np.exp(10.0 * np.gradient(lf, T, axis=axis))
+
+
+def _wmean(q, axis=-1):
+    """ mean over finite values """
+    ok = np.isfinite(q)
+    n = ok.sum(axis=axis)
+    with np.errstate(invalid='ignore'):
+        return np.where(ok, q, 0.0).sum(axis=axis) / np.where(n > 0, n, np.nan)
+
+
+def evaluate(func, T, W, sets=None, chunk=CHUNK, maps=(), out=None):
+    """
+    response surface summaries of func over T and W axes for parameter sets.
+    Args:
+        func - callable(T, W, **params) broadcasting T (1, nT, 1), W (1, 1, nW)
+               and parameters (k, 1, 1)
+        T - temperature axis (nT,), increasing
+        W - moisture axis (nW,)
+        sets - dict of parameter arrays (n_sets,) or scalars passed to func
+        chunk - max. number of grid points evaluated at a time
+        maps - names of full maps to return: 'f' and/or 'q10'
+        out - dict of preallocated map arrays (n_sets, nT, nW), e.g. memmaps
+    Returns:
+        dict of summaries (n_sets, nT): fmax, w_opt, q10_ridge, q10_mean, and
+        the requested maps
+    """
+    T = np.asarray(T, dtype=float)
+    W = np.asarray(W, dtype=float)
+    sets, n = _sets(sets)
+    nT, nW = len(T), len(W)
+    ks = int(min(n, max(1, chunk // (nT * nW))))
+    kt = nT if ks > 1 or nT * nW <= chunk else int(max(1, chunk // nW))
+
+    res = {k: np.full((n, nT), np.nan) for k in ('fmax', 'w_opt', 'q10_ridge', 'q10_mean')}
+    out = dict(out or {})
+    for m in maps:
+        if m not in out:
+            out[m] = np.full((n, nT, nW), np.nan)
+
+    for s0 in range(0, n, ks):
+        s1 = min(s0 + ks, n)
+        p = {k: v[s0:s1, None, None] for k, v in sets.items()}
+        for t0 in range(0, nT, kt):
+            t1 = min(t0 + kt, nT)
+            # one row of halo on both sides keeps dT-gradients those of the full grid
+            lo, hi = max(t0 - 1, 0), min(t1 + 1, nT)
+            f = func(T[None, lo:hi, None], W[None, None, :], **p)
+            f = np.broadcast_to(f, (s1 - s0, hi - lo, nW))
+            q = _q10(f, T[lo:hi], axis=1)[:, t0 - lo:t1 - lo]
+            f = f[:, t0 - lo:t1 - lo]
+
+            w, j = _ridge(f, W)
+            res['fmax'][s0:s1, t0:t1] = np.take_along_axis(f, j[..., None], -1)[..., 0]
+            res['w_opt'][s0:s1, t0:t1] = w
+            res['q10_ridge'][s0:s1, t0:t1] = np.take_along_axis(q, j[..., None], -1)[..., 0]
+            res['q10_mean'][s0:s1, t0:t1] = _wmean(q)
+            if 'f' in out:
+                out['f'][s0:s1, t0:t1] = f
+            if 'q10' in out:
+                out['q10'][s0:s1, t0:t1] = q
+    res.update(out)
+    return res
+
+
+def separable(gT, hW, T, W):
+    """
+    summaries (see evaluate) of a separable surface f = g(T) h(W) from its
+    factors. h >= 0 is required; g may change sign (e.g. fT_century below
+    about -15 degC), so the maximum over moisture is g max(h) where g > 0
+    and g min(h) where g < 0, and Q10 is nan where f <= 0.
+    Args:
+        gT - temperature factor (n_sets, nT)
+        hW - moisture factor (n_sets, nW), non-negative
+        T, W - axes (nT,), (nW,)
+    Returns:
+        dict of summaries (n_sets, nT)
+    """
+    T = np.asarray(T, dtype=float)
+    W = np.asarray(W, dtype=float)
+    gT, hW = np.atleast_2d(gT), np.atleast_2d(hW)
+    if np.any(hW < 0.0):
+        raise ValueError('separable: moisture factor hW must be non-negative')
+    n = max(len(gT), len(hW))
+    gT = np.broadcast_to(gT, (n, len(T)))
+    hW = np.broadcast_to(hW, (n, len(W)))
+    w_hi, j_hi = _ridge(hW, W)
+    w_lo, j_lo = _ridge(-hW, W)
+    hmax = np.take_along_axis(hW, j_hi[:, None], -1)
+    hmin = np.take_along_axis(hW, j_lo[:, None], -1)
+    # g = 0 gives f = 0 over W; its argmax is the first moisture (as in evaluate)
+    w_opt = np.where(gT > 0.0, w_hi[:, None], np.where(gT < 0.0, w_lo[:, None], W[0]))
+    q = _q10(gT, T, axis=1)
+    # Q10 is that of g wherever f = g h > 0, nan where h = 0 throughout
+    q_ridge = np.where(np.where(gT >= 0.0, hmax, hmin) > 0.0, q, np.nan)
+    q_mean = np.where(hmax > 0.0, q, np.nan)
+    return {'fmax': gT * np.where(gT >= 0.0, hmax, hmin), 'w_opt': w_opt,
+            'q10_ridge': q_ridge, 'q10_mean': q_mean}
+
+
+""" *** model surfaces *** """
+
+def damm_velocity(T, W, St, poros, **para):
+    """
+    DAMM reaction velocity (see damm.Damm.reaction_velocity) for evaluate;
+    T in degC, parameters as in damm.Damm plus St and poros
+    """
+    from damm import Damm, NT
+    v, _ = Damm(para, St, poros).reaction_velocity(T + NT, W)
+    return v
+
+
+def damm_factors(sets, St, poros, T, W):
+    """
+    separable factors of DAMM: Vmax(T) and fs(W) fo2(W).
+    Args:
+        sets - dict of DAMM parameters (see damm.Damm), arrays (n_sets,) or
+               scalars; may also hold St and poros
+        St, poros - substrate and porosity, if not in sets
+        T - temperature axis (degC)
+        W - liquid water content axis (m3 m-3)
+    Returns:
+        gT (n_sets, nT), hW (n_sets, nW)
+    """
+    from damm import Damm, NT
+    s, _ = _sets(sets)
+    s = {k: v[:, None] for k, v in s.items()}
+    St = s.pop('St', St)
+    poros = s.pop('poros', poros)
+    model = Damm(s, St, poros)
+    # one call along each axis; the other is held at a dummy value
+    _, cT = model.reaction_velocity(np.asarray(T, dtype=float)[None, :] + NT, 0.0)
+    _, cW = model.reaction_velocity(NT, np.asarray(W, dtype=float)[None, :])
+    return cT['Vmax'], cW['fs'] * cW['fo2']
+
+
+def century_factors(T, W, fc):
+    """
+    separable factors of the Century modifier fT_century(T) fW_century(W / fc)
+    Args:
+        T - temperature axis (degC)
+        W - vol. moisture axis (m3 m-3)
+        fc - field capacity, scalar or (n_sets,)
+    Returns:
+        gT (1, nT), hW (n_sets, nW)
+    """
+    from millennial import fT_century, fW_century
+    fc = np.atleast_1d(np.asarray(fc, dtype=float))[:, None]
+    return (fT_century(np.asarray(T, dtype=float))[None, :],
+            fW_century(np.asarray(W, dtype=float)[None, :] / fc))
+
+
+def esom_rate(k):
+    """
+    ESOM decomposition rate k1...k6 (see esom.rates_from_responses) as
+    func(T, W, ash, N, pH) for evaluate; W is normalized water content w/wfc
+    and peat layer temperatures equal T
+    """
+    from esom import responses, rates_from_responses
+
+    def func(T, W, ash=2.0, N=1.0, pH=3.3):
+        T, W = np.broadcast_arrays(T, W)
+        r = responses(T, T, T, T, W)
+        return rates_from_responses(ash, N, pH, T, r, 1.0, 1.0, 1.0)[k - 1]
+    return func
@@ -0,0 +1,247 @@
+# -*- coding: utf-8 -*-
+"""
+Created on Fri Oct 23 14:02:36 2026
+
+Tiled out-of-core execution over raster domains.
+
+Static soil rasters (clay, bd, fc, sfc, litter ...) and forcing are given as
+arrays or .npy files that are opened memory-mapped. The domain is flattened
+and split into tiles of consecutive cells (row blocks of a C-ordered raster,
+so each tile is a contiguous read per timestep). For each tile the valid cells
+are gathered, a vectorized kernel is run over them and the results are
+scattered back and written tile by tile into .npy outputs. Cells that are
+nodata in any static raster or masked out are skipped, so peak memory is set
+by tile size and not by domain size. Forcing is checked as it is read: nodata
+values are replaced by nan, and cells with nodata at any timestep are written
+as fill.
+
+    runner = TileRunner({'clay': 'clay.npy', 'bd': 'bd.npy', 'fc': 'fc.npy'},
+                        {'T': 'T.npy', 'W': 'W.npy', 'litter': 'litter.npy'},
+                        tile=100000, nodata=-9999.0)
+    res = runner.run(millennial_kernel(C0=100.0), out='results/')
+"""
+
+import os
+
+import numpy as np
+
+from instrument import PROFILER
+
+
+def _open(a):
+    """ opens a .npy file memory-mapped; arrays are returned as is """
+    if isinstance(a, str):
+        return np.load(a, mmap_mode='r')
+    return np.asarray(a)
+
+
+class TileRunner():
+    def __init__(self, static, forcing=None, tile=100000, nodata=None, mask=None,
+                 fill=np.nan):
+        """
+        Args:
+            static - dict of static rasters (arrays or .npy file names), all
+                     of domain shape
+            forcing - dict of forcing (nsteps, *domain shape) as arrays or
+                      .npy file names
+            tile - number of cells per tile
+            nodata - nodata value of the static rasters and forcing (nan is
+                     always nodata)
+            mask - boolean raster or .npy file, True for cells to compute
+            fill - output value of skipped cells
+        """
+        self.static = {k: _open(v) for k, v in static.items()}
+        self.forcing = {k: _open(v) for k, v in (forcing or {}).items()}
+        self.mask = None if mask is None else _open(mask)
+        self.shape = next(iter(self.static.values())).shape
+        self.n_cells = int(np.prod(self.shape))
+        for k, v in self.static.items():
+            if v.shape != self.shape:
+                raise ValueError('static raster %s has shape %s, expected %s'
+                                 % (k, v.shape, self.shape))
+        self.nsteps = 0
+        for k, v in self.forcing.items():
+            if v.shape[1:] != self.shape:
+                raise ValueError('forcing %s has shape %s, expected (nsteps,) + %s'
+                                 % (k, v.shape, self.shape))
+            self.nsteps = len(v)
+        self.tile = tile
+        self.nodata = nodata
+        self.fill = fill
+
+    def tiles(self):
+        """ yields (c0, c1) cell ranges of the flattened domain """
+        for c0 in range(0, self.n_cells, self.tile):
+            yield c0, min(c0 + self.tile, self.n_cells)
+
+    def valid(self, c0, c1):
+        """ indices of valid cells within tile c0:c1 """
+        ok = np.ones(c1 - c0, bool)
+        for v in self.static.values():
+            a = np.asarray(v.reshape(-1)[c0:c1])
+            if a.dtype.kind == 'f':
+                ok &= ~np.isnan(a)
+            if self.nodata is not None:
+                ok &= a != self.nodata
+        if self.mask is not None:
+            ok &= np.asarray(self.mask.reshape(-1)[c0:c1], dtype=bool)
+        return np.flatnonzero(ok)
+
+    def reader(self, c0, c1, idx, bad=None):
+        """
+        returns read(start, stop) giving forcing of the valid cells of a tile
+        as dict of arrays (stop - start, len(idx)). Nodata values are set to
+        nan and flagged in bad (len(idx),) if given.
+        """
+        def read(start, stop):
+            with PROFILER.stage('tiles.forcing', (stop - start) * len(idx)):
+                f = {}
+                for k, v in self.forcing.items():
+                    a = np.asarray(v.reshape(len(v), -1)[start:stop, c0:c1])[:, idx]
+                    miss = np.zeros(a.shape, bool)
+                    if a.dtype.kind == 'f':
+                        miss |= np.isnan(a)
+                    if self.nodata is not None:
+                        miss |= a == self.nodata
+                    if miss.any():
+                        if bad is not None:
+                            bad[miss.any(axis=0)] = True
+                        if a.dtype.kind == 'f':
+                            a[miss] = np.nan
+                    f[k] = a
+                return f
+        return read
+
+    def _create(self, out, name, prefix, dtype):
+        """ output (*prefix, *domain shape) and its view with flattened domain """
+        shp = tuple(prefix) + self.shape
+        if out is None:
+            a = np.empty(shp, dtype=dtype)
+        else:
+            a = np.lib.format.open_memmap(os.path.join(out, name + '.npy'), mode='w+',
+                                          dtype=dtype, shape=shp)
+        flat = a.reshape(tuple(prefix) + (self.n_cells,))
+        for c0, c1 in self.tiles():
+            flat[..., c0:c1] = self.fill
+        return a, flat
+
+    def run(self, kernel, out=None):
+        """
+        runs kernel over all tiles.
+        Args:
+            kernel - callable(static, read, nsteps) returning dict of output
+                     arrays (..., n); static is dict of arrays (n,) of the valid
+                     cells of a tile, read see reader
+            out - directory for .npy outputs (memory-mapped), or None to keep
+                  outputs in memory
+        Returns:
+            dict of outputs (..., *domain shape), and 'stats' with number of
+            tiles, skipped tiles, computed cells and cells with nodata in the
+            forcing
+        """
+        if out is not None:
+            os.makedirs(out, exist_ok=True)
+        res = {}
+        flat = {}
+        stats = {'tiles': 0, 'skipped': 0, 'cells': 0, 'forcing_nodata': 0}
+        for c0, c1 in self.tiles():
+            stats['tiles'] += 1
+            idx = self.valid(c0, c1)
+            if len(idx) == 0:
+                stats['skipped'] += 1
+                continue
+            with PROFILER.stage('tiles.read', len(idx)):
+                st = {k: np.asarray(v.reshape(-1)[c0:c1])[idx] for k, v in self.static.items()}
+            bad = np.zeros(len(idx), bool)
+            with PROFILER.stage('tiles.kernel', len(idx)):
+                r = kernel(st, self.reader(c0, c1, idx, bad), self.nsteps)
+            ok = ~bad
+            with PROFILER.stage('tiles.write', len(idx)):
+                for name, v in r.items():
+                    v = np.asarray(v)
+                    if name not in res:
+                        res[name], flat[name] = self._create(out, name, v.shape[:-1], v.dtype)
+                    blk = np.full(v.shape[:-1] + (c1 - c0,), self.fill, dtype=v.dtype)
+                    blk[..., idx[ok]] = v[..., ok]
+                    flat[name][..., c0:c1] = blk
+            stats['cells'] += int(ok.sum())
+            stats['forcing_nodata'] += int(bad.sum())
+            if PROFILER.hooks:
+                PROFILER.tick('tiles', r)
+
+        for a in res.values():
+            if isinstance(a, np.memmap):
+                a.flush()
+        res['stats'] = stats
+        return res
+
+
+""" *** kernels *** """
+
+def millennial_kernel(param=None, C0=100.0, split=0.66, chunk=365, dtype=float):
+    """
+    Millennial transient run over the forcing of a tile.
+    Static rasters: fc; litter (g C m-2 d-1) if not given as forcing.
+    Forcing: T (degC), W (m3 m-3) and optionally litter (g C m-2 d-1).
+    Args:
+        param - Millennial parameters (default millennial.param)
+        C0 - initial pools, scalar or (5,) (g C m-2)
+        split - fraction of litter to POM, rest to LMWC
+        chunk - timesteps per forcing read
+        dtype - dtype of pools
+    Returns:
+        kernel with outputs C (5, n) final pools (g C m-2) and Rh (n) mean
+        heterotrophic respiration (g C m-2 d-1)
+    """
+    from millennial import fluxes, update_pools, millennial_param, QMAX
+    from modifiers import millennial_modifiers
+    if param is None:
+        from millennial import param
+
+    def kernel(static, read, nsteps):
+        p = dict(param)
+        if p['Qmax'] is None:
+            p['Qmax'] = QMAX
+        dt = p['dt']
+        n = len(static['fc'])
+        x = np.empty((5, n), dtype=dtype)
+        x[:] = np.reshape(C0, (-1, 1))
+        Rh = np.zeros(n)
+        for start in range(0, nsteps, chunk):
+            f = read(start, min(start + chunk, nsteps))
+            env = millennial_modifiers(f['T'], f['W'], p, {'fc': static['fc']}, cache=None)
+            L = f['litter'] if 'litter' in f else np.broadcast_to(static['litter'], f['T'].shape)
+            for k in range(len(L)):
+                p['CUE'] = env['CUE'][k]
+                F = fluxes(x, millennial_param(**p), dt=dt, env_f=env['env_f'][k])
+                update_pools(x, F, [split * L[k], (1.0 - split) * L[k]], p['pa'], dt)
+                Rh += F['Fmr'] + F['Fgr']
+        return {'C': x, 'Rh': Rh / max(nsteps, 1)}
+    return kernel
+
+
+def esom_rates_kernel(ash=2.0, N=1.0, chunk=365):
+    """
+    ESOM decomposition rates averaged over the forcing of a tile.
+    Static rasters: sfc (site fertility class, for pH); optionally ash and N
+    (gravimetric %).
+    Forcing: tair, tp_top, tp_middle, tp_bottom (degC) and wn (w / wfc).
+    Args:
+        ash, N - defaults if not given as static rasters
+    Returns:
+        kernel with output k (9, n), mean rates k1...k9
+    """
+    from esom import pH_from_sfc, responses, rates_from_responses
+
+    def kernel(static, read, nsteps):
+        pH = pH_from_sfc(static['sfc'])
+        a = static.get('ash', ash)
+        nn = static.get('N', N)
+        ksum = np.zeros((9, len(pH)))
+        for start in range(0, nsteps, chunk):
+            f = read(start, min(start + chunk, nsteps))
+            r = responses(f['tair'], f['tp_top'], f['tp_middle'], f['tp_bottom'], f['wn'])
+            k = rates_from_responses(a, nn, pH, f['tair'], r, 1.0, 1.0, 1.0)
+            ksum += np.array([np.sum(np.broadcast_to(kk, f['tair'].shape), axis=0) for kk in k])
+        return {'k': ksum / max(nsteps, 1)}
+    return kernel
@@ -0,0 +1,199 @@
+# -*- coding: utf-8 -*-
+"""
+Created on Tue Oct 20 09:31:12 2026
+
+Steady-state age and transit-time distributions of linear compartmental
+systems dx/dt = u + B x (Sierra et al. 2015; Metzler & Sierra 2018).
+
+At steady state x* = -B^-1 u, the system age and the transit time are
+phase-type distributed:
+
+    system age density     f_A(y) = z^T exp(yB) eta,  eta = x* / |x*|
+    transit time density   f_T(y) = z^T exp(yB) beta, beta = u / |u|
+    pool age densities     f_a(y) = diag(x*)^-1 exp(yB) u
+
+with exit rates z = -1^T B. Everything is vectorized over sites; the
+eigendecomposition of B is computed once and reused for densities, CDFs and
+quantiles.
+
+    at = AgeTransit.from_system(icbm_system(para), I=0.285)
+    at.mean_transit_time(), at.quantile([0.5, 0.95], kind='age')
+"""
+
+import numpy as np
+
+
+class AgeTransit():
+    def __init__(self, B, u):
+        """
+        Args:
+            B - compartmental matrix (n, n) or (n_sites, n, n)
+            u - inputs (n,) or (n, n_sites)
+        """
+        B = np.asarray(B, dtype=float)
+        u = np.asarray(u, dtype=float)
+        self.single = B.ndim == 2 and u.ndim == 1
+        n = B.shape[-1]
+        if u.ndim == 1:
+            u = u[:, None]
+        m = max(u.shape[1], B.shape[0] if B.ndim == 3 else 1)
+        self.B = np.broadcast_to(B, (m, n, n))
+        self.u = np.broadcast_to(u.T, (m, n))  # (m, n)
+        self.n = n
+        self.m = m
+
+        self.xss = np.linalg.solve(-self.B, self.u[..., None])[..., 0]  # (m, n)
+        self.eta = self.xss / self.xss.sum(axis=1, keepdims=True)
+        self.beta = self.u / self.u.sum(axis=1, keepdims=True)
+        self.z = -self.B.sum(axis=1)  # exit rates (m, n)
+
+        self._eig = None
+
+    @classmethod
+    def from_system(cls, system, I, xi=1.0, x=None):
+        """
+        Args:
+            system - linear.LinearSystem
+            I, xi, x - inputs and environmental scaling, see LinearSystem.steady_state
+        """
+        shp = np.shape(system.steady_state(I, xi, x))
+        x_ = np.zeros(shp)
+        u = np.broadcast_to(system.input(I, x_), shp)
+        return cls(system.matrix(xi, x_), u.reshape(system.n, -1) if len(shp) > 1 else u)
+
+    def _out(self, a):
+        """ drops site axis for single-site systems """
+        return a[..., 0] if self.single else a
+
+    # --- moments
+
+    def mean_transit_time(self):
+        """ mean transit time |x*| / |u| """
+        return self._out(self.xss.sum(axis=1) / self.u.sum(axis=1))
+
+    def mean_system_age(self):
+        """ mean system age -1^T B^-1 eta """
+        v = np.linalg.solve(self.B, self.eta[..., None])[..., 0]
+        return self._out(-v.sum(axis=1))
+
+    def mean_pool_age(self):
+        """ mean age of each pool -(B^-1 x*) / x*, shape (n, sites) """
+        v = np.linalg.solve(self.B, self.xss[..., None])[..., 0]
+        return self._out((-v / self.xss).T)
+
+    # --- distributions
+
+    def _factorize(self):
+        """ eigendecomposition of B, cached; None for ill-conditioned sites """
+        if self._eig is None:
+            lam, V = np.linalg.eig(self.B)
+            ok = np.linalg.cond(V) < 1e8
+            Vinv = np.zeros_like(V)
+            Vinv[ok] = np.linalg.inv(V[ok])
+            self._eig = (lam, V, Vinv, ok)
+        return self._eig
+
+    def _survival(self, y, v):
+        """
+        1^T exp(yB) v for y (k,) or (k, m), v (m, n)
+        Returns:
+            (k, m)
+        """
+        lam, V, Vinv, ok = self._factorize()
+        y = np.asarray(y, dtype=float)
+        yy = y[:, None] if y.ndim == 1 else y
+        yy = np.broadcast_to(yy, (yy.shape[0], self.m))
+
+        a = V.sum(axis=1)                             # 1^T V  (m, n)
+        b = np.einsum('mij,mj->mi', Vinv, v)          # V^-1 v (m, n)
+        S = np.real(np.einsum('mi,kmi->km', a * b, np.exp(lam[None] * yy[..., None])))
+
+        if not ok.all():
+            from scipy.linalg import expm
+            bad = np.where(~ok)[0]
+            for k in range(yy.shape[0]):
+                E = expm(self.B[bad] * yy[k, bad][:, None, None])
+                S[k, bad] = np.einsum('mij,mj->m', E, v[bad])
+        return S
+
+    def _density(self, y, v):
+        """ z^T exp(yB) v """
+        lam, V, Vinv, ok = self._factorize()
+        y = np.asarray(y, dtype=float)
+        yy = np.broadcast_to(y[:, None] if y.ndim == 1 else y, (len(y), self.m))
+        a = np.einsum('mi,mij->mj', self.z, V)
+        b = np.einsum('mij,mj->mi', Vinv, v)
+        f = np.real(np.einsum('mi,kmi->km', a * b, np.exp(lam[None] * yy[..., None])))
+        if not ok.all():
+            from scipy.linalg import expm
+            bad = np.where(~ok)[0]
+            for k in range(yy.shape[0]):
+                E = expm(self.B[bad] * yy[k, bad][:, None, None])
+                f[k, bad] = np.einsum('mi,mij,mj->m', self.z[bad], E, v[bad])
+        return f
+
+    def system_age_density(self, y):
+        """ density of system age at ages y (k,), returns (k, sites) """
+        return self._out(self._density(y, self.eta))
+
+    def transit_time_density(self, y):
+        """ density of transit time at times y (k,), returns (k, sites) """
+        return self._out(self._density(y, self.beta))
+
+    def pool_age_density(self, y):
+        """ age densities of pools at ages y (k,), returns (k, n, sites) """
+        lam, V, Vinv, ok = self._factorize()
+        y = np.asarray(y, dtype=float)
+        b = np.einsum('mij,mj->mi', Vinv, self.u)
+        E = np.exp(lam[None] * y[:, None, None])     # (k, m, n)
+        f = np.real(np.einsum('mij,kmj->kmi', V, E * b[None]))
+        if not ok.all():
+            from scipy.linalg import expm
+            bad = np.where(~ok)[0]
+            for k in range(len(y)):
+                f[k, bad] = np.einsum('mij,mj->mi', expm(self.B[bad] * y[k]),
+                                      self.u[bad])
+        f = np.transpose(f / self.xss[None], (0, 2, 1))
+        return self._out(f)
+
+    def cdf(self, y, kind='age'):
+        """
+        cumulative distribution of system age ('age') or transit time ('transit')
+        """
+        v = self.eta if kind == 'age' else self.beta
+        return self._out(1.0 - self._survival(y, v))
+
+    def quantile(self, q, kind='age', rtol=1e-8, maxiter=200):
+        """
+        quantiles of system age ('age') or transit time ('transit') by
+        bracketing and bisection, vectorized over quantiles and sites.
+        Args:
+            q - probabilities (k,)
+        Returns:
+            (k, sites)
+        """
+        v = self.eta if kind == 'age' else self.beta
+        q = np.atleast_1d(np.asarray(q, dtype=float))
+        target = np.broadcast_to(1.0 - q[:, None], (len(q), self.m))
+
+        lo = np.zeros((len(q), self.m))
+        # initial bracket from the mean
+        mean = self.xss.sum(axis=1) / self.u.sum(axis=1) if kind == 'transit' \
+            else -np.linalg.solve(self.B, self.eta[..., None])[..., 0].sum(axis=1)
+        hi = np.broadcast_to(mean, lo.shape).copy()
+        for _ in range(maxiter):
+            S = self._survival(hi, v)
+            up = S > target
+            if not up.any():
+                break
+            lo = np.where(up, hi, lo)
+            hi = np.where(up, 2.0 * hi, hi)
+
+        for _ in range(maxiter):
+            mid = 0.5 * (lo + hi)
+            up = self._survival(mid, v) > target
+            lo = np.where(up, mid, lo)
+            hi = np.where(up, hi, mid)
+            if np.all(hi - lo <= rtol * hi):
+                break
+        return self._out(0.5 * (lo + hi))
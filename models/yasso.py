@@ -11,14 +11,20 @@ Created on Mon Dec 10 17:56:56 2018
 @author: lauren
 """
 
-import eco_utils
 import numpy as np
-import matplotlib.pyplot as plt
-import pandas as pd
-import xlrd
+
+from linear import LinearSystem
+from instrument import PROFILER
+
+POOLS = ['fwl', 'cwl', 'ext', 'cel', 'lig', 'hum1', 'hum2']
+
+# carbon fraction of litter mass (kg C kg-1); decomp_one_timestep takes litter
+# mass, drivers with litter carbon divide by it
+C_FRACTION = 0.5
+
 
 class yasso():
-    def __init__(self):
+    def __init__(self, param=None, corrected=False):
         
         #ABBREVIATIONS:
         #    - nwl: non woody litter
@@ -29,18 +35,35 @@ class yasso():
         #    - hum: humus
         #    - ext: extractives
         
+        # corrected=True steps Yasso as in Liski et al. 2005 (see yasso_system)
+        # instead of the original equations of this class
+        self.param = param if param is not None else decom_para()
+        self.system = yasso_system(self.param) if corrected else None
+        
         #Initial values based on humus layer density
         rho = 120.  #density of humus layer kg/m3
         depth = 0.15 #m
         Cc = 0.5  #kg C/ kgOM
-        self.xfwl = 0.05*depth*rho*Cc
-        self.xcwl =0.05*depth*rho*Cc 
-        self.xext =0.1*depth*rho*Cc
-        self.xcel =0.1*depth*rho*Cc
-        self.xlig =0.2*depth*rho*Cc
-        self.xhum1 =0.2*depth*rho*Cc
-        self.xhum2 = 0.3*depth*rho*Cc
+        # pools in order of POOLS
+        self.x = np.array([0.05, 0.05, 0.1, 0.1, 0.2, 0.2, 0.3])*depth*rho*Cc
     
+    def __getattr__(self, name):
+        # pools as attributes: self.xfwl, self.xcwl, ...
+        if name.startswith('x') and name[1:] in POOLS:
+            return self.x[POOLS.index(name[1:])]
+        raise AttributeError(name)
+
+    def __setattr__(self, name, value):
+        # writes to self.xfwl, ... go to the pool state; a per-site value
+        # broadcasts the other pools to its sites
+        if name.startswith('x') and name[1:] in POOLS:
+            x = self.x
+            shape = np.broadcast_shapes(x.shape[1:], np.shape(value))
+            x = x.reshape(x.shape[:1] + (1,) * (len(shape) + 1 - x.ndim) + x.shape[1:])
+            x = np.array(np.broadcast_to(x, x.shape[:1] + shape), dtype=float)
+            x[POOLS.index(name[1:])] = value
+            name, value = 'x', x
+        super().__setattr__(name, value)
 
     def map_carbon_to_NPK(self, CO2):
         """
@@ -60,14 +83,16 @@ class yasso():
         """
         Compute amount of CO2, N, P, K. Single yearly timestep.
         INPUT:
-            - unwl, ufwl, ucwl: float. kg/m2 of non-woody, fine and coarse woody litter produced in that year.
-            - temp: float, mean T, sum of T or log sum of T. With any of those changes, modify T0.
+            - unwl, ufwl, ucwl: float or array of sites. kg/m2 of non-woody, fine and coarse woody litter produced in that year.
+            - temp: float or array, mean T, sum of T or log sum of T. With any of those changes, modify T0.
         """    
         # 50% OF MASS OF C IN LITTER 
-        unwl = unwl * .5; ufwl = ufwl * .5; ucwl = ucwl * .5
+        unwl = unwl * C_FRACTION; ufwl = ufwl * C_FRACTION; ucwl = ucwl * C_FRACTION
         
-        # Read parameters from given file
-        param = eco_utils.decom_para()
+        if self.system is not None:
+            return self._system_timestep(unwl, ufwl, ucwl, temp)
+        
+        param = self.param
                 
         # Other parameters
         BETA = 0.106 # from paper
@@ -79,44 +104,113 @@ class yasso():
                         
         dt = 1. # year
         
-        # variation of k and a with T
-        kext = param['kext']*(1.0 + BETA * (temp - T0))
-        klig = param['klig']*(1.0 + BETA * (temp - T0))
-        kcel = param['kcel']*(1.0 + BETA * (temp - T0))
-        khum1 = param['khum1']*(1.0 + SHUM * BETA * (temp - T0))
-        khum2 = param['khum1']*(1.0 + SHUM * BETA * (temp - T0))
-        acwl = param['acwl']*(1.0 + 0.4 * BETA * (temp - T0))
-        afwl = param['afwl']*(1.0 + 0.4 * BETA * (temp - T0))
+        n = np.size(self.x[0])
+        with PROFILER.stage('yasso.modifiers', n):
+            # variation of k and a with T
+            kext = param['kext']*(1.0 + BETA * (temp - T0))
+            klig = param['klig']*(1.0 + BETA * (temp - T0))
+            kcel = param['kcel']*(1.0 + BETA * (temp - T0))
+            khum1 = param['khum1']*(1.0 + SHUM * BETA * (temp - T0))
+            khum2 = param['khum1']*(1.0 + SHUM * BETA * (temp - T0))
+            acwl = param['acwl']*(1.0 + 0.4 * BETA * (temp - T0))
+            afwl = param['afwl']*(1.0 + 0.4 * BETA * (temp - T0))
+        
+        # eqs (1-7), pools of all sites as rows of self.x
+        xfwl0, xcwl0, xext0, xcel0, xlig0, xhum10, xhum20 = self.x
+        with PROFILER.stage('yasso.fluxes', n):
+            CO2 = ((1.-param['pext'])*kext * xext0 + (1.-param['pcel'])*kcel * xcel0 +
+                   (1.-param['plig'])*klig * xlig0 + (1.-param['phum1'])*khum1 * xhum10 +
+                   1.0*khum2 * xhum20)
+        
+        with PROFILER.stage('yasso.update', n):
+            x = [ufwl*dt + xfwl0*(1. - afwl*dt),
+                 ucwl*dt + xcwl0*(1. - acwl*dt),
+                 ((unwl*cnwl_ext + cfwl_ext*afwl*xfwl0 + ccwl_ext*acwl*xcwl0) * dt
+                  + xext0 * (1.0 - kext*dt)),
+                 ((unwl*cnwl_cel + cfwl_cel*afwl*xfwl0 + ccwl_cel*acwl*xcwl0) * dt 
+                  + xcel0 * (1.0 - kcel*dt)),
+                 ((unwl*cnwl_lig + cfwl_lig*afwl*xfwl0 + ccwl_lig*acwl*xcwl0 + param['pext']*kext*xext0 + param['pcel']*kcel*xcel0) * dt 
+                  + xlig0 * (1.0 - klig*dt)),
+                 (param['plig']*klig*xlig0) * dt + xhum10 * (1.0 - khum1*dt),
+                 (param['phum1']*khum1*xlig0) * dt + xhum20 * (1.0 - khum2*dt)]
+            self.x = np.array(np.broadcast_arrays(*x), dtype=float)
+        if PROFILER.hooks:
+            PROFILER.tick('yasso', self)
+               
+        N, P, K = self.map_carbon_to_NPK(CO2)
+        
+        return CO2, N, P, K
     
-        CO2 = ((1.-param['pext'])*kext * self.xext + (1.-param['pcel'])*kcel * self.xcel +
-               (1.-param['plig'])*klig * self.xlig + (1.-param['phum1'])*khum1 * self.xhum1 +
-               1.0*khum2 * self.xhum2)
+
+    def _system_timestep(self, unwl, ufwl, ucwl, temp):
+        """ explicit annual step of yasso_system; litter C in kg/m2 """
+        I = np.array(np.broadcast_arrays(unwl, ufwl, ucwl), dtype=float)
         
-        # UPDATE VALLUE IN OBJECT LIKE SO: self.xfwl = xfwl1 
-        # eqs (1-7)
-        xfwl0 = self.xfwl
-        xcwl0 = self.xcwl
-        xext0 = self.xext
-        xcel0 = self.xcel
-        xlig0 = self.xlig
-        xhum10 = self.xhum1
-        xhum20 = self.xhum2
+        n = np.size(self.x[0])
+        with PROFILER.stage('yasso.modifiers', n):
+            xi = temperature_scaling(self.param, temp)
+            if self.x.ndim < xi.ndim:
+                self.x = np.repeat(self.x[:, None], xi.shape[1], axis=1)
+            elif xi.ndim < self.x.ndim:
+                xi = xi.reshape(xi.shape + (1,) * (self.x.ndim - xi.ndim))  # per pool
         
-        self.xfwl = ufwl*dt + xfwl0*(1. - afwl*dt)
-        self.xcwl = ucwl*dt + xcwl0*(1. - acwl*dt)
-        self.xext = ((unwl*cnwl_ext + cfwl_ext*afwl*xfwl0 + ccwl_ext*acwl*xcwl0) * dt
-                + xext0 * (1.0 - kext*dt))
-        self.xcel = ((unwl*cnwl_cel + cfwl_cel*afwl*xfwl0 + ccwl_cel*acwl*xcwl0) * dt 
-                + xcel0 * (1.0 - kcel*dt))
-        self.xlig = ((unwl*cnwl_lig + cfwl_lig*afwl*xfwl0 + ccwl_lig*acwl*xcwl0 + param['pext']*kext*xext0 + param['pcel']*kcel*xcel0) * dt 
-                + xlig0 * (1.0 - klig*dt))
-        self.xhum1 = (param['plig']*klig*xlig0) * dt + xhum10 * (1.0 - khum1*dt)
-        self.xhum2 = (param['phum1']*khum1*xlig0) * dt + xhum20 * (1.0 - khum2*dt)
+        with PROFILER.stage('yasso.fluxes', n):
+            CO2 = self.system.fluxes(self.x, xi)['respiration'].sum(axis=0)
+        
+        with PROFILER.stage('yasso.update', n):
+            self.x = self.system.step(self.x, I, xi, dt=1.0, method='explicit')
+        if PROFILER.hooks:
+            PROFILER.tick('yasso', self)
                
         N, P, K = self.map_carbon_to_NPK(CO2)
         
         return CO2, N, P, K
+
+
+def yasso_system(param):
+    """
+    Yasso (Liski et al. 2005) as linear compartmental system.
+    Pools in order of POOLS; input streams non-woody, fine and coarse woody
+    litter C.
+    Args:
+        param - parameter dict (see decom_para)
+    Returns:
+        linear.LinearSystem
+    """
+    ix = {p: j for j, p in enumerate(POOLS)}
+    chem = ['ext', 'cel', 'lig']
     
+    k = [param[n] for n in ['afwl', 'acwl', 'kext', 'kcel', 'klig', 'khum1', 'khum2']]
+    transfers = {(ix['ext'], ix['lig']): param['pext'],
+                 (ix['cel'], ix['lig']): param['pcel'],
+                 (ix['lig'], ix['hum1']): param['plig'],
+                 (ix['hum1'], ix['hum2']): param['phum1']}
+    # woody litter is exposed to decomposition according to its chemistry
+    for w in ['fwl', 'cwl']:
+        for c, f in zip(chem, param['c' + w]):
+            transfers[(ix[w], ix[c])] = f
+    
+    B = np.zeros((len(POOLS), 3))
+    B[[ix[c] for c in chem], 0] = param['cnwl']
+    B[ix['fwl'], 1] = 1.0
+    B[ix['cwl'], 2] = 1.0
+    
+    return LinearSystem(k, transfers, B, names=POOLS)
+
+
+def temperature_scaling(param, temp):
+    """
+    Temperature scaling of Yasso rates (Liski et al. 2005 eq. 8).
+    Args:
+        param - parameter dict (see decom_para)
+        temp - temperature variable, scalar or array of sites
+    Returns:
+        xi (7,) or (7, n_sites)
+    """
+    d = param['beta'] * (np.asarray(temp, dtype=float) - param['T0'])
+    s = np.array([0.4, 0.4, 1.0, 1.0, 1.0, param['shum'], param['shum']])
+    return 1.0 + s.reshape((len(POOLS),) + (1,) * d.ndim) * d
+
 
 def decom_para():
     #Liski et al. 2005, Yasso-model
@@ -132,5 +226,14 @@ def decom_para():
            'pcel':0.2,
            'plig':0.2,
            'phum1':0.2,
+           # chemical composition (ext, cel, lig) of non-woody, fine woody
+           # and coarse woody litter (Liski et al. 2005, sect. 3.2.1)
+           'cnwl': [0.27, 0.51, 0.22],
+           'cfwl': [0.03, 0.65, 0.32],
+           'ccwl': [0.03, 0.69, 0.28],
+           # temperature effect, rates relative to T0; shum for humus
+           'beta': 0.106,
+           'T0': -1.0,
+           'shum': 0.6,
            }
     return ypara
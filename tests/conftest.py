@@ -0,0 +1,11 @@
+# -*- coding: utf-8 -*-
+"""
+Model modules import their siblings directly (from linear import ...), so
+models/ is put on the path as when running from that directory.
+"""
+
+import os
+import sys
+
+MODELS = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'models')
+sys.path.insert(0, os.path.abspath(MODELS))
@@ -0,0 +1,31 @@
+import contextlib
+import io
+
+import numpy as np
+import pytest
+
+from column import FLUXES, MillennialState, MillennialStepper
+from millennial import Millennial, param
+
+SOILP = {'clay': 40.0, 'bd': 1350.0, 'poros': 0.5, 'fc': 0.3}
+
+
+@pytest.mark.parametrize('n', [1, 4])
+def test_stepper_matches_decompose(n):
+    rng = np.random.default_rng(1)
+    C0 = rng.uniform(20.0, 2000.0, (5, n))
+    d = np.arange(730)
+    T = 8.0 + 12.0 * np.sin(d / 58.0)[:, None] + np.arange(n)
+    W = 0.2 + 0.1 * np.cos(d / 40.0)[:, None] + 0.01 * np.arange(n)
+    L = 1.0 + 0.5 * rng.random((len(d), n))
+
+    with contextlib.redirect_stdout(io.StringIO()):
+        model = Millennial(dict(param), SOILP, C0.copy())
+    step = MillennialStepper(param, SOILP)
+    s = MillennialState(C0, n)
+    for k in range(len(d)):
+        F, _ = model.decompose(T[k], W[k], [0.66 * L[k], 0.34 * L[k]])
+        step(s, T[k], W[k], 0.66 * L[k], 0.34 * L[k])
+        for i, name in enumerate(FLUXES):
+            np.testing.assert_allclose(s.F[i], F[name], rtol=1e-12, atol=1e-14)
+    np.testing.assert_allclose(s.x, model.Cpools, rtol=1e-11)
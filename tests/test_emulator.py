@@ -0,0 +1,77 @@
+import numpy as np
+import pytest
+
+from emulator import Emulator
+
+INPUTS = {'a': (0.0, 2.0), 'b': (-1.0, 3.0)}
+
+
+def _poly(X):
+    """ two outputs, log-cubic in the inputs """
+    a, b = np.ravel(X['a']), np.ravel(X['b'])
+    return np.exp([0.5 + a - 0.3 * b**2 + 0.1 * a * b**2,
+                   -1.0 + 0.2 * a**3 + 0.05 * b])
+
+
+class _Counted():
+    def __init__(self, f):
+        self.f = f
+        self.n = []
+
+    def __call__(self, X):
+        self.n.append(len(np.ravel(X['a'])))
+        return self.f(X)
+
+
+def _fitted(simulate=_poly):
+    emu = Emulator(INPUTS, simulate, degree=3)
+    emu.fit(n_train=60, n_valid=20)
+    return emu
+
+
+def test_fit_recovers_polynomial():
+    emu = _fitted()
+    assert np.all(emu.validation['max_rel'] < 1e-10)
+    X = {'a': np.linspace(0.0, 2.0, 7), 'b': np.linspace(3.0, -1.0, 7)}
+    Y, inside = emu.predict(X)
+    assert inside.all()
+    np.testing.assert_allclose(Y, _poly(X), rtol=1e-10)
+    # scalars broadcast
+    Y, _ = emu.predict({'a': 1.0, 'b': X['b']})
+    np.testing.assert_allclose(Y, _poly({'a': np.ones(7), 'b': X['b']}), rtol=1e-10)
+
+
+def test_too_few_points():
+    with pytest.raises(ValueError):
+        Emulator(INPUTS, _poly, degree=3).fit(n_train=8, n_valid=5)
+
+
+def test_out_of_domain_falls_back_to_simulator():
+    sim = _Counted(_poly)
+    emu = _fitted(sim)
+    sim.n = []
+    X = {'a': np.array([1.0, 2.5, 0.5, -0.1]), 'b': np.array([0.0, 0.0, 3.5, 1.0])}
+    Y, inside = emu.predict(X)
+    np.testing.assert_array_equal(inside, [True, False, False, False])
+    assert sim.n == [3]
+    np.testing.assert_allclose(Y, _poly(X), rtol=1e-10)
+    Y, _ = emu.predict(X, fallback=False)
+    assert np.all(np.isnan(Y[:, ~inside])) and np.all(np.isfinite(Y[:, inside]))
+    assert sim.n == [3]
+
+
+def test_save_load_round_trip(tmp_path):
+    emu = _fitted()
+    fname = str(tmp_path / 'emu.npz')
+    emu.save(fname)
+    sim = _Counted(_poly)
+    new = Emulator.load(fname, simulate=sim)
+    assert new.names == emu.names and new.degree == emu.degree and new.log
+    np.testing.assert_array_equal(new.coef, emu.coef)
+    for k, v in emu.validation.items():
+        np.testing.assert_array_equal(new.validation[k], v)
+    X = {'a': np.array([0.3, 1.7, 2.2]), 'b': np.array([2.0, -0.5, 0.0])}
+    Y, inside = new.predict(X)
+    np.testing.assert_array_equal(Y[:, inside], emu.predict(X)[0][:, inside])
+    assert sim.n == [1]
+    assert new.report() == emu.report()
@@ -0,0 +1,96 @@
+import contextlib
+import io
+
+import numpy as np
+import pytest
+
+from damm import param as damm_param
+from ensemble import (DammMember, Ensemble, ICBMMember, MillennialMember, YassoMember,
+                      shared_terms)
+from icbm import param as icbm_param
+from instrument import PROFILER
+from millennial import Millennial, param
+
+SOILP = {'clay': 40.0, 'bd': 1350.0, 'poros': 0.5, 'fc': 0.3}
+C0 = np.array([600.0, 20.0, 30.0, 1500.0, 2500.0])
+
+
+def _members():
+    return {'millennial': MillennialMember(param, SOILP, C0),
+            'icbm': ICBMMember(icbm_param, {'Y': 0.3, 'O': 4.0}),
+            'yasso': YassoMember(split=(0.7, 0.2, 0.1)),
+            'damm': DammMember(damm_param, 0.048, 0.68)}
+
+
+def _forcing(days, n):
+    d = np.arange(days)[:, None]
+    return {'T': 8.0 + 10.0 * np.sin(2 * np.pi * d / 365.0) + np.arange(n),
+            'W': 0.25 + 0.05 * np.cos(d / 40.0) + 0.01 * np.arange(n),
+            'litter': 1.5 + 0.3 * np.sin(d / 30.0) * np.ones(n)}
+
+
+def _sequential(forcing, nsteps, n):
+    """ members one after another, one day at a time """
+    res = {}
+    with contextlib.redirect_stdout(io.StringIO()):
+        for name, m in _members().items():
+            m.init(n)
+            res[name] = {v: np.zeros((nsteps, n)) for v in m.variables}
+            for k in range(nsteps):
+                f = {v: a[k:k + 1] for v, a in forcing.items()}
+                m.advance(f, shared_terms(f, param, SOILP),
+                          {v: a[k:k + 1] for v, a in res[name].items()})
+    return res
+
+
+@pytest.mark.parametrize('parallel', [True, False])
+def test_ensemble_matches_sequential_members(parallel):
+    n, days = 3, 730
+    forcing = _forcing(days, n)
+    with contextlib.redirect_stdout(io.StringIO()):
+        res = Ensemble(_members(), forcing, SOILP, chunk=100, parallel=parallel).run(days)
+    ref = _sequential(forcing, days, n)
+    for name, r in ref.items():
+        for v, a in r.items():
+            np.testing.assert_allclose(res[name][v], a, rtol=1e-12, err_msg=name + v)
+    # yasso outputs on the last day of each year
+    assert np.all(np.isfinite(res['yasso']['C'][[364, 729]]))
+    assert np.sum(np.isfinite(res['yasso']['C'][:, 0])) == 2
+
+    # shared terms are those of the Millennial model itself
+    with contextlib.redirect_stdout(io.StringIO()):
+        model = Millennial(dict(param), SOILP, np.repeat(C0[:, None], n, axis=1))
+    for k in range(days):
+        L = forcing['litter'][k]
+        model.decompose(forcing['T'][k], forcing['W'][k], [0.66 * L, 0.34 * L])
+    np.testing.assert_allclose(res['millennial']['C'][-1], model.Cpools.sum(axis=0), rtol=1e-12)
+
+
+def test_soilp_is_required():
+    with pytest.raises(TypeError):
+        Ensemble(_members(), _forcing(10, 2))
+
+
+def test_hooks_see_each_step():
+    n, days = 2, 12
+    seen = []
+
+    def hook(src, k, res):
+        if src == 'ensemble':
+            seen.append((k, res['icbm']['C'].copy()))
+
+    PROFILER.reset()
+    PROFILER.add_hook(hook)
+    PROFILER.enabled = True
+    try:
+        members = {'icbm': ICBMMember(icbm_param, {'Y': 0.3, 'O': 4.0})}
+        res = Ensemble(members, _forcing(days, n), SOILP, chunk=5).run(days)
+    finally:
+        PROFILER.enabled = False
+        PROFILER.clear_hooks()
+        PROFILER.reset()
+    assert [k for k, _ in seen] == list(range(1, days + 1))
+    for k, C in seen:
+        # steps up to k are written, later ones not yet
+        np.testing.assert_array_equal(C[:k], res['icbm']['C'][:k])
+        assert np.all(C[k:] == 0.0)
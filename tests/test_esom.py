@@ -0,0 +1,18 @@
+import numpy as np
+
+from esom import (get_rates, moisture_functions, rates_from_responses, responses,
+                  temperature_functions)
+
+
+def test_get_rates_uses_given_functions():
+    T = np.linspace(-5.0, 25.0, 7)
+    wn = np.linspace(0.2, 1.2, 7)
+    tf = list(temperature_functions())
+    mf = moisture_functions()
+    ref = rates_from_responses(2.0, 1.0, 3.3, T, responses(T, T, T, T, wn), 1.0, 1.0, 1.0)
+    k = get_rates(2.0, 1.0, 3.3, T, T, T, T, *tf, wn, *mf, 1.0, 1.0, 1.0, 1.0)
+    np.testing.assert_allclose(k, ref, rtol=0)
+    tf[0] = lambda t: 2.0 * temperature_functions()[0](t)  # t2 enters k2 only
+    k2 = get_rates(2.0, 1.0, 3.3, T, T, T, T, *tf, wn, *mf, 1.0, 1.0, 1.0, 1.0)
+    assert not np.allclose(k2[1], ref[1])
+    np.testing.assert_allclose(np.delete(k2, 1, 0), np.delete(ref, 1, 0), rtol=0)
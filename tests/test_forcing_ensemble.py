@@ -0,0 +1,102 @@
+import contextlib
+import io
+
+import numpy as np
+import pytest
+
+from forcing_ensemble import MemberStats, run_millennial, run_yasso
+from millennial import Millennial, param
+from yasso import C_FRACTION, yasso
+
+SOILP = {'clay': 40.0, 'bd': 1350.0, 'poros': 0.5, 'fc': 0.3}
+Q = (0.1, 0.5, 0.9)
+
+
+def _check_stats(s, X):
+    """ s - MemberStats.as_dict; X - member values (n_out, n_members, n_cells) """
+    np.testing.assert_allclose(s['mean'], X.mean(axis=1), rtol=1e-12)
+    np.testing.assert_allclose(s['std'], X.std(axis=1, ddof=1), rtol=1e-9)
+    np.testing.assert_allclose(s['min'], X.min(axis=1), rtol=1e-12)
+    np.testing.assert_allclose(s['max'], X.max(axis=1), rtol=1e-12)
+    np.testing.assert_allclose(s['q'], np.quantile(X, Q, axis=1), rtol=1e-12)
+
+
+@pytest.mark.parametrize('kind', ['last', 'sum', 'mean'])
+def test_member_stats(kind):
+    rng = np.random.default_rng(3)
+    x = rng.random((12, 5, 2))
+    s = MemberStats(3, (5, 2), kind, Q)
+    for k in range(12):
+        s.add(x[k])
+        if (k + 1) % 4 == 0:
+            s.record((k + 1) // 4 - 1)
+    x = x.reshape(3, 4, 5, 2)
+    X = {'last': x[:, -1], 'sum': x.sum(axis=1), 'mean': x.mean(axis=1)}[kind]
+    _check_stats(s.as_dict(), X)
+
+
+def _millennial_forcing(days, m, n):
+    d = np.arange(days)[:, None, None]
+    return {'T': 8.0 + 10.0 * np.sin(d / 58.0) + np.arange(m)[:, None] + 0.5 * np.arange(n),
+            'W': 0.25 + 0.05 * np.cos(d / 40.0) + 0.01 * np.arange(m)[:, None] * np.ones(n),
+            'litter': 1.5 + 0.3 * np.sin(d / 30.0) * np.ones((1, n))}
+
+
+def test_millennial_matches_member_loop():
+    m, n, days, every = 4, 2, 60, 20
+    f = _millennial_forcing(days, m, n)
+    C0 = np.array([600.0, 20.0, 30.0, 1500.0, 2500.0])
+    res = run_millennial(dict(param), SOILP, f, C0, days, every=every, chunk=25, quantiles=Q)
+    C = np.zeros((days // every, m, n))
+    Rh = np.zeros((days // every, m, n))
+    for j in range(m):
+        with contextlib.redirect_stdout(io.StringIO()):
+            model = Millennial(dict(param), SOILP, np.repeat(C0[:, None], n, axis=1))
+        for k in range(days):
+            L = f['litter'][k, 0]
+            F, _ = model.decompose(f['T'][k, j], f['W'][k, j], [0.66 * L, 0.34 * L])
+            Rh[k // every, j] += F['Fmr'] + F['Fgr']
+            C[k // every, j] = model.Cpools.sum(axis=0)
+        np.testing.assert_allclose(res['x'][:, j], model.Cpools, rtol=1e-12)
+    _check_stats(res['C'], C)
+    _check_stats(res['Rh'], Rh)
+
+
+def test_millennial_member_axis_broadcasts():
+    f = _millennial_forcing(30, 3, 2)
+    full = dict(f, litter=np.repeat(f['litter'], 3, axis=1))
+    C0 = np.array([600.0, 20.0, 30.0, 1500.0, 2500.0])
+    a = run_millennial(dict(param), SOILP, f, C0, 30, every=10)
+    b = run_millennial(dict(param), SOILP, full, C0, 30, every=10, chunk=7)
+    np.testing.assert_array_equal(a['x'], b['x'])
+    for v in ('C', 'Rh'):
+        for s in ('mean', 'std', 'q'):
+            np.testing.assert_allclose(a[v][s], b[v][s], rtol=1e-13)
+
+
+@pytest.mark.parametrize('corrected', [False, True])
+def test_yasso_matches_member_loop(corrected):
+    m, n, years, every = 3, 2, 12, 4
+    yr = np.arange(years)[:, None, None]
+    f = {'temp': 3.0 + np.sin(yr) + np.arange(m)[:, None] + np.arange(n),
+         'litter': 300.0 + 50.0 * np.cos(yr) * np.ones((1, n))}  # member axis of length 1
+    split = (0.7, 0.2, 0.1)
+    res = run_yasso(None, f, yasso().x, years, every=every, split=split, chunk=5,
+                    quantiles=Q, corrected=corrected)
+    C = np.zeros((years // every, m, n))
+    CO2 = np.zeros((years // every, m, n))
+    for j in range(m):
+        model = yasso(corrected=corrected)
+        model.x = np.repeat(model.x[:, None], n, axis=1)
+        for k in range(years):
+            u = f['litter'][k, 0] * 1e-3 / C_FRACTION
+            co2, _, _, _ = model.decomp_one_timestep(*[s * u for s in split], f['temp'][k, j])
+            CO2[k // every, j] += 1e3 * co2
+            C[k // every, j] = 1e3 * model.x.sum(axis=0)
+        np.testing.assert_allclose(res['x'][:, j], model.x, rtol=1e-12)
+    _check_stats(res['C'], C)
+    _check_stats(res['CO2'], CO2)
+    # reading the horizon at once gives the same
+    full = run_yasso(None, f, yasso().x, years, every=every, split=split, chunk=years,
+                     quantiles=Q, corrected=corrected)
+    np.testing.assert_array_equal(full['x'], res['x'])
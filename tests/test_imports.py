@@ -0,0 +1,7 @@
+from benchmark import check_import_budget
+
+
+def test_import_budget():
+    # imports run in a fresh interpreter, so modules loaded by other tests
+    # do not count
+    check_import_budget()
@@ -0,0 +1,65 @@
+import threading
+
+import numpy as np
+import pytest
+
+import instrument
+from instrument import PROFILER
+from ensemble import Ensemble, ICBMMember
+
+
+@pytest.fixture
+def profiler():
+    PROFILER.reset()
+    PROFILER.clear_hooks()
+    instrument.enable(track_memory=True)
+    yield PROFILER
+    instrument.disable()
+    PROFILER.clear_hooks()
+    PROFILER.reset()
+
+
+def test_nested_stage_keeps_outer_peak(profiler):
+    with profiler.stage('outer'):
+        a = np.ones(10**6)  # 8 MB, freed before the inner stage
+        del a
+        with profiler.stage('inner'):
+            b = np.ones(10**5)
+            del b
+    s = profiler.as_dict()
+    assert s['outer']['bytes'] >= 8e6
+    assert 8e5 <= s['inner']['bytes'] < 8e6
+
+
+def test_overlapping_threads_are_not_measured(profiler):
+    entered = threading.Event()
+    done = threading.Event()
+
+    def other():
+        with profiler.stage('other'):
+            entered.set()
+            done.wait(5.0)
+
+    t = threading.Thread(target=other)
+    t.start()
+    entered.wait(5.0)
+    with profiler.stage('main'):
+        pass
+    done.set()
+    t.join()
+    assert profiler.unmeasured == 2
+    assert 'not measured' in profiler.summary()
+
+
+def test_ensemble_ticks_every_step(profiler):
+    steps = []
+    profiler.add_hook(lambda src, k, state: steps.append(k) if src == 'ensemble' else None)
+    n = 2
+    forcing = {'T': np.full((10, n), 10.0), 'W': np.full((10, n), 0.3),
+               'litter': np.full((10, n), 1.0)}
+    ens = Ensemble({'a': ICBMMember({'ky': 0.8, 'ko': 6.05e-3, 'h': 0.13}, {'Y': 0.3, 'O': 4.0}),
+                    'b': ICBMMember({'ky': 0.8, 'ko': 6.05e-3, 'h': 0.13}, {'Y': 0.3, 'O': 4.0})},
+                   forcing, soilp={'fc': 0.3}, chunk=4)
+    ens.run(10)
+    assert steps == list(range(1, 11))
+    assert profiler.unmeasured == 0
@@ -0,0 +1,97 @@
+# -*- coding: utf-8 -*-
+"""
+LinearSystem engine: environmental scaling axes and stepping methods.
+"""
+
+import numpy as np
+import pytest
+
+from icbm import icbm_system
+from yasso import yasso
+
+
+@pytest.mark.parametrize('n', [5, 7])
+def test_yasso_sites_with_scalar_temp(n):
+    # per-pool scaling of a scalar temperature must not be read as per-site
+    single = yasso(corrected=True)
+    multi = yasso(corrected=True)
+    multi.x = np.repeat(multi.x[:, None], n, axis=1)
+    for temp in [3.0, 5.0, -1.5]:
+        c1, _, _, _ = single.decomp_one_timestep(1.0, 0.2, 0.1, temp)
+        cn, _, _, _ = multi.decomp_one_timestep(np.ones(n), np.full(n, 0.2), np.full(n, 0.1),
+                                                temp)
+        np.testing.assert_allclose(cn, c1, rtol=1e-14)
+        np.testing.assert_allclose(multi.x, single.x[:, None] * np.ones(n), rtol=1e-14)
+
+
+def test_xi_axes_are_explicit():
+    system = icbm_system({'ky': 0.8, 'ko': 6.05e-3, 'h': 0.13})
+    x = np.ones((2, 2))
+    with pytest.raises(ValueError):
+        system.step(x, 0.3, np.array([1.0, 2.0]))
+    per_pool = system.step(x, 0.3, np.array([[1.0], [2.0]]))
+    per_site = system.step(x, 0.3, np.array([[1.0, 2.0]]))
+    for j, s in enumerate([1.0, 2.0]):
+        np.testing.assert_allclose(per_site[:, j], system.step(x[:, j], 0.3, s), rtol=1e-12)
+    np.testing.assert_allclose(per_pool[:, 0], system.step(x[:, 0], 0.3, np.array([1.0, 2.0])),
+                               rtol=1e-12)
+
+
+@pytest.mark.parametrize('method', ['expm', 'implicit'])
+def test_per_site_scaling_matches_site_loop(method):
+    # eigenvector fast path (expm) and general path agree with single sites
+    system = icbm_system({'ky': 0.8, 'ko': 6.05e-3, 'h': 0.13})
+    rng = np.random.default_rng(0)
+    x = rng.uniform(0.5, 5.0, (2, 6))
+    xi = rng.uniform(0.2, 1.5, (1, 6))
+    x1 = system.step(x, 0.3, xi, dt=2.0, method=method)
+    for j in range(6):
+        np.testing.assert_allclose(x1[:, j], system.step(x[:, j], 0.3, xi[0, j], dt=2.0,
+                                                         method=method), rtol=1e-10)
+
+
+def test_icbm_matches_odeint():
+    # exact LinearSystem steps against numerical integration of icbm.time_derivative
+    odeint = pytest.importorskip('scipy.integrate').odeint
+    from icbm import model, time_derivative
+
+    para = {'ky': 0.8, 'ko': 6.05e-3, 'h': 0.13}
+    t = np.array([0.0, 0.5, 1.0, 3.0, 10.0, 40.0])
+    # I[m] and fenv[m] hold over (t[m-1], t[m]]
+    I = np.array([0.0, 0.3, 0.1, 0.5, 0.285, 0.2])
+    fenv = np.array([1.0, 0.6, 1.2, 0.3, 1.0, 0.9])
+    C = model(para, {'Y': np.array([0.3, 1.0]), 'O': np.array([4.0, 2.0])}).compute(t, I, fenv)
+
+    # per-site scaling in one step of the system
+    system = icbm_system(para)
+    x2 = system.step(C[:, 0], 0.3, np.array([[0.5, 1.5]]), dt=7.0)
+    for j in range(2):
+        x = C[:, 0, j]
+        for m in range(1, len(t)):
+            k = fenv[m] * np.array([para['ky'], para['ko']])
+            x = odeint(time_derivative, x, t[m - 1:m + 1], args=(I[m], k, para['h']),
+                       rtol=1e-12, atol=1e-14)[-1]
+            np.testing.assert_allclose(C[:, m, j], x, rtol=1e-9)
+        k = [0.5, 1.5][j] * np.array([para['ky'], para['ko']])
+        x = odeint(time_derivative, C[:, 0, j], [0.0, 7.0], args=(0.3, k, para['h']),
+                   rtol=1e-12, atol=1e-14)[-1]
+        np.testing.assert_allclose(x2[:, j], x, rtol=1e-9)
+
+
+def test_icbm_compute_per_site_forcing():
+    from icbm import model
+
+    para = {'ky': 0.8, 'ko': 6.05e-3, 'h': 0.13}
+    t = np.array([0.0, 1.0, 2.5, 4.0])
+    rng = np.random.default_rng(4)
+    I = rng.uniform(0.1, 0.4, (len(t), 3))
+    fenv = rng.uniform(0.5, 1.5, (len(t), 3))
+    C = model(para, {'Y': 0.3, 'O': 4.0}).compute(t, I, fenv)
+    assert C.shape == (2, len(t), 3)
+    for j in range(3):
+        Cj = model(para, {'Y': 0.3, 'O': 4.0}).compute(t, I[:, j], fenv[:, j])
+        np.testing.assert_allclose(C[:, :, j], Cj, rtol=1e-13)
+    # per time point forcing holds for all sites
+    C = model(para, {'Y': np.array([0.3, 0.5]), 'O': 4.0}).compute(t, I[:, 0], 1.0)
+    Cj = model(para, {'Y': 0.5, 'O': 4.0}).compute(t, I[:, 0], 1.0)
+    np.testing.assert_allclose(C[:, :, 1], Cj, rtol=1e-13)
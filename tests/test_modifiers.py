@@ -0,0 +1,29 @@
+import numpy as np
+
+from modifiers import ModifierCache, millennial_modifiers
+from millennial import fT_century, fW_century
+
+P = {'CUEp': [0.6, 15.0, 0.012]}
+SOILP = {'fc': 0.4}
+T = np.linspace(-5.0, 25.0, 50)
+W = np.linspace(0.1, 0.4, 50)
+
+
+def _scaled(c):
+    return lambda t: c * fT_century(t)
+
+
+def test_closures_do_not_share_cache_entries():
+    cache = ModifierCache()
+    a = millennial_modifiers(T, W, P, SOILP, fT=_scaled(1.0), fW=fW_century, cache=cache)
+    b = millennial_modifiers(T, W, P, SOILP, fT=_scaled(2.0), fW=fW_century, cache=cache)
+    np.testing.assert_allclose(b['env_f'], 2.0 * a['env_f'])
+    assert cache.misses == 2 and cache.hits == 0
+
+
+def test_same_callable_hits():
+    cache = ModifierCache()
+    f = _scaled(2.0)
+    for fT in [f, f, fT_century, fT_century]:
+        millennial_modifiers(T, W, P, SOILP, fT=fT, fW=fW_century, cache=cache)
+    assert cache.misses == 2 and cache.hits == 2
@@ -0,0 +1,81 @@
+import contextlib
+import io
+
+import numpy as np
+import pytest
+
+from millennial import Millennial, param
+from modifiers import millennial_modifiers
+
+SOILP = {'clay': 40.0, 'bd': 1350.0, 'poros': 0.5, 'fc': 0.3}
+
+
+def _run(dtype, compensated, n=20, days=365, ledger=None):
+    rng = np.random.default_rng(0)
+    C0 = np.array([600.0, 20.0, 30.0, 1500.0, 2500.0])[:, None] * rng.uniform(0.5, 1.5, n)
+    d = np.arange(days)
+    env = millennial_modifiers(10.0 + 8.0 * np.sin(d / 58.0), 0.25 + 0.05 * np.cos(d / 58.0),
+                               param, SOILP, cache=None, dtype=dtype)
+    with contextlib.redirect_stdout(io.StringIO()):
+        model = Millennial(dict(param), SOILP, C0, dtype=dtype, compensated=compensated,
+                           ledger=ledger)
+    F_in = [np.asarray(0.66 * 1.5, dtype=dtype), np.asarray(0.34 * 1.5, dtype=dtype)]
+    for k in range(days):
+        F, mbe = model.decompose(None, None, F_in, env=(env['env_f'][k], env['CUE'][k]))
+    return model, F, mbe
+
+
+def test_float32_needs_compensation():
+    plain, _, _ = _run(np.float32, compensated=False)
+    with pytest.raises(RuntimeError):
+        plain.check_mass_balance()
+    model, F, mbe = _run(np.float32, compensated=True)
+    assert model.check_mass_balance() < 1e-8
+    assert model.Cpools.dtype == np.float32
+    assert all(v.dtype == np.float32 for v in F.values())
+    assert mbe.dtype == np.float64
+
+
+def test_float64_state_is_read_only():
+    model, _, _ = _run(np.float64, compensated=True, days=10, ledger=True)
+    assert model.check_mass_balance() < 1e-12
+    with pytest.raises(ValueError):
+        model.Cpools[0] = 0.0
+
+
+def test_float64_ledger_is_opt_in():
+    model, F, mbe = _run(np.float64, compensated=True, days=10)
+    assert model.ledger is None
+    # mbe leaves out leaching
+    np.testing.assert_allclose(mbe, -F['Fl'], rtol=1e-9)
+    with pytest.raises(RuntimeError):
+        model.check_mass_balance()
+
+
+def test_integer_initial_pools_are_float():
+    C0 = [600, 20, 30, 1500, 2500]
+    with contextlib.redirect_stdout(io.StringIO()):
+        model = Millennial(dict(param), SOILP, C0)
+        ref = Millennial(dict(param), SOILP, np.array(C0, dtype=float))
+    assert model.Cpools.dtype == np.float64
+    for _ in range(3):
+        F, mbe = model.decompose(10.0, 0.25, [1.0, 0.5])
+        ref.decompose(10.0, 0.25, [1.0, 0.5])
+    np.testing.assert_array_equal(model.Cpools, ref.Cpools)
+    np.testing.assert_allclose(mbe, -F['Fl'], rtol=1e-9)
+
+
+@pytest.mark.parametrize('dtype', [np.float64, np.float32])
+def test_assigning_pools_reinitializes(dtype):
+    model, _, _ = _run(dtype, compensated=True, days=30)
+    C1 = np.full((5, 20), 100.0)
+    model.Cpools = C1
+    assert model.Cpools.dtype == dtype
+    np.testing.assert_array_equal(model.Cpools, C1)
+    np.testing.assert_array_equal(model.pools(), C1)
+    C1[0] = 0.0  # the state is a copy
+    assert np.all(model.Cpools[0] == 100.0)
+    F, mbe = model.decompose(10.0, 0.25, [np.asarray(1.0, dtype), np.asarray(0.5, dtype)])
+    np.testing.assert_allclose(mbe, -F['Fl'], rtol=1e-4 if dtype == np.float32 else 1e-9)
+    if dtype == np.float32:
+        assert model.check_mass_balance() < 1e-8
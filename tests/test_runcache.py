@@ -0,0 +1,99 @@
+import os
+import shutil
+from types import SimpleNamespace
+
+import numpy as np
+import pytest
+
+import runcache
+from runcache import RunCache
+from spinup import spinup_icbm
+
+PARA = {'ky': 0.8, 'ko': 6.05e-3, 'h': 0.13}
+
+
+def test_hit_and_miss_return_same_types(tmp_path):
+    cache = RunCache(str(tmp_path))
+    calls = []
+
+    def run():
+        calls.append(1)
+        return {'C': np.arange(3.0), 'n': 4}
+
+    a = cache.cached('icbm', PARA, {'I': 0.3}, None, run)
+    b = cache.cached('icbm', PARA, {'I': 0.3}, None, run)
+    assert len(calls) == 1 and (cache.hits, cache.misses) == (1, 1)
+    for r in (a, b):
+        assert isinstance(r['n'], np.ndarray) and r['n'] == 4
+        np.testing.assert_array_equal(r['C'], np.arange(3.0))
+    # numbers come back as 0-d arrays on misses and hits
+    for _ in range(2):
+        r = cache.cached('icbm', PARA, 1, None, lambda: 2.5)
+        assert isinstance(r, np.ndarray) and r.ndim == 0 and r == 2.5
+
+
+def test_unsupported_results_raise(tmp_path):
+    cache = RunCache(str(tmp_path))
+    for res in [(np.zeros(2), np.ones(2)), {'a': [1, 'x']}, np.array([{}], dtype=object), None]:
+        with pytest.raises(TypeError):
+            cache.cached('icbm', PARA, {'I': 0.3}, None, lambda: res)
+    assert cache.stats()['entries'] == 0
+
+
+def test_none_state_is_distinct(tmp_path):
+    cache = RunCache(str(tmp_path))
+    assert cache.key('icbm', PARA, 0.3, None) != cache.key('icbm', PARA, 0.3, -1)
+    assert cache.key('icbm', PARA, 0.3, None) == cache.key('icbm', PARA, 0.3, None)
+
+
+def test_eviction_and_bypass(tmp_path):
+    cache = RunCache(str(tmp_path), max_bytes=3000)
+    for k in range(5):
+        cache.cached('icbm', PARA, k, None, lambda: np.random.default_rng(k).random(200))
+    st = cache.stats()
+    assert st['evictions'] > 0 and st['bytes'] <= 3000
+    # most recent entry survives
+    assert cache.get(cache.key('icbm', PARA, 4, None)) is not None
+
+    off = RunCache(str(tmp_path / 'off'), enabled=False)
+    assert off.cached('icbm', PARA, 0, None, lambda: 1.0) == 1.0
+    assert off.stats()['entries'] == 0 and off.misses == 0
+
+
+def test_eviction_after_load_is_a_hit(tmp_path, monkeypatch):
+    cache = RunCache(str(tmp_path))
+    key = cache.key('icbm', PARA, 0.3, None)
+    cache.put(key, np.arange(3.0))
+
+    def utime(fname):
+        os.remove(fname)  # a concurrent eviction
+        raise FileNotFoundError(fname)
+
+    monkeypatch.setattr(runcache.os, 'utime', utime)
+    np.testing.assert_array_equal(cache.get(key), np.arange(3.0))
+    assert cache.get(key) is None
+
+
+def test_version_covers_imported_modules(tmp_path):
+    models = os.path.dirname(runcache.__file__)
+    for f in ['icbm.py', 'linear.py', 'instrument.py', 'damm.py']:
+        shutil.copy(os.path.join(models, f), str(tmp_path))
+    icbm = SimpleNamespace(__file__=str(tmp_path / 'icbm.py'))
+    v = runcache.model_version(icbm)
+    with open(str(tmp_path / 'damm.py'), 'a') as f:
+        f.write('# not imported by icbm\n')
+    assert runcache.model_version(icbm) == v
+    with open(str(tmp_path / 'linear.py'), 'a') as f:
+        f.write('# changed\n')
+    assert runcache.model_version(icbm) != v
+
+
+def test_spinup_cache(tmp_path):
+    cache = RunCache(str(tmp_path))
+    x0 = np.ones((2, 3))
+    a = spinup_icbm(PARA, 0.3, np.array([0.5, 1.0, 2.0]), x0, cache=cache, tol=1e-6)
+    b = spinup_icbm(PARA, 0.3, np.array([0.5, 1.0, 2.0]), x0, cache=cache, tol=1e-6)
+    assert (cache.hits, cache.misses) == (1, 1)
+    np.testing.assert_array_equal(a['x'], b['x'])
+    np.testing.assert_array_equal(a['x'], spinup_icbm(PARA, 0.3, np.array([0.5, 1.0, 2.0]), x0,
+                                                      tol=1e-6)['x'])
@@ -0,0 +1,62 @@
+import numpy as np
+import pytest
+
+from millennial import fluxes, millennial_param, param
+from modifiers import millennial_modifiers
+from sensitivity import run_millennial
+
+SOILP = {'clay': 40.0, 'bd': 1350.0, 'poros': 0.5, 'fc': 0.3}
+THETA = ('V_pl', 'K_pl', 'k_m', 'K_lm', 'V_ma', 'pa', 'CUEp0', 'CUEp2')
+
+
+def _perturbed(base, name, h):
+    p = dict(base, CUEp=list(base['CUEp']))
+    if name.startswith('CUEp'):
+        p['CUEp'][int(name[-1])] += h
+    else:
+        p[name] += h
+    return p
+
+
+def _forcing(days, n):
+    d = np.arange(days)
+    return {'T': 8.0 + 12.0 * np.sin(d / 58.0)[:, None] + 2.0 * np.arange(n),
+            'W': 0.25 + 0.05 * np.cos(d / 40.0)[:, None] * np.ones(n),
+            'litter': np.full((days, n), 1.5)}
+
+
+def _limited_days(base, forcing, C0, days):
+    """ cell-days on which the POM decomposition limit 0.9 x / dt binds """
+    x = run_millennial(base, SOILP, forcing, C0, (), days)['x']
+    x = np.concatenate([np.broadcast_to(C0[:, None], (1,) + x.shape[1:]), x[:-1]])
+    env = millennial_modifiers(forcing['T'], forcing['W'], base, SOILP, cache=None)
+    n = 0
+    for k in range(days):
+        p = millennial_param(**dict(base, Qmax=4550.0, CUE=env['CUE'][k]))
+        F = fluxes(x[k], p, env_f=env['env_f'][k])
+        n += np.sum(np.isclose(F['Fpl'], 0.9 * x[k][0], rtol=1e-12))
+    return n
+
+
+@pytest.mark.parametrize('base', [param, dict(param, V_pl=300.0)], ids=['free', 'limited'])
+def test_tangent_linear_matches_finite_differences(base):
+    n, days = 2, 365
+    forcing = _forcing(days, n)
+    C0 = np.array([600.0, 20.0, 30.0, 1500.0, 2500.0])
+    if base is not param:
+        # the limit binds on some but not all days
+        assert 0 < _limited_days(base, forcing, C0, days) < n * days
+    res = run_millennial(base, SOILP, forcing, C0, THETA, days, every=days)
+    for j, name in enumerate(THETA):
+        h = 1e-6 * max(abs(base['CUEp'][int(name[-1])] if name.startswith('CUEp')
+                           else base[name]), 1e-3)
+        up = run_millennial(_perturbed(base, name, h), SOILP, forcing, C0, (), days, every=days)
+        dn = run_millennial(_perturbed(base, name, -h), SOILP, forcing, C0, (), days,
+                            every=days)
+        dx = (up['x'] - dn['x']) / (2.0 * h)
+        dR = (up['Rh'] - dn['Rh']) / (2.0 * h)
+        scale = np.abs(dx).max() + 1e-12
+        np.testing.assert_allclose(res['S'][:, :, j], dx, rtol=1e-4, atol=1e-5 * scale,
+                                   err_msg=name)
+        np.testing.assert_allclose(res['dRh'][:, j], dR, rtol=1e-4,
+                                   atol=1e-5 * (np.abs(dR).max() + 1e-12), err_msg=name)
@@ -0,0 +1,97 @@
+import asyncio
+
+import numpy as np
+import pytest
+
+from icbm import icbm_system, param
+from server import AsyncClient, Client, ModelServer
+from yasso import yasso
+
+
+def _serve(scenario, **kwargs):
+    async def main():
+        server = ModelServer(port=0, window=0.01, **kwargs)
+        port = await server.start()
+        try:
+            return await scenario(server, port)
+        finally:
+            await server.stop()
+    return asyncio.run(main())
+
+
+def test_batched_results_match_single_runs():
+    async def scenario(server, port):
+        c = await AsyncClient.connect(port=port)
+        res = await asyncio.gather(*[c.call('icbm', Y=0.3, O=4.0 + k, I=0.285, years=10)
+                                     for k in range(5)])
+        await c.close()
+        return res
+
+    res = _serve(scenario)
+    system = icbm_system(param)
+    for k, r in enumerate(res):
+        x = system.step(np.array([0.3, 4.0 + k]), 0.285, 1.0, dt=10.0)
+        np.testing.assert_allclose([r['Y'], r['O']], x, rtol=1e-12)
+
+
+@pytest.mark.parametrize('corrected', [False, True])
+def test_yasso_variant(corrected):
+    async def scenario(server, port):
+        c = await AsyncClient.connect(port=port)
+        res = await asyncio.gather(*[c.call('yasso', temp=T, litter=[0.2, 0.1, 0.05], years=3)
+                                     for T in (1.0, 6.0)])
+        await c.close()
+        return res
+
+    res = _serve(scenario, yasso_corrected=corrected)
+    for T, r in zip((1.0, 6.0), res):
+        model = yasso(corrected=corrected)
+        for _ in range(3):
+            CO2, _, _, _ = model.decomp_one_timestep(0.2, 0.1, 0.05, T)
+        np.testing.assert_allclose(r['x'], model.x, rtol=1e-12)
+        np.testing.assert_allclose(r['CO2'], CO2, rtol=1e-12)
+
+
+def test_invalid_requests_fail_alone():
+    bad = [('yasso', {'temp': 4.0, 'litter': [0.2, [0.1], 0.05]}),
+           ('yasso', {'temp': 4.0, 'litter': [0.2, 0.1]}),
+           ('yasso', {'litter': [0.2, 0.1, 0.05]}),
+           ('icbm', {'O': 2.0}),
+           ('icbm', {'Y': 'a', 'O': 2.0}),
+           ('damm', {'T': 10.0}),
+           ('nomodel', {})]
+    good = [('yasso', {'temp': 4.0, 'litter': [0.2, 0.1, 0.05]}),
+            ('icbm', {'Y': 0.3, 'O': 2.0}),
+            ('damm', {'T': 10.0, 'W': 0.3})]
+
+    async def scenario(server, port):
+        c = await AsyncClient.connect(port=port)
+        res = await asyncio.gather(*[c.call(m, **a) for m, a in bad + good],
+                                   return_exceptions=True)
+        metrics = await c.metrics()
+        await c.close()
+        return res, metrics
+
+    res, metrics = _serve(scenario)
+    for r in res[:len(bad)]:
+        assert isinstance(r, RuntimeError) and 'ValueError' in str(r)
+    for r in res[len(bad):]:
+        assert isinstance(r, dict) and all(np.all(np.isfinite(v)) for v in r.values())
+    assert metrics['errors'] == len(bad) and metrics['requests'] == len(good)
+
+
+def test_blocking_client():
+    async def scenario(server, port):
+        def run():
+            c = Client(port=port)
+            try:
+                r = c.call('damm', T=10.0, W=0.3)
+                with pytest.raises(RuntimeError):
+                    c.call('damm', T=10.0)
+                return r, c.metrics()
+            finally:
+                c.close()
+        return await asyncio.get_running_loop().run_in_executor(None, run)
+
+    r, metrics = _serve(scenario)
+    assert r['v'] > 0.0 and metrics['requests'] == 1 and metrics['errors'] == 1
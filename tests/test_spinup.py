@@ -0,0 +1,43 @@
+import contextlib
+import io
+
+import numpy as np
+import pytest
+
+from millennial import param
+from spinup import spinup_millennial, spinup_yasso
+from yasso import decom_para, yasso
+
+SOILP = {'clay': 40.0, 'bd': 1350.0, 'poros': 0.5, 'fc': 0.3}
+
+
+@pytest.mark.parametrize('shared', [('T',), ('W',), ('litter',), ('T', 'litter')])
+def test_millennial_forcing_promoted_per_array(shared):
+    n = 3
+    d = np.arange(365)
+    full = {'T': 10.0 + 8.0 * np.sin(d / 58.0)[:, None] + np.arange(n),
+            'W': 0.25 + 0.05 * np.cos(d / 58.0)[:, None] + 0.01 * np.arange(n),
+            'litter': 1.5 + 0.5 * np.sin(d / 58.0)[:, None] * np.ones(n)}
+    # shared series are the same for all cells
+    for k in shared:
+        full[k] = full[k][:, :1] * np.ones(n)
+    forc = {k: (v[:, 0] if k in shared else v) for k, v in full.items()}
+    C0 = np.full((5, n), 100.0)
+    kw = dict(max_years=5, min_years=5)
+    with contextlib.redirect_stdout(io.StringIO()):
+        a = spinup_millennial(dict(param), SOILP, forc['T'], forc['W'], forc['litter'], C0, **kw)
+        b = spinup_millennial(dict(param), SOILP, full['T'], full['W'], full['litter'], C0, **kw)
+    np.testing.assert_allclose(a['x'], b['x'], rtol=1e-13)
+
+
+@pytest.mark.parametrize('corrected', [False, True])
+def test_yasso_spinup_is_steady_state_of_its_variant(corrected):
+    litter = np.array([[0.4, 0.6, 0.3], [0.1, 0.2, 0.0], [0.05, 0.0, 0.1]])
+    temp = np.array([2.0, 5.0, -1.0])
+    res = spinup_yasso(decom_para(), litter, temp, np.ones((7, 3)), corrected=corrected,
+                       tol=1e-12, max_years=20000)
+    assert np.all(res['years'] > 0)
+    model = yasso(corrected=corrected)
+    model.x = res['x']
+    model.decomp_one_timestep(*litter, temp)
+    np.testing.assert_allclose(model.x, res['x'], rtol=1e-10, atol=1e-12)
@@ -0,0 +1,22 @@
+import numpy as np
+import pytest
+
+from millennial import fT_century, fW_century
+from surfaces import century_factors, evaluate, separable
+
+
+def test_separable_matches_evaluate_where_g_is_negative():
+    T = np.arange(-30.0, 30.0, 0.5)  # fT_century < 0 below about -15 degC
+    W = np.linspace(0.05, 0.5, 40)
+    fc = np.array([0.3, 0.4])
+    assert fT_century(T).min() < 0.0
+    a = separable(*century_factors(T, W, fc), T, W)
+    b = evaluate(lambda T, W, fc: fT_century(T) * fW_century(W / fc), T, W, {'fc': fc})
+    for k in b:
+        np.testing.assert_array_equal(np.isnan(a[k]), np.isnan(b[k]))
+        np.testing.assert_allclose(a[k], b[k], rtol=1e-9, atol=1e-15)
+
+
+def test_separable_rejects_negative_moisture_factor():
+    with pytest.raises(ValueError):
+        separable(np.ones((1, 3)), np.array([[0.5, -0.1]]), np.arange(3.0), np.arange(2.0))
@@ -0,0 +1,91 @@
+import contextlib
+import io
+
+import numpy as np
+import pytest
+
+from millennial import Millennial, param
+from tiles import TileRunner, esom_rates_kernel, millennial_kernel
+
+SHAPE = (4, 5)
+DAYS = 40
+
+
+def _domain():
+    rng = np.random.default_rng(2)
+    n = int(np.prod(SHAPE))
+    d = np.arange(DAYS)[:, None]
+    static = {'fc': rng.uniform(0.25, 0.4, SHAPE),
+              'litter': rng.uniform(1.0, 2.0, SHAPE)}
+    forcing = {'T': (8.0 + 10.0 * np.sin(d / 9.0) + np.arange(n)).reshape((DAYS,) + SHAPE),
+               'W': (0.2 + 0.05 * np.cos(d / 7.0) + 0.002 * np.arange(n)).reshape((DAYS,) + SHAPE)}
+    return static, forcing
+
+
+def test_tiled_run_matches_untiled_model():
+    static, forcing = _domain()
+    res = TileRunner(static, forcing, tile=6).run(millennial_kernel(C0=100.0))
+    n = int(np.prod(SHAPE))
+    with contextlib.redirect_stdout(io.StringIO()):
+        model = Millennial(dict(param), {'clay': 40.0, 'bd': 1350.0, 'fc': static['fc'].ravel()},
+                           np.full((5, n), 100.0))
+    L = static['litter'].ravel()
+    Rh = np.zeros(n)
+    for k in range(DAYS):
+        F, _ = model.decompose(forcing['T'][k].ravel(), forcing['W'][k].ravel(),
+                               [0.66 * L, 0.34 * L])
+        Rh += F['Fmr'] + F['Fgr']
+    np.testing.assert_allclose(res['C'], model.Cpools.reshape((5,) + SHAPE), rtol=1e-12)
+    np.testing.assert_allclose(res['Rh'], (Rh / DAYS).reshape(SHAPE), rtol=1e-12)
+    assert res['stats'] == {'tiles': 4, 'skipped': 0, 'cells': 20, 'forcing_nodata': 0}
+
+
+@pytest.mark.parametrize('make_kernel', [lambda: millennial_kernel(chunk=7),
+                                         lambda: esom_rates_kernel(chunk=7)],
+                         ids=['millennial', 'esom'])
+def test_tile_size_invariance(make_kernel):
+    static, forcing = _domain()
+    static['sfc'] = np.arange(20).reshape(SHAPE) % 6 + 1
+    forcing.update(tair=forcing['T'], tp_top=forcing['T'] - 1.0,
+                   tp_middle=forcing['T'] - 2.0, tp_bottom=forcing['T'] - 3.0,
+                   wn=forcing['W'] / static['fc'])
+    ref = TileRunner(static, forcing, tile=1000).run(make_kernel())
+    for tile in (1, 3, 7):
+        res = TileRunner(static, forcing, tile=tile).run(make_kernel())
+        for name in ref:
+            if name != 'stats':
+                np.testing.assert_allclose(res[name], ref[name], rtol=1e-12, err_msg=name)
+
+
+def test_skipped_cells_are_fill():
+    static, forcing = _domain()
+    ref = TileRunner(static, forcing, tile=5).run(millennial_kernel())
+    static['fc'][2, 0] = -9999.0
+    static['litter'][1, 2] = np.nan
+    forcing['T'][11, 2, 3] = -9999.0
+    forcing['W'][30, 3, 0] = np.nan
+    mask = np.ones(SHAPE, bool)
+    mask[3, 4] = False
+    mask[0] = False  # a whole tile
+    with np.errstate(invalid='ignore'):
+        res = TileRunner(static, forcing, tile=5, nodata=-9999.0, mask=mask).run(millennial_kernel())
+    skip = ~mask
+    skip[2, 0] = skip[1, 2] = skip[2, 3] = skip[3, 0] = True
+    assert np.all(np.isnan(res['C'][:, skip])) and np.all(np.isnan(res['Rh'][skip]))
+    np.testing.assert_array_equal(res['C'][:, ~skip], ref['C'][:, ~skip])
+    np.testing.assert_array_equal(res['Rh'][~skip], ref['Rh'][~skip])
+    assert res['stats'] == {'tiles': 4, 'skipped': 1, 'cells': 10, 'forcing_nodata': 2}
+
+
+def test_memmap_round_trip(tmp_path):
+    static, forcing = _domain()
+    files = {}
+    for k, v in list(static.items()) + list(forcing.items()):
+        files[k] = str(tmp_path / (k + '.npy'))
+        np.save(files[k], v)
+    ref = TileRunner(static, forcing, tile=6).run(millennial_kernel())
+    res = TileRunner({k: files[k] for k in static}, {k: files[k] for k in forcing},
+                     tile=6).run(millennial_kernel(), out=str(tmp_path / 'out'))
+    for name in ('C', 'Rh'):
+        assert isinstance(res[name], np.memmap)
+        np.testing.assert_array_equal(np.load(tmp_path / 'out' / (name + '.npy')), ref[name])
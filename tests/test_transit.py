@@ -0,0 +1,58 @@
+import numpy as np
+import pytest
+
+from icbm import icbm_system
+from transit import AgeTransit
+from yasso import decom_para, temperature_scaling, yasso_system
+
+# ages (yr): fine near 0 for fast pools, geometric out to the slow tails
+Y = np.concatenate([np.linspace(0.0, 20.0, 20001)[:-1], np.geomspace(20.0, 6e4, 60000)])
+
+
+def _systems():
+    icbm = AgeTransit.from_system(icbm_system({'ky': 0.8, 'ko': 6.05e-3, 'h': 0.13}),
+                                  np.array([0.2, 0.3]), xi=np.array([[0.7, 1.3]]))
+    param = decom_para()
+    yasso = AgeTransit.from_system(yasso_system(param), np.array([0.5, 0.1, 0.05]),
+                                   xi=temperature_scaling(param, 4.0))
+    return [icbm, yasso]
+
+
+@pytest.mark.parametrize('at', _systems(), ids=['icbm', 'yasso'])
+def test_moments_match_integrated_densities(at):
+    fa = at.system_age_density(Y)
+    ft = at.transit_time_density(Y)
+    fp = at.pool_age_density(Y)
+    for f in (fa, ft, fp):
+        np.testing.assert_allclose(np.trapezoid(f, Y, axis=0), 1.0, rtol=1e-6)
+    np.testing.assert_allclose(np.trapezoid(Y[:, None] * fa.reshape(len(Y), -1), Y, axis=0),
+                               np.ravel(at.mean_system_age()), rtol=1e-6)
+    np.testing.assert_allclose(np.trapezoid(Y[:, None] * ft.reshape(len(Y), -1), Y, axis=0),
+                               np.ravel(at.mean_transit_time()), rtol=1e-6)
+    np.testing.assert_allclose(np.trapezoid(Y[:, None, None] * fp.reshape(len(Y), at.n, -1),
+                                            Y, axis=0),
+                               at.mean_pool_age().reshape(at.n, -1), rtol=1e-6)
+
+
+@pytest.mark.parametrize('at', _systems(), ids=['icbm', 'yasso'])
+def test_cdf_and_quantiles_match_integrated_density(at):
+    fa = at.system_age_density(Y).reshape(len(Y), -1)
+    F = np.concatenate([np.zeros((1, fa.shape[1])),
+                        np.cumsum(0.5 * (fa[1:] + fa[:-1]) * np.diff(Y)[:, None], axis=0)])
+    k = np.searchsorted(Y, [1.0, 50.0, 500.0])
+    np.testing.assert_allclose(np.asarray(at.cdf(Y[k])).reshape(3, -1), F[k], atol=1e-7)
+    q = np.array([0.1, 0.5, 0.9])
+    yq = np.asarray(at.quantile(q)).reshape(3, -1)
+    for j in range(fa.shape[1]):
+        np.testing.assert_allclose(np.interp(yq[:, j], Y, F[:, j]), q, atol=1e-6)
+
+
+def test_transit_density_is_impulse_response():
+    # outflow of a unit input pulse distributed as beta, integrated numerically
+    odeint = pytest.importorskip('scipy.integrate').odeint
+    at = _systems()[1]
+    B, beta, z = at.B[0], at.beta[0], at.z[0]
+    t = np.array([0.0, 0.5, 2.0, 10.0, 100.0, 1000.0])
+    x = odeint(lambda x, t: B @ x, beta, t, Dfun=lambda x, t: B, rtol=1e-12, atol=1e-16,
+               mxstep=100000)
+    np.testing.assert_allclose(at.transit_time_density(t), x @ z, rtol=1e-7, atol=1e-14)
@@ -0,0 +1,66 @@
+import numpy as np
+
+from yasso import yasso
+
+# litter (nwl, fwl, cwl) and temperature of five yearly steps
+FORCING = [((1.2, 0.3, 0.1), 3.0), ((0.8, 0.2, 0.5), 5.5), ((1.0, 0.0, 0.0), -2.0),
+           ((0.5, 0.4, 0.3), 8.0), ((1.1, 0.3, 0.2), 1.0)]
+
+# output of the original scalar implementation for FORCING
+REF_CO2 = [1.4361937919999999, 1.510984594739405, 0.6304860086078437,
+           1.5589536465602496, 0.5844022742227357]
+REF_X = [0.2429119204485477, 0.8231825656959666, 0.38966255672910705, 0.7166389581890587,
+         1.461842586420585, 2.2058617752188594, 2.5274945354866136]
+
+
+def test_matches_reference_output():
+    model = yasso()
+    co2 = [model.decomp_one_timestep(*u, T)[0] for u, T in FORCING]
+    assert co2 == REF_CO2
+    assert list(model.x) == REF_X
+
+
+def test_sites_match_reference_output():
+    n = 3
+    model = yasso()
+    model.x = np.repeat(model.x[:, None], n, axis=1)
+    for (u, T), ref in zip(FORCING, REF_CO2):
+        co2, _, _, _ = model.decomp_one_timestep(*[np.full(n, v) for v in u], np.full(n, T))
+        assert np.all(co2 == ref)
+    assert np.all(model.x == np.array(REF_X)[:, None])
+
+
+def test_pool_attributes_write_state():
+    model, ref = yasso(), yasso()
+    model.xhum2 = 5.0
+    ref.x[6] = 5.0
+    assert model.xhum2 == 5.0 and 'xhum2' not in vars(model)
+    np.testing.assert_array_equal(model.x, ref.x)
+    assert model.decomp_one_timestep(1.0, 0.3, 0.1, 3.0) == ref.decomp_one_timestep(1.0, 0.3, 0.1, 3.0)
+    np.testing.assert_array_equal(model.x, ref.x)
+    # per-site value broadcasts the state
+    model.xfwl = np.array([0.1, 0.2])
+    assert model.x.shape == (7, 2)
+    np.testing.assert_array_equal(model.x[1:], np.repeat(ref.x[1:, None], 2, axis=1))
+
+
+def test_corrected_conserves_mass():
+    model = yasso(corrected=True)
+    x0 = model.x.sum()
+    inputs = co2 = 0.0
+    for u, T in FORCING:
+        inputs += 0.5 * sum(u)
+        co2 += model.decomp_one_timestep(*u, T)[0]
+    np.testing.assert_allclose(model.x.sum(), x0 + inputs - co2, rtol=1e-13)
+
+
+def test_corrected_routes_humus():
+    # hum2 is fed from hum1 and decays at khum2
+    param = yasso().param
+    model = yasso(corrected=True)
+    x0 = model.x.copy()
+    T = param['T0']  # unscaled rates
+    model.decomp_one_timestep(0.0, 0.0, 0.0, T)
+    np.testing.assert_allclose(
+        model.x[6], x0[6] * (1.0 - param['khum2']) + param['phum1'] * param['khum1'] * x0[5],
+        rtol=1e-14)